@@ -0,0 +1,45 @@
+"""adding declarations to the header of a growing file
+
+usage: python benchmarks/bench_anchor.py [N ...]
+
+insert_before() is O(len(body)) per call, adding via an anchor is O(1).
+"""
+import sys
+import timeit
+import typing as t
+from prestring import Module, NEWLINE
+
+
+def insert_before(n: int) -> Module:
+    m = Module()
+    for i in range(n):
+        m.stmt("x{} = f()", i)
+        m.insert_before(NEWLINE)
+        m.insert_before(m.format("import m{}", i))
+    return m
+
+
+def anchor(n: int) -> Module:
+    m = Module()
+    header = m.anchor("imports")
+    for i in range(n):
+        m.stmt("x{} = f()", i)
+        header.stmt("import m{}", i)
+    return m
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [10000, 20000, 40000]
+    print("{:<14} {:>8} {:>10} {:>10}".format("insert", "N", "sec", "usec/N"))
+    for build in (insert_before, anchor):
+        for n in sizes:
+            sec = min(timeit.repeat(lambda: build(n), number=1, repeat=3))
+            print(
+                "{:<14} {:>8} {:>10.4f} {:>10.3f}".format(
+                    build.__name__, n, sec, sec / n * 1e6
+                )
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,76 @@
+"""builder overhead, statements (or blocks) per second, without rendering
+
+usage: python benchmarks/bench_builder.py [N ...]
+
+"contextmanager" is the generator based scope() (as before), for comparison.
+"""
+import sys
+import timeit
+import contextlib
+import typing as t
+from prestring import Module, INDENT, UNINDENT
+from prestring.python import PythonModule
+
+
+@contextlib.contextmanager
+def generator_scope(m: Module) -> t.Iterator[None]:
+    try:
+        m.body.append(INDENT)
+        yield
+    finally:
+        m.body.append(UNINDENT)
+
+
+def stmt(n: int) -> None:
+    m = Module()
+    for i in range(n):
+        m.stmt("x = 1")
+
+
+def stmts(n: int) -> None:
+    Module().stmts(["x = 1"] * n)
+
+
+def scope(n: int) -> None:
+    m = Module()
+    for i in range(n):
+        with m.scope():
+            m.stmt("x = 1")
+
+
+def contextmanager(n: int) -> None:
+    m = Module()
+    for i in range(n):
+        with generator_scope(m):
+            m.stmt("x = 1")
+
+
+def python_if(n: int) -> None:
+    m = PythonModule()
+    for i in range(n):
+        with m.if_("x"):
+            m.stmt("x = 1")
+
+
+def python_def(n: int) -> None:
+    m = PythonModule()
+    for i in range(n):
+        with m.def_("f", "x"):
+            m.return_("x")
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [100000]
+    print("{:<16} {:>8} {:>10} {:>10} {:>12}".format("case", "N", "sec", "usec/N", "N/sec"))
+    for n in sizes:
+        for build in (stmt, stmts, scope, contextmanager, python_if, python_def):
+            sec = min(timeit.repeat(lambda: build(n), number=1, repeat=3))
+            print(
+                "{:<16} {:>8} {:>10.4f} {:>10.3f} {:>12.0f}".format(
+                    build.__name__, n, sec, sec / n * 1e6, n / sec
+                )
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,68 @@
+"""rendering time of unchanged modules, with and without RenderCache
+
+usage: python benchmarks/bench_cache.py [N ...]
+
+N modules (of 100 functions each) are built and rendered, as in the runs of
+codegen. "warm" is the next run, with the entries written by "cold". "inputs"
+is keyed by the inputs (lookup()), the modules are not built in the next run.
+"""
+import sys
+import time
+import shutil
+import tempfile
+import typing as t
+from prestring.python import PythonModule
+from prestring.cache import RenderCache
+
+
+def build(i: int, cache: t.Optional[RenderCache]) -> PythonModule:
+    m = PythonModule()
+    m.render_cache = cache
+    m.from_("typing", "Any")
+    for j in range(100):
+        with m.def_("f{}_{}".format(i, j), "x: Any"):
+            with m.if_("x > {}".format(j)):
+                m.return_(m.format("{!r}", j))
+            m.return_("None")
+    return m
+
+
+def run(n: int, cache: t.Optional[RenderCache]) -> float:
+    modules = [build(i, cache) for i in range(n)]
+    st = time.perf_counter()
+    for m in modules:
+        str(m)
+    return time.perf_counter() - st
+
+
+def run_inputs(n: int, cache: RenderCache) -> float:
+    st = time.perf_counter()
+    for i in range(n):
+        key = "bench{}".format(i)  # e.g. a hash of the input files
+        cache.lookup(key, lambda: build(i, None))
+    return time.perf_counter() - st
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [100, 400]
+    print(
+        "{:<8} {:>8} {:>10} {:>8} {:>8}".format("case", "N", "sec", "hits", "misses")
+    )
+    for n in sizes:
+        print("{:<8} {:>8} {:>10.4f}".format("nocache", n, run(n, None)))
+        directory = tempfile.mkdtemp()
+        try:
+            for case in ("cold", "warm", "inputs", "inputs"):
+                cache = RenderCache(directory)
+                sec = run_inputs(n, cache) if case == "inputs" else run(n, cache)
+                print(
+                    "{:<8} {:>8} {:>10.4f} {:>8} {:>8}".format(
+                        case, n, sec, cache.hits, cache.misses
+                    )
+                )
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
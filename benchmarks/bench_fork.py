@@ -0,0 +1,85 @@
+"""generating many near-identical files from a skeleton
+
+usage: python benchmarks/bench_fork.py [N ...]
+
+"rebuild" builds each file from scratch, "deepcopy" copies the skeleton, and
+"fork" shares it (copy on write). bytes are the memory to keep all N files.
+"""
+import sys
+import copy
+import time
+import tracemalloc
+import typing as t
+from prestring import Module
+
+
+def skeleton() -> Module:
+    m = Module()
+    m.stmt("import os")
+    m.anchor("imports")
+    m.stmt("")
+    for i in range(50):
+        helper = m.submodule()
+        helper.stmt("def helper{}(x: int) -> int:", i)
+        with helper.scope():
+            helper.stmt("return x + {}", i)
+        helper.stmt("")
+    m.anchor("body")
+    return m
+
+
+def add_body(m: Module, i: int) -> Module:
+    m.at("imports").stmt("import re")
+    body = m.at("body")
+    body.stmt("def main():")
+    with body.scope():
+        body.stmt("print({})", i)
+    return m
+
+
+def rebuild(base: Module, i: int) -> Module:
+    return add_body(skeleton(), i)
+
+
+def deepcopy(base: Module, i: int) -> Module:
+    return add_body(copy.deepcopy(base), i)
+
+
+def fork(base: Module, i: int) -> Module:
+    return add_body(base.fork(), i)
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [200, 1000]
+    print(
+        "{:<10} {:>6} {:>10} {:>10} {:>12}".format(
+            "make", "N", "build", "render", "bytes/file"
+        )
+    )
+    for n in sizes:
+        for make in (rebuild, deepcopy, fork):
+            base = skeleton()
+            str(base.fork() if make is fork else base)  # warm up (cached outputs)
+            st = time.perf_counter()
+            files = [make(base, i) for i in range(n)]
+            build_sec = time.perf_counter() - st
+            st = time.perf_counter()
+            for m in files:
+                str(m)
+            render_sec = time.perf_counter() - st
+            del files
+
+            tracemalloc.start()
+            files = [make(base, i) for i in range(n)]
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del files
+            print(
+                "{:<10} {:>6} {:>10.4f} {:>10.4f} {:>12.0f}".format(
+                    make.__name__, n, build_sec, render_sec, size / n
+                )
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
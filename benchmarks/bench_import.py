@@ -0,0 +1,92 @@
+"""import time of prestring and its subpackages (python -X importtime)
+
+usage: python benchmarks/bench_import.py [N ...]
+
+each module is imported N times (default 10) in a fresh interpreter, and the
+fastest one is reported. it exits with 1, if a module is over the budget, or
+if a deferred dependency (e.g. logging) is imported by `import <module>`.
+"""
+import os
+import re
+import sys
+import subprocess
+import typing as t
+
+# usec, the cumulative time (including typing, re, ...), generous for slow machines
+BUDGET = {
+    "prestring": 40000,
+    "prestring.python": 45000,
+    "prestring.go": 45000,
+    "prestring.output": 45000,
+    "prestring.codeobject": 45000,
+}
+# imported on first use, never by the imports above
+DEFERRED = [
+    "json",
+    "hashlib",
+    "logging",
+    "tempfile",
+    "typing_extensions",
+    "filecmp",
+    "pathlib",
+]
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure(module: str) -> t.Tuple[int, int, t.List[str]]:
+    """the cumulative and self time (usec) of module, and the deferred ones loaded"""
+    env = dict(os.environ)
+    env.pop("PRESTRING_PROFILE", None)
+    env.pop("PRESTRING_PROVENANCE", None)
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    cumulative = self_ = 0
+    loaded = []
+    for line in p.stderr.splitlines():
+        m = _LINE.match(line)
+        if m is None:
+            continue
+        if m.group(4) == module:
+            self_, cumulative = int(m.group(1)), int(m.group(2))
+        elif m.group(4) in DEFERRED:
+            loaded.append(m.group(4))
+    return cumulative, self_, loaded
+
+
+def main(argv: t.List[str]) -> int:
+    repeat = int(argv[0]) if argv else 10
+    subprocess.run(  # writing the .pyc files, in advance
+        [sys.executable, "-c", "import " + ", ".join(BUDGET)], check=True
+    )
+    failed = 0
+    print(
+        "{:<24} {:>10} {:>10} {:>10} {}".format(
+            "module", "usec", "self", "budget", "status"
+        )
+    )
+    for module, budget in BUDGET.items():
+        results = [measure(module) for _ in range(repeat)]
+        cumulative, self_, loaded = min(results)
+        status = "ok"
+        if cumulative > budget:
+            status = "over budget"
+        if loaded:
+            status = "imports " + ", ".join(loaded)
+        if status != "ok":
+            failed += 1
+        print(
+            "{:<24} {:>10} {:>10} {:>10} {}".format(
+                module, cumulative, self_, budget, status
+            )
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
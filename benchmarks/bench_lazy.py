@@ -0,0 +1,70 @@
+"""peak memory of a huge generated section (build + write_to)
+
+usage: python benchmarks/bench_lazy.py [N ...]
+
+"eager" builds the whole section before rendering, "lazy" generates it while
+rendering (Module.lazy_submodule).
+"""
+import sys
+import time
+import tracemalloc
+import typing as t
+from prestring import Module
+
+
+class NullWriter:
+    def __init__(self) -> None:
+        self.size = 0
+
+    def write(self, s: str) -> None:
+        self.size += len(s)
+
+
+def fill(n: int) -> t.Callable[[Module], t.Iterator[None]]:
+    def _fill(m: Module) -> t.Iterator[None]:
+        for i in range(n):
+            m.stmt("r.add_route({!r}, handler{})", f"/items/{i}", i)
+            if i % 1000 == 0:
+                yield
+
+    return _fill
+
+
+def eager(n: int, out: NullWriter) -> None:
+    m = Module()
+    m.stmt("def setup(r):")
+    with m.scope():
+        for _ in fill(n)(m.submodule()):
+            pass
+    m.write_to(out)  # type: ignore
+
+
+def lazy(n: int, out: NullWriter) -> None:
+    m = Module()
+    m.stmt("def setup(r):")
+    with m.scope():
+        m.lazy_submodule(fill(n))
+    m.write_to(out)  # type: ignore
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [20000, 200000]
+    print("{:<8} {:>8} {:>10} {:>14} {:>12}".format("build", "N", "sec", "peak bytes", "output"))
+    for n in sizes:
+        for run in (eager, lazy):
+            out = NullWriter()
+            tracemalloc.start()
+            st = time.perf_counter()
+            run(n, out)
+            sec = time.perf_counter() - st
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(
+                "{:<8} {:>8} {:>10.4f} {:>14} {:>12}".format(
+                    run.__name__, n, sec, peak, out.size
+                )
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,71 @@
+"""tokens/sec of Lexer.lex()
+
+usage: python benchmarks/bench_lexer.py [N ...]
+
+"classic" is the previous Lexer.lex(), checking the attributes of each token.
+"""
+import sys
+import timeit
+import typing as t
+from prestring import Module, Lexer, Sentence, INDENT, UNINDENT
+from prestring.codeobject import Symbol
+
+
+class ClassicLexer(Lexer):
+    def lex(
+        self,
+        source: t.Iterable[t.Any],
+        *,
+        tokens: t.Optional[t.List[t.Any]] = None,
+        sentence: t.Optional[Sentence] = None,
+    ) -> t.List[t.Any]:
+        r: t.List[t.Any] = tokens or self.container_factory()
+        if sentence is None:
+            sentence = self.sentence_factory()
+
+        for v in source:
+            if getattr(v, "kind", None) == "sep":
+                sentence.newline = v
+                r.append(sentence)
+                sentence = self.sentence_factory()
+            elif hasattr(v, "emit"):
+                r.append(v)
+            elif hasattr(v, "on_lex"):
+                r = v.on_lex(self, r, sentence)
+            elif v is INDENT or v is UNINDENT:
+                r.append(v)
+            else:
+                sentence.append(v)
+
+        if not sentence.is_empty():
+            r.append(sentence)
+        return r
+
+
+def build(n: int) -> Module:
+    m = Module()
+    x = Symbol("x")
+    for i in range(n):
+        m.stmt("def f{}(", i)
+        with m.scope():
+            m.stmt("return {}", x)
+        m.append("# ")
+        m.append(m.format("{}", i))
+        m.stmt("")
+    return m
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [10000, 100000]
+    print("{:<8} {:>8} {:>10} {:>14}".format("lexer", "N", "sec", "tokens/sec"))
+    for n in sizes:
+        m = build(n)
+        ntokens = len(list(m.body))
+        for lexer in (ClassicLexer(None, None), Lexer(None, None)):
+            sec = min(timeit.repeat(lambda: lexer.lex(m.body), number=1, repeat=7))
+            name = "classic" if isinstance(lexer, ClassicLexer) else "current"
+            print("{:<8} {:>8} {:>10.4f} {:>14.0f}".format(name, n, sec, ntokens / sec))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
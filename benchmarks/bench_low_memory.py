@@ -0,0 +1,90 @@
+"""resident size of a large generator run, with and without the low memory mode
+
+usage: python benchmarks/bench_low_memory.py [N ...]
+
+the generator writes the files of 500 schema objects each (N in total), the
+schema objects are only referenced by the format arguments. each module is
+rendered after built, and kept until the end (e.g. to write an index).
+each mode is run in a fresh process (PRESTRING_LOW_MEMORY), "rss" is the
+resident size at the end (/proc/self/statm), and "peak" is the max of it.
+"""
+import os
+import sys
+import subprocess
+import typing as t
+
+
+class Schema:
+    """a large input (e.g. a node of AST), rendered as its name"""
+
+    def __init__(self, i: int) -> None:
+        self.name = f"Model{i}"
+        self.fields = {
+            f"field{j}": {"type": "string", "description": "x" * 40, "tags": [j] * 8}
+            for j in range(20)
+        }
+
+    def __str__(self) -> str:
+        return self.name
+
+
+def rss() -> int:
+    with open("/proc/self/statm") as rf:
+        return int(rf.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def build(start: int, stop: int) -> t.Any:
+    from prestring.python import PythonModule
+
+    m = PythonModule()
+    for i in range(start, stop):
+        schema = Schema(i)
+        with m.class_(m.format("{}", schema)):
+            m.stmt("__schema__ = {!r}", m.format("{}", schema))
+            for name in schema.fields:
+                m.stmt("{}: str", name)
+    return m
+
+
+def run(n: int) -> None:
+    import resource
+
+    modules = []
+    size = 0
+    for start in range(0, n, 500):
+        m = build(start, min(start + 500, n))
+        size += len(str(m))  # written to the file
+        modules.append(m)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB on linux
+    print(rss(), peak, size)
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [2000, 10000]
+    print(
+        "{:<8} {:>8} {:>12} {:>12} {:>12}".format(
+            "mode", "N", "rss(MB)", "peak(MB)", "output(MB)"
+        )
+    )
+    for n in sizes:
+        for mode, env in [("default", ""), ("low", "1")]:
+            p = subprocess.run(
+                [sys.executable, __file__, "--run", str(n)],
+                env={**os.environ, "PRESTRING_LOW_MEMORY": env},
+                stdout=subprocess.PIPE,
+                universal_newlines=True,
+                check=True,
+            )
+            current, peak, size = map(int, p.stdout.split())
+            print(
+                "{:<8} {:>8} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+                    mode, n, current / 2 ** 20, peak / 2 ** 20, size / 2 ** 20
+                )
+            )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        run(int(sys.argv[2]))
+    else:
+        main(sys.argv[1:])
@@ -0,0 +1,74 @@
+"""rendering time of deeply nested scopes and submodules
+
+usage: python benchmarks/bench_nesting.py [N ...]
+
+usec/N should be (almost) constant, if rendering scales linearly.
+(the indentation itself is O(N^2) bytes, so the indent is a single space)
+"""
+import sys
+import timeit
+import contextlib
+import typing as t
+from prestring import Module
+
+
+def nested_scopes(n: int) -> Module:
+    m = Module(indent=" ")
+    with contextlib.ExitStack() as s:
+        for i in range(n):
+            m.stmt("if x == {}:", i)
+            s.enter_context(m.scope())
+        m.stmt("pass")
+    return m
+
+
+def nested_submodules(n: int) -> Module:
+    m = root = Module(indent=" ")
+    for i in range(n):
+        m.stmt("case {}:", i)
+        m = m.submodule()
+    m.stmt("pass")
+    return root
+
+
+def classic(m: Module) -> str:
+    tokens = m.lexer.lex(m.body)
+    return m.emitter.emit(m.parser.parse(tokens), m.create_evaulator())
+
+
+def streaming(m: Module) -> str:
+    return str(m)
+
+
+def uncache(m: Module) -> None:
+    # not using the cached output of submodules
+    stack = [m]
+    while stack:
+        target = stack.pop()
+        target.invalidate()
+        stack.extend(sub for sub in target.body if isinstance(sub, Module))
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [1000, 2000, 4000, 8000]
+    print(
+        "{:<18} {:<10} {:>8} {:>10} {:>10}".format("case", "render", "N", "sec", "usec/N")
+    )
+    for build in (nested_scopes, nested_submodules):
+        for render in (classic, streaming):
+            for n in sizes:
+                m = build(n)
+                sec = min(
+                    timeit.repeat(
+                        lambda: render(m), setup=lambda: uncache(m), number=1, repeat=3
+                    )
+                )
+                print(
+                    "{:<18} {:<10} {:>8} {:>10.4f} {:>10.3f}".format(
+                        build.__name__, render.__name__, n, sec, sec / n * 1e6
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,48 @@
+"""serial vs parallel rendering of a huge module (the lexing/parsing is excluded)
+
+usage: python benchmarks/bench_parallel.py [N ...]
+
+N is the number of toplevel functions (each has 5 lines). the speedup depends
+on the cores, the pickling cost of the snapshot is included.
+"""
+import os
+import sys
+import time
+import typing as t
+from prestring import Emitter, FrameList
+from prestring.python import PythonModule
+from prestring.parallel import ParallelEmitter
+
+
+def build(n: int) -> t.Tuple[PythonModule, FrameList]:
+    m = PythonModule()
+    for i in range(n):
+        with m.def_(f"handler{i}", "request", m.format("limit={}", i)):
+            m.stmt("data = request.json()")
+            with m.if_(m.format("len(data) > {}", i)):
+                m.return_(m.format("{!r}", f"/items/{i}"))
+            m.return_("data")
+    return m, m.parser.parse(m.lexer.lex(m.body))
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [50000, 200000]
+    cpus = os.cpu_count() or 1
+    emitters = [("serial", Emitter())] + [
+        (f"parallel({p})", ParallelEmitter(processes=p, min_items=0))
+        for p in sorted({2, 4, cpus})
+    ]
+    print("{:<14} {:>8} {:>10} {:>8}".format("emitter", "N", "sec", "ratio"))
+    for n in sizes:
+        base = 0.0
+        for name, emitter in emitters:
+            m, framelist = build(n)  # not rendered yet (LazyFormat caches the output)
+            st = time.perf_counter()
+            emitter.emit(framelist, m.create_evaulator())
+            sec = time.perf_counter() - st
+            base = base or sec
+            print("{:<14} {:>8} {:>10.4f} {:>8.2f}".format(name, n, sec, base / sec))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
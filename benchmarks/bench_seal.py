@@ -0,0 +1,70 @@
+"""peak memory of building a huge python module (build + write)
+
+usage: python benchmarks/bench_seal.py [N ...]
+
+"eager" builds all N functions before write_to(), "sealed" is bound to the
+output by stream_to(), and each toplevel def_ is written (and dropped) when it
+is left. the imports are added to an anchor, until the end.
+"""
+import sys
+import time
+import tracemalloc
+import typing as t
+from prestring.python import PythonModule
+
+
+class NullWriter:
+    def __init__(self) -> None:
+        self.size = 0
+
+    def write(self, s: str) -> None:
+        self.size += len(s)
+
+
+def build(m: PythonModule, n: int) -> None:
+    imports = m.anchor("imports")
+    for i in range(n):
+        if i % 100 == 0:
+            imports.import_(f"mod{i // 100}")
+        with m.def_(f"handler{i}", "request"):
+            m.stmt("data = request.json()")
+            with m.if_("not data"):
+                m.return_(f"mod{i // 100}.empty({i})")
+            m.return_("data")
+
+
+def eager(n: int, out: NullWriter) -> None:
+    m = PythonModule()
+    build(m, n)
+    m.write_to(out)  # type: ignore
+
+
+def sealed(n: int, out: NullWriter) -> None:
+    m = PythonModule().stream_to(out)  # type: ignore
+    build(m, n)
+    m.close()
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [2000, 20000]
+    print("{:<8} {:>8} {:>10} {:>14} {:>12}".format("build", "N", "sec", "peak bytes", "output"))
+    for n in sizes:
+        for run in (eager, sealed):
+            out = NullWriter()
+            st = time.perf_counter()
+            run(n, out)
+            sec = time.perf_counter() - st
+
+            tracemalloc.start()
+            run(n, NullWriter())
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(
+                "{:<8} {:>8} {:>10.4f} {:>14} {:>12}".format(
+                    run.__name__, n, sec, peak, out.size
+                )
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,59 @@
+"""rendering time of the files of the same shape, per module vs compiled template
+
+usage: python benchmarks/bench_template.py [N ...]
+
+"module" builds and renders a module for each file, "template" calls the
+compiled template for each file, and "batch" renders all files at once.
+"""
+import sys
+import time
+import typing as t
+from prestring.python import PythonModule
+from prestring.template import Slot, compile_template
+
+
+def build(name: t.Any, value: t.Any) -> PythonModule:
+    m = PythonModule()
+    m.from_("typing", "Any")
+    with m.class_(name):
+        with m.def_("__init__", "self", "value: Any"):
+            m.stmt("self.value = value")
+        with m.def_("get", "self"):
+            with m.if_("self.value is None"):
+                m.return_(m.format("{!r}", value))
+            m.return_("self.value")
+    m.stmt("default = {}(None)", name)
+    return m
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [1000, 10000]
+    print("{:<10} {:>8} {:>10} {:>10}".format("case", "N", "sec", "usec/N"))
+    for n in sizes:
+        names = ["Class{}".format(i) for i in range(n)]
+        values = list(range(n))
+
+        st = time.perf_counter()
+        expected = [str(build(name, value)) for name, value in zip(names, values)]
+        sec = time.perf_counter() - st
+        print("{:<10} {:>8} {:>10.4f} {:>10.3f}".format("module", n, sec, sec / n * 1e6))
+
+        st = time.perf_counter()
+        render = compile_template(build(Slot("name"), Slot("value")))
+        result = [render(name=name, value=value) for name, value in zip(names, values)]
+        sec = time.perf_counter() - st
+        assert result == expected
+        print(
+            "{:<10} {:>8} {:>10.4f} {:>10.3f}".format("template", n, sec, sec / n * 1e6)
+        )
+
+        st = time.perf_counter()
+        render = compile_template(build(Slot("name"), Slot("value")))
+        result = render.batch(name=names, value=values)
+        sec = time.perf_counter() - st
+        assert result == expected
+        print("{:<10} {:>8} {:>10.4f} {:>10.3f}".format("batch", n, sec, sec / n * 1e6))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
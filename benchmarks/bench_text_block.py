@@ -0,0 +1,50 @@
+"""embedding a large verbatim text, stmt() for each line vs text_block()
+
+usage: python benchmarks/bench_text_block.py [N ...]
+"""
+import sys
+import timeit
+import typing as t
+from prestring import Module
+
+
+def per_line(m: Module, text: str) -> None:
+    for line in text.split("\n"):
+        m.stmt(line)
+
+
+def text_block(m: Module, text: str) -> None:
+    m.text_block(text)
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [5000, 50000]
+    print(
+        "{:<10} {:>8} {:>8} {:>10} {:>10}".format(
+            "add", "N", "tokens", "build", "render"
+        )
+    )
+    for n in sizes:
+        text = "\n".join(f"line {i}" if i % 10 else "" for i in range(n))
+        for add in (per_line, text_block):
+
+            def build() -> Module:
+                m = Module()
+                m.stmt("def f():")
+                with m.scope():
+                    add(m, text)
+                return m
+
+            m = build()
+            ntokens = len(m.lexer.lex(m.body))
+            build_sec = min(timeit.repeat(build, number=1, repeat=5))
+            render_sec = min(timeit.repeat(lambda: str(build()), number=1, repeat=5))
+            print(
+                "{:<10} {:>8} {:>8} {:>10.4f} {:>10.4f}".format(
+                    add.__name__, n, ntokens, build_sec, render_sec - build_sec
+                )
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
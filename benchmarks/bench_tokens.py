@@ -0,0 +1,70 @@
+"""memory/time of the lexed tokens (sentences)
+
+usage: python benchmarks/bench_tokens.py [N ...]
+
+compares the current Sentence with the previous (dict based) one.
+"""
+import sys
+import timeit
+import tracemalloc
+import typing as t
+from prestring import Module, Lexer, Sentence
+from prestring.utils import LazyFormat
+
+
+class OldSentence:
+    # the previous implementation (has __dict__, emptiness is checked each time)
+    def __init__(self) -> None:
+        self.body: t.List[t.Any] = []
+        self.newline = None
+
+    def append(self, v: t.Any) -> "OldSentence":
+        self.body.append(v)
+        return self
+
+    def is_empty(self) -> bool:
+        return all(x == "" for x in self.body)
+
+    def __str__(self) -> str:
+        return "".join(map(str, self.body))
+
+
+def build(n: int, end: str = ")") -> Module:
+    m = Module()
+    for i in range(n):
+        m.stmt("func{}(", i)
+        with m.scope():
+            m.stmt(LazyFormat("x = {}", i))
+        m.stmt("}" + end)  # a fresh str per line, e.g. go's block end
+    return m
+
+
+def measure(m: Module, lexer: Lexer) -> t.Tuple[int, float]:
+    tracemalloc.start()
+    tokens = lexer.lex(m.body)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tokens
+    sec = min(timeit.repeat(lambda: lexer.lex(m.body), number=1, repeat=3))
+    return size, sec
+
+
+def main(argv: t.List[str]) -> None:
+    sizes = [int(x) for x in argv] or [10000, 100000]
+    print(
+        "{:<8} {:>8} {:>12} {:>10} {:>10}".format("sentence", "N", "bytes", "bytes/N", "sec")
+    )
+    for n in sizes:
+        m = build(n)
+        for cls in (OldSentence, Sentence):
+            size, sec = measure(m, Lexer(None, cls))  # type: ignore
+            name = "old" if cls is OldSentence else "current"
+            print(
+                "{:<8} {:>8} {:>12} {:>10.1f} {:>10.4f}".format(
+                    name, n, size, size / n, sec
+                )
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,255 @@
+"""rendering benchmarks, compared with the stored baselines (baseline.json)
+
+usage: python benchmarks/suite.py [--save] [--repeat N] [CASE ...]
+
+each case builds a module, and renders it with str(). the time of building and
+rendering is the fastest of the repeats, and the memory is the peak of
+tracemalloc while building and rendering (measured once, separately).
+the times are compared in the unit of a fixed pure python workload (measured
+next to each case), so the drift of the speed of the machine is cancelled.
+
+the results are compared with benchmarks/baseline.json, and it exits with 1 if
+a case is slower (or uses more memory) than the baseline beyond the threshold.
+--save writes the results as the new baseline (for the cases run), with the
+commit measured at (HEAD of the repository, if found).
+"""
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tracemalloc
+import typing as t
+from prestring import INDENT, UNINDENT, Module
+from prestring.python import PythonModule
+from prestring.python.codeobject import Module as PythonCodeObjectModule
+from prestring.go import GoModule
+from prestring.utils import LazyArguments, LazyJoin, LazyKeywords
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+THRESHOLD = {"build": 1.3, "render": 1.3, "peak": 1.10}  # ratio to the baseline
+
+
+def flat() -> Module:
+    m = Module()
+    for i in range(20000):
+        m.stmt("x{} = {}", i, i)
+    return m
+
+
+def nested() -> Module:
+    m = Module()
+    for i in range(20):
+        m.stmt("section{}", i)
+        with m.scope():
+            for depth in range(200):
+                m.stmt("level{}", depth)
+                m.body.append(INDENT)
+            for depth in range(200):
+                m.body.append(UNINDENT)
+    return m
+
+
+def python_module() -> Module:
+    m = PythonModule()
+    for i in range(500):
+        m.from_(f"pkg.mod{i % 50}", f"Name{i}")
+        m.import_(f"mod{i % 100}")
+    for i in range(500):
+        with m.class_(f"Class{i}", "Base"):
+            with m.def_("__init__", "self", "value: int"):
+                m.stmt("self.value = value")
+            with m.def_("get", "self", "default=None"):
+                with m.if_("self.value is None"):
+                    m.return_("default")
+                m.return_("self.value")
+    return m
+
+
+def go_module() -> Module:
+    m = GoModule()
+    m.package("main")
+    with m.import_group() as im:
+        for i in range(2000):
+            im.import_(f"example.com/pkg{i}")
+    with m.const_group() as cg:
+        for i in range(2000):
+            cg(f"Const{i} = {i}")
+    with m.func("main"):
+        for i in range(2000):
+            m.stmt("pkg{}.Run(Const{})", i, i)
+    return m
+
+
+def codeobject() -> Module:
+    m = PythonCodeObjectModule()
+    re = m.import_("re")
+    print_ = m.symbol("print")
+    for i in range(2000):
+        pattern = m.let(f"pattern{i}", re.compile(f"^item{i}$", re.IGNORECASE))
+        matched = m.let(f"matched{i}", pattern.search(f"item{i}").groupdict())
+        m.stmt(print_(matched.get("name", default=None)))
+    return m
+
+
+def lazy_format() -> Module:
+    m = Module()
+    for i in range(5000):
+        args = LazyArguments([f"x{i}", "y", "z"], {"z": "int"})
+        kwargs = LazyKeywords({"a": i, "b": f"'{i}'"})
+        m.stmt("f{}({}, {})", i, args, kwargs)
+        m.stmt("items = [{}]", LazyJoin(", ", [str(j) for j in range(i % 10)]))
+    return m
+
+
+CASES: t.Dict[str, t.Callable[[], Module]] = {
+    f.__name__: f
+    for f in (flat, nested, python_module, go_module, codeobject, lazy_format)
+}
+
+
+def calibrate(repeat: int) -> float:
+    """the time of a fixed pure python workload, the unit of the stored times"""
+
+    def work() -> str:
+        parts = []
+        for i in range(50000):
+            parts.append("x{} = {}".format(i, str(i).rjust(8)))
+        return "\n".join(parts)
+
+    best = float("inf")
+    for _ in range(repeat):
+        st = time.perf_counter()
+        work()
+        best = min(best, time.perf_counter() - st)
+    return best
+
+
+def measure(build: t.Callable[[], Module], repeat: int) -> t.Dict[str, float]:
+    build_sec = render_sec = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()  # the collections are the main source of the noise
+        try:
+            st = time.perf_counter()
+            m = build()
+            mid = time.perf_counter()
+            str(m)
+            end = time.perf_counter()
+        finally:
+            gc.enable()
+        build_sec = min(build_sec, mid - st)
+        render_sec = min(render_sec, end - mid)
+        del m
+
+    unit = calibrate(repeat)  # next to the case, the speed of the machine drifts
+
+    tracemalloc.start()
+    try:
+        str(build())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "build": round(build_sec, 6),
+        "render": round(render_sec, 6),
+        "unit": round(unit, 6),
+        "peak": peak,
+    }
+
+
+def compare(
+    result: t.Dict[str, float], baseline: t.Optional[t.Dict[str, float]]
+) -> t.Tuple[t.List[str], t.List[str]]:
+    """the ratios to the baseline (as columns), and the regressed metrics
+
+    the times are compared in the unit of calibrate(), not in seconds.
+    """
+    if baseline is None:
+        return ["-"] * len(THRESHOLD), []
+    ratios = []
+    regressed = []
+    for k, threshold in THRESHOLD.items():
+        if k == "peak":
+            ratio = result[k] / baseline[k]
+        else:
+            ratio = (result[k] / result["unit"]) / (baseline[k] / baseline["unit"])
+        ratios.append(f"{ratio:.2f}x")
+        if ratio > threshold:
+            regressed.append(k)
+    return ratios, regressed
+
+
+def commit() -> t.Optional[str]:
+    """the commit of the tree measured (None, if not in a git repository)"""
+    try:
+        p = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(BASELINE),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        )
+    except OSError:  # git is not installed
+        return None
+    if p.returncode != 0:
+        return None
+    return p.stdout.strip() or None
+
+
+def main(argv: t.List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--save", action="store_true", help="update the baseline")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("cases", nargs="*", metavar="CASE", help=", ".join(CASES))
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {unknown}")
+
+    stored: t.Dict[str, t.Any] = {"cases": {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as rf:
+            stored = json.load(rf)
+    machine = {"python": platform.python_version(), "machine": platform.machine()}
+    if stored.get("machine", machine) != machine:
+        print(f"# baseline taken on {stored['machine']}, not {machine}")
+    if stored.get("commit"):
+        print(f"# baseline measured at {stored['commit']}")
+
+    print(
+        "{:<14} {:>9} {:>9} {:>11} {:>7} {:>7} {:>7} {}".format(
+            "case", "build", "render", "peak", "build", "render", "peak", "status"
+        )
+    )
+    results = {}
+    failed = 0
+    for name in args.cases or CASES:
+        result = results[name] = measure(CASES[name], args.repeat)
+        ratios, regressed = compare(result, stored["cases"].get(name))
+        status = "regressed: " + ", ".join(regressed) if regressed else "ok"
+        if regressed and not args.save:
+            failed += 1
+        print(
+            "{:<14} {:>9.4f} {:>9.4f} {:>11} {:>7} {:>7} {:>7} {}".format(
+                name, result["build"], result["render"], result["peak"], *ratios, status
+            )
+        )
+
+    if args.save:
+        stored["machine"] = machine
+        stored["commit"] = commit()
+        stored["cases"].update(results)
+        with open(args.baseline, "w") as wf:
+            json.dump(stored, wf, indent=2, sort_keys=True)
+            wf.write("\n")
+        print(f"# saved to {args.baseline}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
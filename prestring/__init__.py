@@ -1,6 +1,7 @@
+import os
+import sys
 import typing as t
-import logging
-import contextlib
+import functools
 from io import StringIO
 from prestring.utils import (  # NOQA
     reify,
@@ -14,21 +15,41 @@ from prestring.utils import (  # NOQA
 )
 from .types import Stringer
 
-logger = logging.getLogger(__name__)
+if t.TYPE_CHECKING:
+    import weakref
+    from .cache import RenderCache
+    from .profile import RenderStats
+
 ModuleT = t.TypeVar("ModuleT", bound="Module")
 StmtTargetType = t.Union[str, "_Sentinel", LazyFormat, Stringer]
 
 
 class _Sentinel:
     __slots__ = ("name", "kind")
+    _registry: t.Dict[str, "_Sentinel"] = {}  # name -> sentinel, for unpickling
 
     def __init__(self, *, kind: str, name: str) -> None:
         self.kind = kind
         self.name = name
+        self._registry.setdefault(name, self)
 
     def __repr__(self) -> str:
         return f"<{self.name}>"
 
+    def __copy__(self) -> "_Sentinel":
+        return self  # compared by identity
+
+    def __deepcopy__(self, memo: t.Dict[int, t.Any]) -> "_Sentinel":
+        return self
+
+    def __reduce__(self) -> t.Tuple[t.Any, ...]:
+        # unpickled as the same object (the module defining it must be imported)
+        return (_sentinel, (self.name,))
+
+
+def _sentinel(name: str) -> _Sentinel:
+    return _Sentinel._registry[name]
+
 
 NEWLINE = _Sentinel(name="NEWLINE", kind="sep")
 
@@ -36,50 +57,144 @@ INDENT = _Sentinel(name="INDENT", kind="indent")
 UNINDENT = _Sentinel(name="UNINDENT", kind="indent")
 
 
+class _Owners:
+    """the owners of a nested PreString (see PreString.__iter__), held weakly"""
+
+    __slots__ = ("owners",)
+
+    def __init__(self, *owners: t.Any) -> None:
+        import weakref
+
+        self.owners: "weakref.WeakSet[t.Any]" = weakref.WeakSet(owners)
+
+    def add(self, owner: t.Any) -> None:
+        if owner not in self.owners:
+            self.owners.add(owner)
+
+    def _changing(self) -> None:
+        for owner in list(self.owners):
+            owner._changing()
+
+
 class PreString:
+    # notified before changes (see Module._changing, raises if immutable), or the
+    # PreString including this (set when iterated, e.g. rendered)
+    owner: t.Union[None, "Module", "PreString", _Owners] = None
+    _shared = False  # the body is shared with the forks (copied on write)
+    _notify = False  # _changing() is needed (e.g. the owner has cached output)
+
     def __init__(self, value: t.Any, other: t.Optional[t.Any] = None) -> None:
         self.body = [value]
         if other is not None:
             self.body.append(other)
 
+    def _changing(self) -> None:
+        if self.owner is not None:
+            self.owner._changing()
+        if self._shared:
+            self.body = list(self.body)
+            self._shared = False
+
+    def __getstate__(self) -> t.Dict[str, t.Any]:
+        state = self.__dict__.copy()
+        if self.owner.__class__ is _Owners:  # weak references, set when iterated
+            del state["owner"]
+        return state
+
+    def fork(self) -> "PreString":
+        """a copy sharing the body, the body is copied on the first change"""
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        new.owner = None
+        self._shared = new._shared = True
+        self._notify = new._notify = True
+        return new
+
     def clear(self) -> None:
+        if self._notify:
+            self._changing()
         self.body.clear()
 
     def __iadd__(self, value: t.Any) -> "PreString":
+        if self._notify:
+            self._changing()
         self.body.append(value)
         return self
 
     def __add__(self, value: t.Any) -> "PreString":
+        # O(1), the operands are shared (the later changes of them are visible)
         return self.__class__(self, value)
 
     def __iter__(self) -> t.Iterator[t.Any]:
-        for v in self.body:
-            if isinstance(v, PreString):
-                yield from iter(v)
-            else:
+        # nested PreStrings (e.g. a long chain of `+`) are walked with an explicit
+        # stack, so each value is yielded once, not through every nested generator
+        stack = [(self, iter(self.body))]
+        while stack:
+            parent, it = stack[-1]
+            for v in it:
+                if isinstance(v, PreString):
+                    v._adopted_by(parent)
+                    stack.append((v, iter(v.body)))
+                    break
                 yield v
+            else:
+                stack.pop()
+
+    def _adopted_by(self, parent: "PreString") -> None:
+        # the changes of this are notified to parent, too (the output is changed)
+        self._notify = True
+        # (weakly, the parents are not kept alive by a shared fragment)
+        owner = self.owner
+        if owner is None:
+            self.owner = _Owners(parent)
+        elif owner.__class__ is _Owners:
+            owner.add(parent)
+        elif owner is not parent:
+            self.owner = _Owners(owner, parent)
 
     def __str__(self) -> str:
         return "".join(str(v) for v in self)
 
     def insert_before(self, value: t.Any) -> None:
+        if self._notify:
+            self._changing()
         self.body.insert(0, value)
 
     def insert_after(self, value: t.Any) -> None:
         if getattr(self.body[-1], "kind", None) == "sep":
+            if self._notify:
+                self._changing()
             self.body.pop()
-            self.append(value)
+            self.body.append(value)
             self.body.append(NEWLINE)
         else:
             self.append(value)
 
     def append(self, value: t.Any) -> None:
+        if self._notify:
+            self._changing()
         self.body.append(value)
 
+    def extend(self, values: t.Iterable[t.Any]) -> None:
+        if self._notify:
+            self._changing()
+        self.body.extend(values)
+
+    def replace(self, old: t.Any, new: t.Any) -> None:
+        for i, v in enumerate(self.body):
+            if v is old:
+                if self._notify:
+                    self._changing()
+                self.body[i] = new
+                return
+        raise ValueError(f"{old!r} is not found")
+
     def tail(self) -> t.Any:
         return self.body[-1]
 
     def pop(self) -> t.Any:
+        if self._notify:
+            self._changing()
         return self.body.pop()
 
     def head(self) -> t.Any:
@@ -87,22 +202,100 @@ class PreString:
 
 
 class Sentence:
+    __slots__ = ("body", "newline", "_empty")
+
+    intern_size = 4  # short fragments (e.g. "}", "})") are shared, if interned
+
     def __init__(self) -> None:
         self.body: t.List[t.Any] = []
-        self.newline = None
+        self.newline: t.Any = None
+        self._empty = True  # tracked on append, instead of checking each time
 
     def append(self, v: t.Any) -> "Sentence":
+        if v.__class__ is str:
+            if v:
+                self._empty = False
+                if len(v) <= self.intern_size:
+                    v = sys.intern(v)
+        elif self._empty and v != "":
+            self._empty = False
         self.body.append(v)
         return self
 
     def is_empty(self) -> bool:
-        return all(x == "" for x in self.body)
+        return self._empty
 
     def __str__(self) -> str:
         return "".join(map(str, self.body))
 
 
+class TextBlock:
+    """verbatim lines, written at once (re-indented by Evaluator.do_block())"""
+
+    __slots__ = ("text", "newline", "nested")
+
+    def __init__(
+        self, text: str, *, newline: t.Any = NEWLINE, nested: t.Optional[str] = None
+    ) -> None:
+        self.text = text
+        self.newline = newline  # same as Sentence.newline
+        # the lines written in a nested frame, if different (e.g. see freeze())
+        self.nested = nested
+
+    def text_at(self, i: int) -> str:
+        """the lines written at the depth i (not indented yet)"""
+        if i > 0 and self.nested is not None:
+            return self.nested
+        return self.text
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class LazySubmodule:
+    """the content of a submodule, generated when lexing (see Module.lazy_submodule)"""
+
+    def __init__(
+        self,
+        fill: t.Callable[[t.Any], t.Optional[t.Iterable[t.Any]]],
+        factory: t.Callable[[], "Module"],
+    ) -> None:
+        self.fill = fill
+        self.factory = factory
+
+    def iter_items(self) -> t.Iterator[t.Any]:
+        m = self.factory()
+        body = m.body
+        generated = self.fill(m)
+        if generated is not None:
+            for _ in generated:
+                # the items added so far are passed, and dropped from the module
+                items, body.body = body.body, []
+                yield from items
+        items, body.body = body.body, []
+        yield from items
+
+    def on_lex(
+        self, lexer: "Lexer", tokens: t.List[t.Any], sentence: Sentence
+    ) -> t.Iterable[t.Any]:
+        return lexer.iter_lex(self.iter_items(), markers=False)
+
+
 class Lexer:
+    # how a token is handled (decided once per type, see classify() and register())
+    TEXT = "text"  # a part of the current sentence
+    SEP = "sep"  # the end of the current sentence
+    EMIT = "emit"  # an emittable, passed through as is
+    ON_LEX = "on_lex"  # expanded with v.on_lex()
+    MODULE = "module"  # a submodule (expanded in place, if on_lex is not changed)
+    SENTINEL = "sentinel"  # NEWLINE, INDENT, ... (decided by the kind of each)
+    DYNAMIC = "dynamic"  # decided per value
+
+    _registered: t.ClassVar[t.Dict[type, str]] = {}
+    _kinds: t.ClassVar[t.Dict[type, str]] = {str: TEXT}  # cache of classify()
+    # the texts never changed after the first str() (the others are volatile)
+    _stable: t.ClassVar[t.Set[type]] = {str}
+
     def __init__(
         self,
         container_factory: t.Optional[t.Callable[[], t.List[t.Any]]],
@@ -111,6 +304,86 @@ class Lexer:
         self.container_factory = container_factory or list
         self.sentence_factory = sentence_factory or Sentence
 
+    @classmethod
+    def register(cls, typ: type, kind: str) -> None:
+        """registers the handling of the tokens of typ (and of its subclasses)"""
+        Lexer._registered[typ] = kind
+        Lexer._kinds.clear()
+        Lexer._kinds[str] = Lexer.TEXT
+
+    @classmethod
+    def classify(cls, typ: type) -> str:
+        """the handling of the tokens of typ, decided by the class attributes
+
+        if the instances can answer differently (__getattr__, slots, properties,
+        or their own __dict__, unless registered), the value is classified each
+        time (DYNAMIC).
+        """
+        kind = cls._kinds.get(typ)
+        if kind is not None:
+            return kind
+
+        for base in typ.__mro__:
+            kind = cls._registered.get(base)
+            if kind is not None:
+                break
+        else:
+            kind = cls._classify_type(typ)
+        cls._kinds[typ] = kind
+        return kind
+
+    @classmethod
+    def _classify_type(cls, typ: type) -> str:
+        if issubclass(typ, _Sentinel):
+            return cls.SENTINEL
+        if hasattr(typ, "__getattr__"):
+            return cls.DYNAMIC
+        for name in ("kind", "emit", "on_lex"):
+            v = getattr(typ, name, None)
+            if hasattr(type(v), "__set__"):  # slot or property
+                return cls.DYNAMIC
+
+        if issubclass(typ, Module):
+            if typ.default_on_lex is not Module.default_on_lex:
+                return cls.ON_LEX
+            return cls.MODULE
+        elif typ.__dictoffset__:  # e.g. self.on_lex = ... in __init__
+            return cls.DYNAMIC
+        elif getattr(typ, "kind", None) == "sep":
+            return cls.SEP
+        elif hasattr(typ, "emit"):
+            return cls.EMIT
+        elif hasattr(typ, "on_lex"):
+            return cls.ON_LEX
+        else:
+            return cls.TEXT
+
+    @classmethod
+    def kind_of(cls, v: t.Any) -> str:
+        """the handling of v (same as classify(), but DYNAMIC is resolved)"""
+        kind = cls._kinds.get(v.__class__) or cls.classify(v.__class__)
+        if kind == cls.SENTINEL:
+            if v.kind == "sep":
+                return cls.SEP
+            return cls.SENTINEL if v is INDENT or v is UNINDENT else cls.TEXT
+        elif kind != cls.DYNAMIC:
+            return kind
+
+        if getattr(v, "kind", None) == "sep":
+            return cls.SEP
+        elif hasattr(v, "emit"):
+            return cls.EMIT
+        elif hasattr(v, "on_lex"):
+            if isinstance(v, Module):
+                if type(v).default_on_lex is not Module.default_on_lex:
+                    return cls.ON_LEX
+                return cls.MODULE
+            return cls.ON_LEX
+        elif v is INDENT or v is UNINDENT:
+            return cls.SENTINEL
+        else:
+            return cls.TEXT
+
     def lex(
         self,
         source: t.Iterable[t.Any],
@@ -118,27 +391,133 @@ class Lexer:
         tokens: t.Optional[t.List[t.Any]] = None,
         sentence: t.Optional[Sentence] = None,
     ) -> t.List[t.Any]:
-        r: t.List[t.Any] = tokens or self.container_factory()
+        r: t.List[t.Any] = tokens if tokens is not None else self.container_factory()
+        r.extend(self.iter_lex(source, sentence=sentence, markers=False))
+        return r
+
+    def iter_lex(
+        self,
+        source: t.Iterable[t.Any],
+        *,
+        sentence: t.Optional[Sentence] = None,
+        module: t.Optional["Module"] = None,
+        markers: bool = True,
+        capture: bool = True,
+    ) -> t.Iterator[t.Any]:
+        """generator version of lex(), nested submodules are walked in place
+
+        the submodules that are not changed after the last rendering are yielded
+        as Rendered tokens. module is the owner of source (invalidated by them).
+        the texts other than str and the lazy objects (e.g. an object joining a
+        list in __str__) can be changed without any mutation, so are VOLATILE.
+        if capture is False, the submodules are not marked (ENTER, LEAVE and
+        VOLATILE), so the outputs of them are not cached (see FrameWriter).
+        if markers is False, only the plain tokens are yielded (same as lex()).
+        """
         if sentence is None:
             sentence = self.sentence_factory()
 
-        for v in source:
-            if getattr(v, "kind", None) == "sep":
-                sentence.newline = v
-                r.append(sentence)
-                sentence = self.sentence_factory()
-            elif hasattr(v, "emit"):
-                r.append(v)
-            elif hasattr(v, "on_lex"):
-                r = v.on_lex(self, r, sentence)
-            elif v is INDENT or v is UNINDENT:
-                r.append(v)
+        stack: t.List[t.Tuple[t.Iterator[t.Any], Sentence, t.Optional[Module]]] = []
+        it = iter(source)
+        level = 0  # same as FrameList.level
+        get_kind = self._kinds.get
+        classify = self.classify
+        stable = self._stable
+        sentence_factory = self.sentence_factory
+        while True:
+            for v in it:
+                kind = get_kind(type(v)) or classify(type(v))
+                if kind == "dynamic":
+                    kind = self.kind_of(v)
+
+                if kind == "text":
+                    sentence.append(v)
+                    if (
+                        v.__class__ is not str
+                        and v.__class__ not in stable
+                        and markers
+                        and capture
+                        and (module is None or not module.immutable)
+                    ):
+                        yield VOLATILE
+                elif kind == "sentinel":
+                    if v.kind == "sep":
+                        sentence.newline = v
+                        yield sentence
+                        sentence = sentence_factory()
+                    elif v is INDENT:
+                        level += 1
+                        yield v
+                    elif v is UNINDENT:
+                        level -= 1
+                        yield v
+                    else:
+                        sentence.append(v)
+                elif kind == "sep":
+                    sentence.newline = v
+                    yield sentence
+                    sentence = sentence_factory()
+                elif kind == "emit":
+                    yield v
+                elif kind == "module" or kind == "on_lex":
+                    inline = kind == "module" and v.on_lex == v.default_on_lex
+                    # the output of immutable modules is cached, even if on_lex is
+                    # changed (and the on_lex tokens in them are not volatile)
+                    captured = inline or (kind == "module" and v.immutable)
+                    if markers:
+                        if captured:
+                            if module is not None and not v.immutable:
+                                v._add_parent(module)
+                            rendered = v._rendered
+                            if rendered is not None and rendered is not _NOCACHE:
+                                if rendered.available(level):
+                                    yield rendered
+                                    continue
+                            if capture:
+                                yield Marker(ENTER, v)
+                        elif capture and (module is None or not module.immutable):
+                            yield VOLATILE
+
+                    if inline:
+                        # same as default_on_lex(), but without recursion
+                        stack.append((it, sentence, module))
+                        it = iter(v.body)
+                        sentence = sentence_factory()
+                        module = v
+                        break
+
+                    for tok in v.on_lex(self, self.container_factory(), sentence):
+                        if tok is INDENT:
+                            level += 1
+                        elif tok is UNINDENT:
+                            level -= 1
+                        yield tok
+                    if markers and captured and capture:
+                        yield Marker(LEAVE, v)
+                else:
+                    raise ValueError(f"unknown token kind {kind!r} (of {v!r})")
             else:
-                sentence.append(v)
-
-        if not sentence.is_empty():
-            r.append(sentence)
-        return r
+                if not sentence.is_empty():
+                    yield sentence
+                if not stack:
+                    return
+                if markers and capture:
+                    yield Marker(LEAVE, module)
+                it, sentence, module = stack.pop()
+
+
+Lexer.register(TextBlock, Lexer.EMIT)  # an item by itself, as an emittable
+Lexer.register(LazySubmodule, Lexer.ON_LEX)
+# the lazy objects never answer per instance, so these are not asked each time
+for _cls in (
+    LazyFormat,
+    LazyArguments,
+    LazyJoin,
+    LazyKeywords,
+    LazyArgumentsAndKeywords,
+):
+    Lexer.register(_cls, Lexer.TEXT)
+    Lexer._stable.add(_cls)  # the value is computed once (reify)
 
 
 class FrameList:
@@ -146,6 +525,7 @@ class FrameList:
         self.framelist: t.List[t.List[t.Any]] = [[]]
         self.level = 0
         self.current: t.List[t.Any] = self.framelist[-1]
+        self._opened = [self.current]  # path from the last toplevel frame
 
     @t.overload  # noqa F811
     def __getitem__(self, k: int) -> t.List[t.Any]:
@@ -163,21 +543,23 @@ class FrameList:
     def push_frame(self) -> t.List[t.Any]:
         self.current = []
         self.level += 1
-        target = self.framelist
-        for i in range(self.level):
-            target = target[-1]
-        target.append(self.current)
+        if self.level > 0:
+            self._opened[-1].append(self.current)
+            self._opened.append(self.current)
+        else:  # unbalanced
+            self.framelist.append(self.current)
+            self._opened = [self.current]
         return self.current
 
     def pop_frame(self) -> t.List[t.Any]:
-        current: t.List[t.Any] = []
         self.level -= 1
-        target = self.framelist
-        for i in range(self.level):
-            target = target[-1]
-        if not target[-1]:
-            target.append(current)
-        self.current = target[-1]
+        if self.level > 0:
+            self._opened.pop()
+        else:
+            if not self.framelist[-1]:
+                self.framelist.append([])
+            self._opened = [self.framelist[-1]]
+        self.current = self._opened[-1]
         return self.current
 
 
@@ -199,6 +581,8 @@ class Parser:
 
 
 class Emitter:
+    bufsize = 1024  # the number of pending writes, before yielding a chunk
+
     def emit(self, framelist: FrameList, evaluator: "Evaluator") -> str:
         for frame in framelist[:-1]:
             evaluator.evaluate(frame)
@@ -206,6 +590,301 @@ class Emitter:
         evaluator.evaluate(framelist[-1])
         return str(evaluator)
 
+    def iter_emit(
+        self, tokens: t.Iterable[t.Any], evaluator: "Evaluator", *, chunked: bool = True
+    ) -> t.Iterator[str]:
+        """streaming version of emit(), the joined chunks are equal to emit()'s result"""
+        writer = FrameWriter(evaluator)
+        if chunked:
+            bufsize = self.bufsize
+            for tok in tokens:
+                writer.feed(tok)
+                if writer.tell() >= bufsize:
+                    chunk = writer.drain()
+                    if chunk:
+                        yield chunk
+        else:
+            for tok in tokens:
+                writer.feed(tok)
+        chunk = writer.drain()
+        if chunk:
+            yield chunk
+
+
+class Rendered:
+    """the cached output of a submodule (see FrameWriter)"""
+
+    __slots__ = ("parts", "depth", "newline", "empty", "reindentable")
+
+    def __init__(
+        self,
+        parts: t.Tuple[t.Union[str, "Rendered"], ...],
+        *,
+        depth: int,
+        newline: t.Any = None,
+        empty: bool = False,
+        reindentable: bool = True,
+    ) -> None:
+        self.parts = parts
+        self.depth = depth
+        self.newline = newline  # the newline of the last sentence (for do_newline)
+        self.empty = empty  # no code is included
+        self.reindentable = reindentable
+
+    def available(self, level: int) -> bool:
+        if self.empty:
+            return True
+        if level < 0:  # unbalanced, INDENT starts a new toplevel frame
+            return False
+        if level == self.depth:
+            return True
+        # toplevel is special (e.g. PythonEvaluator inserts blank lines there)
+        return self.reindentable and level > 0 and self.depth > 0
+
+    def iter_parts(self) -> t.Iterator[str]:
+        # parts may include the Rendered of nested submodules (without copying)
+        stack = [iter(self.parts)]
+        while stack:
+            for part in stack[-1]:
+                if part.__class__ is Rendered:
+                    stack.append(iter(part.parts))
+                    break
+                yield part  # type: ignore
+            else:
+                stack.pop()
+
+    def __str__(self) -> str:
+        return "".join(self.iter_parts())
+
+
+_NOCACHE = _Sentinel(name="NOCACHE", kind="rendered")  # rendered, but not cached
+
+
+class Marker:
+    __slots__ = ("kind", "module")
+
+    def __init__(self, kind: str, module: t.Optional["Module"] = None) -> None:
+        self.kind = kind
+        self.module = module
+
+    def __repr__(self) -> str:
+        return f"<{self.kind} {self.module!r}>"
+
+
+ENTER = "enter"  # the beginning of a submodule
+LEAVE = "leave"  # the end of a submodule
+VOLATILE = Marker("volatile")  # the output can be changed without any mutation
+
+
+class _Capture:
+    __slots__ = (
+        "module",
+        "level",
+        "depth",
+        "start",
+        "pos",
+        "parts",
+        "low",
+        "valid",
+        "reindentable",
+    )
+
+    def __init__(self, module: "Module", *, level: int, depth: int) -> None:
+        self.module = module
+        self.level = level
+        self.depth = depth
+        self.start: t.Optional[int] = None  # index of the first written piece
+        self.pos = 0  # index of the piece, not stored in parts yet
+        self.parts: t.List[t.Union[str, Rendered]] = []
+        self.low = level  # the lowest level, while capturing
+        self.valid = True
+        self.reindentable = True
+
+
+class _Buffer:
+    """io like object, written pieces are kept until drained"""
+
+    def __init__(self) -> None:
+        self.pieces: t.List[str] = []
+        self.write = self.pieces.append
+
+
+class FrameWriter:
+    """Parser and Emitter in a single pass.
+
+    tokens are evaluated as soon as they are fed, so only the output that is not
+    drained yet is kept in memory (the framelist is never built).
+
+    the output of each submodule is captured between ENTER and LEAVE markers, and
+    it is cached on the submodule as a Rendered token, if the output doesn't
+    depend on its surroundings (balanced indentation, no VOLATILE tokens).
+    """
+
+    _EMPTY = _Sentinel(name="EMPTY", kind="frame")  # frame has no code yet
+    _FRAME: t.List[t.Any] = []  # placeholder of an evaluated child frame
+
+    def __init__(self, evaluator: "Evaluator") -> None:
+        self.evaluator = evaluator
+        self.buffer = evaluator.io = _Buffer()  # type: ignore
+        self.level = 0
+        # the last code of each open frame (outermost first)
+        self.frames: t.List[t.Any] = [self._EMPTY]
+        self.captures: t.List[_Capture] = []
+        self._flushed = 0
+        self._pending = ""  # trailing whitespace, dropped if nothing follows
+
+    def feed(self, token: t.Any) -> None:
+        if token is INDENT:
+            self.push_frame()
+        elif token is UNINDENT:
+            self.pop_frame()
+        elif token.__class__ is Marker:
+            module = token.module
+            if module is None:  # VOLATILE
+                if self.captures:
+                    self.captures[-1].valid = False
+            elif token.kind == ENTER:
+                self.enter(module)
+            else:
+                self.leave(module)
+        elif token.__class__ is Rendered:
+            self.add_rendered(token)
+        else:
+            self.add_code(token)
+
+    def _newline(self, i: int) -> None:
+        prev = self.frames[i]
+        if prev is not self._EMPTY:
+            self.evaluator.do_newline(prev, i)
+        if self.captures and self.captures[-1].start is None:
+            start = len(self.buffer.pieces)
+            for c in reversed(self.captures):
+                if c.start is not None:
+                    break
+                c.start = c.pos = start
+
+    def add_code(self, code: t.Any) -> None:
+        i = len(self.frames) - 1
+        self._newline(i)
+        self.frames[i] = code
+        if code.__class__ is TextBlock:  # all lines are indented, so reindentable
+            self.evaluator.do_block(code.text_at(i), i)
+            return
+        text = str(code)
+        self.evaluator.do_code(text, i)
+        if self.captures and self.evaluator.newline in text:
+            self.captures[-1].reindentable = False
+
+    def add_rendered(self, rendered: Rendered) -> None:
+        if rendered.empty:
+            return
+        i = len(self.frames) - 1
+        self._newline(i)
+        self.frames[i] = rendered
+
+        part: t.Union[str, Rendered] = rendered
+        if rendered.depth != i:
+            part = self.evaluator.reindent(str(rendered), rendered.depth, i)
+
+        pieces = self.buffer.pieces
+        if self.captures:  # shared with the parent, instead of copying
+            c = self.captures[-1]
+            if c.pos < len(pieces):
+                c.parts.append("".join(pieces[c.pos :]))  # noqa E203
+            c.parts.append(part)
+            c.reindentable = c.reindentable and rendered.reindentable
+        if part is rendered:
+            pieces.extend(rendered.iter_parts())
+        else:
+            pieces.append(part)  # type: ignore
+        if self.captures:
+            self.captures[-1].pos = len(pieces)
+
+    def push_frame(self) -> None:
+        self.level += 1
+        if self.level <= 0:  # unbalanced, FrameList starts a new toplevel frame
+            self.new_toplevel_frame()
+            return
+        i = len(self.frames) - 1
+        self._newline(i)
+        self.frames[i] = self._FRAME
+        self.frames.append(self._EMPTY)
+
+    def pop_frame(self) -> None:
+        self.level -= 1
+        if self.captures and self.captures[-1].low > self.level:
+            self.captures[-1].low = self.level
+        if self.level > 0:
+            self.frames.pop()
+        elif self.frames[0] is self._EMPTY:
+            self.new_toplevel_frame()
+        else:
+            del self.frames[1:]
+
+    def new_toplevel_frame(self) -> None:
+        self.evaluator.do_newframe()
+        self.frames = [self._EMPTY]
+        if self.captures:
+            self.captures[-1].valid = False
+
+    def enter(self, module: "Module") -> None:
+        depth = len(self.frames) - 1
+        self.captures.append(_Capture(module, level=self.level, depth=depth))
+
+    def leave(self, module: "Module") -> None:
+        c = self.captures.pop()
+        assert c.module is module
+        module.body._notify = True  # the cached output is dropped on change
+        parent = self.captures[-1] if self.captures else None
+        if parent is not None:
+            parent.valid = parent.valid and c.valid
+            parent.reindentable = parent.reindentable and c.reindentable
+            if parent.low > c.low:
+                parent.low = c.low
+
+        if not c.valid or c.low < c.level or c.level != self.level:
+            module._rendered = _NOCACHE
+            return
+
+        if c.start is None:
+            module._rendered = Rendered((), depth=c.depth, empty=True)
+            return
+
+        pieces = self.buffer.pieces
+        if c.pos < len(pieces):
+            c.parts.append("".join(pieces[c.pos :]))  # noqa E203
+        rendered = module._rendered = Rendered(
+            tuple(c.parts),
+            depth=c.depth,
+            newline=getattr(self.frames[c.depth], "newline", None),
+            reindentable=c.reindentable,
+        )
+        if parent is not None:  # shared with the parent, instead of copying
+            if parent.pos < c.start:
+                parent.parts.append("".join(pieces[parent.pos : c.start]))  # noqa
+            parent.parts.append(rendered)
+            parent.pos = len(pieces)
+
+    def tell(self) -> int:
+        return len(self.buffer.pieces) - self._flushed
+
+    def drain(self) -> str:
+        """returns the output written so far (trailing whitespace is held back)"""
+        pieces = self.buffer.pieces
+        s = "".join(pieces[self._flushed :])  # noqa E203
+        if self.captures:
+            self._flushed = len(pieces)
+        else:
+            pieces.clear()
+            self._flushed = 0
+
+        body = s.rstrip()
+        if not body:
+            self._pending += s
+            return ""
+        s, self._pending = self._pending + body, s[len(body) :]  # noqa E203
+        return s
+
 
 class Evaluator:
     def __init__(self, io: StringIO, indent: str = "    ", newline: str = "\n"):
@@ -214,18 +893,37 @@ class Evaluator:
         self.newline = newline
 
     def evaluate(self, frame: t.Sequence[t.Any], i: int = 0) -> None:
-        if not frame:
-            return
-        for code in frame[:-1]:
-            self.do_code(code, i)
-            self.do_newline(code, i)
-        self.do_code(frame[-1], i)
+        # nested frames are evaluated with an explicit stack, instead of recursion
+        stack: t.List[t.Tuple[t.Sequence[t.Any], int]] = []
+        k = 0
+        while True:
+            while k < len(frame):
+                code = frame[k]
+                if k > 0:
+                    self.do_newline(frame[k - 1], i)
+                k += 1
+                if isinstance(code, (list, tuple)):
+                    stack.append((frame, k))
+                    frame, k, i = code, 0, i + 1
+                else:
+                    self.do_code(code, i)
+            if not stack:
+                return
+            frame, k = stack.pop()
+            i -= 1
 
     def do_code(
         self, code: t.Union[t.List[t.Any], t.Tuple[t.Any, ...], t.Any], i: int
     ) -> None:
         if isinstance(code, (list, tuple)):
             self.evaluate(code, i + 1)
+        elif code.__class__ is TextBlock:
+            self.do_block(code.text_at(i), i)
+        elif code.__class__ is Rendered:  # same as FrameWriter.add_rendered()
+            text = str(code)
+            if code.depth != i:
+                text = self.reindent(text, code.depth, i)
+            self.io.write(text)
         else:
             sentence = str(code)
             if sentence == "":
@@ -240,14 +938,342 @@ class Evaluator:
         self.io.write(self.newline)
 
     def do_indent(self, i: int) -> None:
-        for _ in range(i):
-            self.io.write(self.indent)
+        if i > 0:
+            self.io.write(self.indent * i)
+
+    def do_block(self, text: str, i: int) -> None:
+        # same as writing each line with do_code(), but at once
+        if text == "":
+            return
+        self.io.write(self.reindent(text, 0, i) if i > 0 else text)
+
+    def reindent(self, text: str, src: int, dst: int) -> str:
+        """moves the text evaluated at depth=src, to depth=dst"""
+        lines = text.split(self.newline)
+        if dst > src:
+            prefix = self.indent * (dst - src)
+            lines = [prefix + line if line else line for line in lines]
+        else:
+            n = len(self.indent) * (src - dst)
+            lines = [line[n:] for line in lines]
+        return self.newline.join(lines)
 
     def __str__(self) -> str:
         return self.io.getvalue().rstrip()
 
 
+class _Stream:
+    """the state of a module bound to a stream (see Module.stream_to())
+
+    the sealed items are rendered by a single FrameWriter, so the output is the
+    same as rendering them at once. the output following an open anchor is spooled
+    (with a new FrameWriter, starting at the toplevel), until the anchor is closed.
+    """
+
+    spool_size = 1 << 20  # the spooled output is kept in memory, until this size
+
+    def __init__(self, module: "Module", fp: t.IO[str]) -> None:
+        self.module = module
+        self.fp = fp
+        self.head = self.writer = FrameWriter(module.create_evaulator())
+        # (open anchor, writer of the following output, spooled output)
+        self.deferred: t.List[t.Tuple[Module, FrameWriter, t.IO[str]]] = []
+        self._pending = ""  # trailing whitespace, dropped if nothing follows
+        # the scanning state of the (not sealed) body
+        self.scanned = 0
+        self.level = 0
+        self.partial = False  # in the middle of a sentence
+        self.sealable = 0
+        self.blocked = False
+
+    def _anchors(self) -> t.Set[int]:
+        anchors = self.module._anchors
+        return {id(v) for v in anchors.values()} if anchors else set()
+
+    def scan(self, body: t.List[t.Any]) -> int:
+        """the number of the leading items completed at the toplevel"""
+        if len(body) < self.scanned:  # popped, scanning again
+            self.scanned = self.level = self.sealable = 0
+            self.partial = self.blocked = False
+        if self.blocked:
+            return self.sealable
+
+        lexer = self.module.lexer
+        get_kind = lexer._kinds.get
+        anchors = self._anchors()
+        level, partial, sealable = self.level, self.partial, self.sealable
+        for i in range(self.scanned, len(body)):
+            item = body[i]
+            for v in item if isinstance(item, PreString) else (item,):
+                if v is INDENT:
+                    level += 1
+                elif v is UNINDENT:
+                    level -= 1
+                else:
+                    kind = get_kind(type(v)) or lexer.classify(type(v))
+                    if kind == Lexer.DYNAMIC:
+                        kind = lexer.kind_of(v)
+                    if kind == Lexer.TEXT:
+                        partial = partial or v != ""
+                    elif kind == Lexer.SEP or kind == Lexer.SENTINEL:
+                        partial = v.kind != "sep"
+                    elif id(v) in anchors and (level != 0 or partial):
+                        # cannot be rendered apart from here, so sealed at close()
+                        self.blocked = True
+                        self.scanned, self.sealable = i, sealable
+                        return sealable
+            if level == 0 and not partial:
+                sealable = i + 1
+        self.scanned = len(body)
+        self.level, self.partial, self.sealable = level, partial, sealable
+        return sealable
+
+    def seal(self, body: PreString) -> None:
+        n = self.scan(body.body)
+        if n == 0:
+            return
+        body._changing()
+        items = body.body[:n]
+        del body.body[:n]
+        self.scanned -= n
+        self.sealable = 0
+        self.feed(items)
+        # the sealed submodules are never written again, so changing them raises
+        anchors = self._anchors()
+        for v in items:
+            if isinstance(v, Module) and id(v) not in anchors and not v.immutable:
+                v.mark_immutable()
+
+    def feed(self, items: t.List[t.Any]) -> None:
+        anchors = self._anchors()
+        if not anchors:
+            self._feed(items)
+            return
+
+        import tempfile
+
+        start = 0
+        for i, v in enumerate(items):
+            if id(v) in anchors:
+                self._feed(items[start:i])
+                self.writer = FrameWriter(self.module.create_evaulator())
+                spool = tempfile.SpooledTemporaryFile(
+                    max_size=self.spool_size, mode="w+"
+                )
+                self.deferred.append((v, self.writer, spool))
+                start = i + 1
+        self._feed(items[start:])
+
+    def _feed(self, items: t.List[t.Any]) -> None:
+        if not items:
+            return
+        writer = self.writer
+        pieces = writer.buffer.pieces
+        bufsize = self.module.emitter.bufsize
+        for tok in self.module.lexer.iter_lex(_flatten(items), markers=False):
+            writer.feed(tok)
+            if len(pieces) >= bufsize:
+                self._flush()
+        self._flush()
+
+    def _flush(self) -> None:
+        pieces = self.writer.buffer.pieces
+        s = "".join(pieces)
+        pieces.clear()
+        if self.deferred:
+            self.deferred[-1][2].write(s)
+        else:
+            self.write(s)
+
+    def write(self, s: str) -> None:
+        body = s.rstrip()
+        if not body:
+            self._pending += s
+            return
+        self.fp.write(self._pending + body)
+        self._pending = s[len(body) :]  # noqa E203
+
+    def _separator(self, prev: t.Any) -> str:
+        if prev is FrameWriter._EMPTY:
+            return ""
+        evaluator = self.module.create_evaulator()
+        evaluator.io = buf = _Buffer()  # type: ignore
+        evaluator.do_newline(prev, 0)
+        return "".join(buf.pieces)
+
+    def close(self, items: t.List[t.Any]) -> None:
+        """writes the rest, and the open anchors (with the output following them)"""
+        self._feed(items)  # the anchors in them are closed, too
+        prev = self.head.frames[0]
+        for anchor, writer, spool in self.deferred:
+            rendering = FrameWriter(self.module.create_evaulator())
+            for tok in self.module.lexer.iter_lex([anchor], markers=False):
+                rendering.feed(tok)
+            last = rendering.frames[0]
+            if last is not FrameWriter._EMPTY:
+                self.write(self._separator(prev) + "".join(rendering.buffer.pieces))
+                prev = last
+            if writer.frames[0] is not FrameWriter._EMPTY:
+                self.write(self._separator(prev))
+                spool.seek(0)
+                for chunk in iter(functools.partial(spool.read, 1 << 16), ""):
+                    self.write(chunk)
+                prev = writer.frames[0]
+            spool.close()
+        self.deferred.clear()
+        self._pending = ""
+
+
+def _flatten(items: t.Iterable[t.Any]) -> t.Iterator[t.Any]:
+    # the nested PreStrings are walked, same as iterating PreString
+    for v in items:
+        if isinstance(v, PreString):
+            yield from v
+        else:
+            yield v
+
+
+def _fingerprint(root: "Module") -> str:
+    # hashing the items of each module, after its submodules (without recursion)
+    lexer = root.lexer
+    get_kind = lexer._kinds.get
+    classify = lexer.classify
+    stable = lexer._stable
+    stack: t.List[t.Tuple[Module, t.Iterator[t.Any], t.List[t.Any], bool]] = []
+    m, it, parts, volatile = root, iter(root.body), _header(root), False
+    while True:
+        for v in it:
+            kind = get_kind(type(v)) or classify(type(v))
+            if kind == "dynamic":
+                kind = lexer.kind_of(v)
+
+            if kind == "text":  # the empty ones are skipped (never in the output)
+                if v.__class__ is str:
+                    if v:
+                        parts.append(v)
+                else:
+                    text = str(v)
+                    if text:
+                        parts.append(text)
+                    volatile = volatile or (
+                        v.__class__ not in stable and not m.immutable
+                    )
+            elif kind == "sentinel" or kind == "sep":
+                parts.append([_name_of(v)])
+            elif kind == "emit":
+                parts.append(_hashable(v))
+            elif kind == "module":
+                if not v.immutable:
+                    v._add_parent(m)  # invalidated together (see invalidate())
+                if v.on_lex != v.default_on_lex:
+                    parts.append(_lexed(lexer, v))
+                    volatile = volatile or not v.immutable
+                elif v._fingerprint is not None:
+                    parts.append(["m", v._fingerprint])
+                else:
+                    stack.append((m, it, parts, volatile))
+                    m, it, parts, volatile = v, iter(v.body), _header(v), False
+                    break
+            elif kind == "on_lex":
+                parts.append(_lexed(lexer, v))
+                volatile = volatile or not m.immutable
+            else:
+                raise ValueError(f"unknown token kind {kind!r} (of {v!r})")
+        else:
+            digest = _digest(parts)
+            if not volatile:
+                m._fingerprint = digest
+                m.body._notify = True
+            if not stack:
+                return digest
+            nested = volatile
+            m, it, parts, volatile = stack.pop()
+            parts.append(["m", digest])
+            volatile = volatile or nested
+
+
+def _header(m: "Module") -> t.List[t.Any]:
+    cls = m.__class__
+    return [f"{cls.__module__}:{cls.__qualname__}", m.indent, m.newline]
+
+
+def _name_of(v: t.Any) -> t.Optional[str]:
+    if v is None:
+        return None
+    if v.__class__ is _Sentinel:
+        return v.name
+    return f"{v.__class__.__module__}:{v.__class__.__qualname__}"
+
+
+def _hashable(tok: t.Any) -> t.List[t.Any]:
+    if tok.__class__ is _Sentinel:
+        return [tok.name]
+    if tok.__class__ is TextBlock:
+        return ["b", tok.text, tok.nested, _name_of(tok.newline)]
+    return ["c", str(tok), _name_of(getattr(tok, "newline", None))]
+
+
+def _lexed(lexer: Lexer, v: t.Any) -> t.List[t.Any]:
+    # the on_lex tokens are hashed with their output (e.g. FromStatement)
+    tokens = v.on_lex(lexer, lexer.container_factory(), lexer.sentence_factory())
+    return ["x", *map(_hashable, tokens)]
+
+
+def _digest(parts: t.List[t.Any]) -> str:
+    import json
+    import hashlib
+
+    data = json.dumps(parts, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class Scope:
+    """the indented block, same as a contextmanager but without a generator
+
+    value is returned by __enter__(), and on_exit() is called after the block, if
+    no error is raised in it.
+    """
+
+    __slots__ = ("module", "value", "on_exit")
+
+    def __init__(
+        self,
+        module: "Module",
+        value: t.Any = None,
+        on_exit: t.Optional[t.Callable[[], t.Any]] = None,
+    ) -> None:
+        self.module = module
+        self.value = value
+        self.on_exit = on_exit
+
+    def __enter__(self) -> t.Any:
+        self.module.body.append(INDENT)
+        return self.value
+
+    def __exit__(
+        self,
+        exc: t.Optional[t.Type[BaseException]],
+        value: t.Optional[BaseException],
+        tb: t.Any,
+    ) -> None:
+        self.module.body.append(UNINDENT)
+        if exc is None and self.on_exit is not None:
+            self.on_exit()
+
+
 class Module:
+    immutable = False  # see mark_immutable()
+    _anchors: t.Optional[t.Dict[str, "Module"]] = None  # see anchor()
+    _stream: t.Optional[_Stream] = None  # see stream_to()
+    _fingerprint: t.Optional[str] = None  # see fingerprint()
+    _shared = False  # shared with the forks, copied for them on change (see fork())
+    _borrowed: t.Optional[t.Set["Module"]] = None  # the handles shared (see at())
+    _forked_from: t.Optional["Module"] = None  # see fork()
+    # the modules including this, weakly (see invalidate() and _detach())
+    _parents: t.Optional["weakref.WeakSet[Module]"] = None
+    render_cache: t.Optional["RenderCache"] = None  # used by str(), opt-in
+    render_stats: t.Optional["RenderStats"] = None  # see prestring.profile
+
     def create_body(self, value: t.Any, other: t.Optional[t.Any] = None) -> PreString:
         return PreString(value)
 
@@ -268,6 +1294,8 @@ class Module:
         ] = None,
     ):
         self.body = self.create_body(value)
+        self.body.owner = self
+        self._rendered: t.Union[None, _Sentinel, Rendered] = None
         self.indent = indent
         self.newline = newline
         self.lexer = lexer or Lexer(container_factory=list, sentence_factory=Sentence)
@@ -275,6 +1303,14 @@ class Module:
         self.emitter = emitter or Emitter()
         self.on_lex = on_lex or self.default_on_lex
 
+    def __getstate__(self) -> t.Dict[str, t.Any]:
+        # the weak references are not pickled, and the caches invalidated by them
+        state = self.__dict__.copy()
+        for name in ("_parents", "_forks", "_fingerprint"):
+            state.pop(name, None)
+        state["_rendered"] = None
+        return state
+
     def clear(self) -> None:
         self.body.clear()
 
@@ -292,6 +1328,23 @@ class Module:
             t.Callable[[Lexer, t.List[t.Any], Sentence], t.List[t.Any]]
         ] = None,
     ) -> ModuleT:
+        submodule = self._new_submodule(
+            value, newline=newline, factory=factory, on_lex=on_lex
+        )
+        self.body.append(submodule)
+        return submodule
+
+    def _new_submodule(
+        self: ModuleT,
+        value: t.Any = "",
+        *,
+        newline: bool = True,
+        factory: t.Optional[t.Callable[..., ModuleT]] = None,
+        on_lex: t.Optional[
+            t.Callable[[Lexer, t.List[t.Any], Sentence], t.List[t.Any]]
+        ] = None,
+    ) -> ModuleT:
+        # not placed yet (e.g. placed after registered, see anchor())
         factory_ = factory or self.__class__
         submodule = factory_(
             indent=self.indent,
@@ -305,13 +1358,37 @@ class Module:
             submodule.append(value)
         else:
             submodule.stmt(value)
-        self.body.append(submodule)
         return submodule
 
+    def lazy_submodule(
+        self: ModuleT,
+        fill: t.Callable[[ModuleT], t.Optional[t.Iterable[t.Any]]],
+        *,
+        factory: t.Optional[t.Callable[..., ModuleT]] = None,
+    ) -> LazySubmodule:
+        """adds a submodule, filled by fill(m) when rendering (on each rendering)
+
+        if fill is a generator function, the items added to m before each yield
+        are emitted and dropped, so the whole content is never kept in memory.
+        """
+        lazy = LazySubmodule(
+            fill,
+            functools.partial(
+                factory or self.__class__,
+                indent=self.indent,
+                newline=self.newline,
+                lexer=self.lexer,
+                parser=self.parser,
+                emitter=self.emitter,
+            ),
+        )
+        self.body.append(lazy)
+        return lazy
+
     def stmt(
         self: ModuleT, fmt: StmtTargetType, *args: t.Any, **kwargs: t.Any,
     ) -> ModuleT:
-        if hasattr(fmt, "emit"):
+        if fmt.__class__ is not str and hasattr(fmt, "emit"):
             if getattr(fmt, "emit", None) is not None:  # Emittable
                 assert not args
                 assert not kwargs
@@ -326,15 +1403,221 @@ class Module:
         self.body.append(NEWLINE)
         return self
 
-    @contextlib.contextmanager
-    def scope(self) -> t.Iterator[None]:
+    def stmts(self: ModuleT, fmts: t.Iterable[StmtTargetType]) -> ModuleT:
+        """same as calling stmt() for each (without the format arguments), at once"""
+        items: t.List[t.Any] = []
+        append = items.append
+        for fmt in fmts:
+            if fmt.__class__ is str or not hasattr(fmt, "emit"):
+                append(fmt)
+                append(NEWLINE)
+            else:
+                self.body.extend(items)
+                items.clear()
+                self.stmt(fmt)
+        self.body.extend(items)
+        return self
+
+    def anchor(self: ModuleT, name: str) -> ModuleT:
+        """places a named insertion point here, the content is added later via at()"""
+        anchors = self.__dict__.setdefault("_anchors", {})
+        if name in anchors:
+            raise ValueError(f"anchor {name!r} is already placed")
+        submodule = self._new_submodule("", newline=False)
+        if anchors.setdefault(name, submodule) is not submodule:  # by other thread
+            raise ValueError(f"anchor {name!r} is already placed")
+        self.body.append(submodule)
+        return submodule
+
+    def at(self: ModuleT, name: str) -> ModuleT:
+        """the submodule placed by anchor(name) (adding to it is O(1))"""
+        if self._anchors is None or name not in self._anchors:
+            raise KeyError(f"anchor {name!r} is not found")
+        submodule = self._anchors[name]
+        borrowed = self._borrowed
+        if borrowed and submodule in borrowed and not self.immutable:
+            submodule = self.unshare(submodule)
+        return submodule  # type: ignore
+
+    def fork(self: ModuleT) -> ModuleT:
+        """a copy of this module, sharing the body structurally (copied on write)
+
+        the submodules are shared, and copied for the forks on the first change
+        of them (see _detach()). the changeable copy of them in the fork is made
+        by at() (or unshare()).
+        """
+        import weakref
+
+        stack: t.List[Module] = [self]
+        while stack:
+            m = stack.pop()
+            for v in m.body:
+                if isinstance(v, Module) and not v.immutable:
+                    v._add_parent(m)  # walked up on change
+                    if not v._shared:  # the submodules of shared ones are shared
+                        v._shared = v.body._notify = True
+                        stack.append(v)
+
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        new.immutable = False
+        new.body = self.body.fork()
+        new.body.owner = new
+        new._forked_from = self  # the parents of the shared submodules are alive
+        new.__dict__.pop("_parents", None)
+        new.__dict__.pop("_shared", None)
+        new.__dict__.pop("_forks", None)
+        if self.on_lex == self.default_on_lex:
+            new.on_lex = new.default_on_lex
+        if self._anchors is not None:
+            new._anchors = dict(self._anchors)
+            new._borrowed = set(self._anchors.values())
+        new._stream = None
+        self.__dict__.setdefault("_forks", weakref.WeakSet()).add(new)
+        return new
+
+    def unshare(self, submodule: ModuleT) -> ModuleT:
+        """replaces the (shared) submodule in the body, with its fork"""
+        new = submodule.fork()
         try:
-            self.body.append(INDENT)
-            yield
-        finally:
-            self.body.append(UNINDENT)
+            self.body.replace(submodule, new)
+        except ValueError:  # already removed (e.g. clear()), not placed
+            pass
+        self._replaced(submodule, new)
+        return new
+
+    def _add_parent(self, parent: "Module") -> None:
+        # held weakly, the parents are not kept alive by the shared submodules
+        parents = self._parents
+        if parents is None:
+            import weakref
+
+            parents = self.__dict__.setdefault("_parents", weakref.WeakSet())
+        if parent not in parents:
+            parents.add(parent)
+
+    def _replaced(self, old: "Module", new: "Module") -> None:
+        # the handles of old (e.g. the anchors) are moved to new
+        if self._borrowed is not None:
+            self._borrowed.discard(old)
+        if self._anchors is not None:
+            for name, v in self._anchors.items():
+                if v is old:
+                    self._anchors[name] = new
+
+    def _detach(self) -> None:
+        # before the first change after shared: the forks sharing this module
+        # (through the shared parents) get the copy of it, and of the parents
+        detached: t.List[Module] = []
+        paths: t.List[t.List[Module]] = [[self]]  # from an ancestor to self
+        while paths:
+            path = paths.pop()
+            m = path[0]
+            forks = m.__dict__.get("_forks")
+            if forks is not None and len(path) > 1:
+                for fork in list(forks):
+                    fork._copy_path(path)
+            if m is self or m._shared:
+                detached.append(m)
+                for parent in m._parents or ():
+                    if parent in path:  # (the stale parents, removed)
+                        continue
+                    if parent._shared or "_forks" in parent.__dict__:
+                        paths.append([parent, *path])
+        for m in detached:  # not shared with any fork, after copied
+            m._shared = False
+
+    def _copy_path(self, path: t.List["Module"]) -> None:
+        # self is a fork of path[0], the modules in the path are copied if shared
+        m = self
+        for v in path[1:]:
+            body = m.body
+            if not any(x is v for x in body.body):  # not shared (or removed)
+                return
+            if v.on_lex == v.default_on_lex:
+                new = v.fork()
+            else:  # rendered by on_lex (e.g. Group), the output is kept as is
+                new = v._snapshot()
+            # replaced without notified (the output is not changed)
+            body.body = [new if x is v else x for x in body.body]
+            body._shared = False
+            new._add_parent(m)
+            m._replaced(v, new)
+            m = new
+
+    def _snapshot(self: ModuleT) -> ModuleT:
+        # an immutable module of the current output of self (rendered by on_lex)
+        new = self._new_submodule("", newline=False)
+        block = new._text_block(self.lexer.lex([self]))
+        if block is not None:
+            new.body.append(block)
+        return new.mark_immutable()
+
+    def text_block(self: ModuleT, text: str) -> ModuleT:
+        """adds the lines of text as a single item (indented, when rendering)
+
+        the output is the same as calling stmt() for each line (separated by
+        the newline of this module).
+        """
+        self.body.append(TextBlock(text))
+        return self
+
+    def freeze(self: ModuleT) -> ModuleT:
+        """replaces the body with its output (a single TextBlock), and marks immutable
+
+        the output is rendered as toplevel and as nested (if different, e.g. the
+        blank lines of PythonEvaluator), and re-indented where it is placed.
+        if the lines cannot be re-indented (a code including newlines, e.g.
+        multi-line strings), or the output depends on the surroundings (unbalanced
+        INDENT and UNINDENT), the body is kept (only marked as immutable).
+        """
+        tokens = self.lexer.lex(self.body)
+        level = 0
+        for tok in tokens:
+            if tok is INDENT:
+                level += 1
+            elif tok is UNINDENT:
+                level -= 1
+                if level < 0:
+                    return self.mark_immutable()
+            elif tok.__class__ is not TextBlock and self.newline in str(tok):
+                return self.mark_immutable()
+        if level != 0:
+            return self.mark_immutable()
+
+        block = self._text_block(tokens)
+        if block is not None:  # None, if no code
+            self.body.clear()
+            self.body.append(block)
+        return self.mark_immutable()
+
+    def _text_block(self, tokens: t.List[t.Any]) -> t.Optional[TextBlock]:
+        # the output of tokens (as toplevel, and as nested), None if no code
+        newline = None
+        for tok in reversed(tokens):
+            if tok is not INDENT and tok is not UNINDENT:  # the last code
+                newline = getattr(tok, "newline", None) or NEWLINE
+                break
+        if newline is None:
+            return None
+        text = self._emit_all(tokens)
+        nested = self._emit_all([INDENT, *tokens, UNINDENT])
+        nested = self.create_evaulator().reindent(nested, 1, 0)
+        return TextBlock(
+            text, newline=newline, nested=None if nested == text else nested
+        )
+
+    def _emit_all(self, tokens: t.List[t.Any]) -> str:
+        evaluator = self.create_evaulator()
+        self.emitter.emit(self.parser.parse(tokens), evaluator)
+        return evaluator.io.getvalue()  # not stripped (e.g. the trailing empty line)
+
+    def scope(self) -> Scope:
+        return Scope(self)
 
     def insert_before(self, value: t.Any) -> None:
+        if self._stream is not None:
+            raise RuntimeError("cannot insert before the sealed items, use anchor()")
         self.body.insert_before(value)
 
     def append(self, value: t.Any) -> None:
@@ -343,11 +1626,136 @@ class Module:
     def insert_after(self, value: t.Any) -> None:
         self.body.insert_after(value)
 
+    def _changing(self) -> None:
+        # called before the body is changed (see PreString._changing)
+        if self._rendered is not None or self._fingerprint is not None:
+            self.invalidate()
+        elif self.immutable:
+            raise RuntimeError(f"{self!r} is immutable")
+        if self._shared:
+            self._detach()
+
+    def invalidate(self) -> None:
+        """drops the cached output (and fingerprint) of this module and its parents"""
+        if self.immutable:
+            raise RuntimeError(f"{self!r} is immutable")
+        stack = [self]
+        while stack:
+            m = stack.pop()
+            if m._rendered is None and m._fingerprint is None:
+                continue
+            m._rendered = None
+            m._fingerprint = None
+            body = m.body
+            if body.owner is m and not (body._shared or m._shared or m.immutable):
+                body._notify = False  # until cached again
+            if m._parents:
+                stack.extend(m._parents)
+
+    def fingerprint(self) -> str:
+        """a stable hash of the content of this module, computed without rendering
+
+        cached per submodule, and dropped along the path to the changed one (see
+        invalidate()). the output of on_lex tokens (e.g. FromStatement) is hashed,
+        and the modules including them are not cached (unless immutable).
+        """
+        return self._fingerprint or _fingerprint(self)
+
+    def mark_immutable(self: ModuleT) -> ModuleT:
+        """marks this module and its submodules as never changed after this
+
+        the output is cached across renders (even if including on_lex tokens, so
+        the lazy objects in it must not be changed, too). changing raises.
+        """
+        stack: t.List[Module] = [self]
+        while stack:
+            m = stack.pop()
+            m.immutable = m.body._notify = True
+            stack.extend(v for v in m.body if isinstance(v, Module) and not v.immutable)
+        return self
+
     def __str__(self) -> str:
+        rendered = self._rendered
+        if rendered.__class__ is Rendered and rendered.depth == 0:
+            return str(rendered).rstrip()
+        if self.render_cache is not None:
+            return self.render_cache.render(self)
+        return "".join(self.iter_chunks(chunked=False, cache=True))
+
+    def iter_chunks(
+        self, *, chunked: bool = True, cache: bool = False
+    ) -> t.Iterator[str]:
+        """rendering without building the whole output, "".join(chunks) == str(m)
+
+        if cache is True, the outputs of the submodules are kept for the next
+        renders (as str() does). the cached outputs are used, anyway.
+        if the parser or emitter is customized (e.g. emit() is overridden), the
+        output is emit(parse(lex())), built at once.
+        """
         evaluator = self.create_evaulator()
-        tokens = self.lexer.lex(self.body)
-        framelist = self.parser.parse(tokens)
-        return self.emitter.emit(framelist, evaluator)
+        parser, emitter = self.parser, self.emitter
+        if (
+            type(parser).parse is not Parser.parse
+            or parser.framelist_factory is not FrameList
+            or (
+                type(emitter).emit is not Emitter.emit
+                and type(emitter).iter_emit is Emitter.iter_emit
+            )
+        ):
+            output = emitter.emit(parser.parse(self.lexer.lex(self.body)), evaluator)
+            if output:
+                yield output
+            return
+        if (
+            self.immutable
+            and self.on_lex == self.default_on_lex
+            and self.lexer.kind_of(self) == Lexer.MODULE
+        ):  # cached, as a toplevel submodule
+            tokens = self.lexer.iter_lex([self], capture=cache)
+        else:
+            tokens = self.lexer.iter_lex(self.body, module=self, capture=cache)
+        if self.render_stats is None:
+            yield from self.emitter.iter_emit(tokens, evaluator, chunked=chunked)
+        else:
+            stats = self.render_stats
+            yield from stats.iter_emit(self, tokens, evaluator, chunked=chunked)
+        if self._rendered is None:
+            self._rendered = _NOCACHE
+            self.body._notify = True
+
+    def write_to(self, fp: t.IO[str]) -> None:
+        for chunk in self.iter_chunks():
+            fp.write(chunk)
+
+    def stream_to(self: ModuleT, fp: t.IO[str]) -> ModuleT:
+        """binds this module to fp, the sealed items are written to fp and dropped
+
+        the anchors placed at the toplevel are kept open until close(), the
+        output following them is spooled.
+        """
+        if self._stream is not None:
+            raise RuntimeError(f"{self!r} is already bound to a stream")
+        self._stream = _Stream(self, fp)
+        return self
+
+    def seal(self) -> None:
+        """writes the items completed at the toplevel to the stream, and drops them
+
+        the sealed submodules are marked as immutable (changing them raises).
+        """
+        if self._stream is None:
+            raise RuntimeError(f"{self!r} is not bound to a stream, see stream_to()")
+        self._stream.seal(self.body)
+
+    def close(self) -> None:
+        """writes the rest to the stream (the output is the same as write_to())"""
+        stream = self._stream
+        if stream is None:
+            return
+        items = list(self.body.body)
+        self.body.clear()
+        self._stream = None
+        stream.close(items)
 
     def default_on_lex(
         self, lexer: Lexer, tokens: t.List[t.Any], sentence: Sentence
@@ -355,3 +1763,42 @@ class Module:
         return lexer.lex(self.body, tokens=tokens)
 
     format = LazyFormat
+
+
+# the subpackages and the rarely used attributes are imported on first access
+_SUBMODULES = frozenset(
+    [
+        "cache",
+        "codeobject",
+        "go",
+        "ir",
+        "minifs",
+        "naming",
+        "output",
+        "parallel",
+        "profile",
+        "provenance",
+        "python",
+        "template",
+        "text",
+    ]
+)
+
+
+def __getattr__(name: str) -> t.Any:
+    if name in _SUBMODULES:
+        import importlib
+
+        return importlib.import_module(f"{__name__}.{name}")
+    elif name == "logger":
+        import logging
+
+        logger = globals()["logger"] = logging.getLogger(__name__)
+        return logger
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if os.environ.get("PRESTRING_PROFILE", ""):  # the report is written at exit
+    import prestring.profile  # noqa F401
+if os.environ.get("PRESTRING_PROVENANCE", ""):  # stmt() records the call sites
+    import prestring.provenance  # noqa F401
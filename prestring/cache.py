@@ -0,0 +1,168 @@
+"""on-disk cache of the rendered outputs, keyed by the content hash of modules
+
+    cache = RenderCache(".prestring-cache")
+    m.render_cache = cache  # or PythonModule.render_cache = cache
+    print(m)  # rendered once, read from the cache in the next runs
+    print(cache.hits, cache.misses)
+
+the entries are files named by the key (see key(), by default), and the least
+recently used ones are evicted if the total size is over max_size.
+a hash of the inputs can be used as the key, too (see lookup()).
+"""
+import os
+import hashlib
+import logging
+import tempfile
+import functools
+import typing as t
+
+if t.TYPE_CHECKING:
+    from prestring import Module
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    def __init__(self, directory: str, *, max_size: int = 64 << 20) -> None:
+        self.directory = directory
+        self.max_size = max_size  # bytes
+        self.hits = 0
+        self.misses = 0
+        self._size: t.Optional[int] = None  # the total size (scanned lazily)
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} {self.directory!r}"
+            f" hits={self.hits} misses={self.misses}>"
+        )
+
+    def path(self, key: str) -> str:
+        if not key.isalnum():
+            raise ValueError(f"invalid key {key!r}")
+        return os.path.join(self.directory, key[:2], key)
+
+    def key(self, m: "Module") -> str:
+        """the key of the output of m
+
+        Module.fingerprint(), with the hash of the sources of prestring and the
+        class of the evaluator (the output of the same module can be changed by
+        them).
+        """
+        cls = type(m.create_evaulator())
+        data = f"{m.fingerprint()}:{_sources()}:{cls.__module__}:{cls.__qualname__}"
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+    def render(self, m: "Module") -> str:
+        """same as str(m), the output is read from the cache if found"""
+        key = self.key(m)
+        text = self.get(key)
+        if text is None:
+            text = "".join(m.iter_chunks(chunked=False, cache=True))
+            self.put(key, text)
+        return text
+
+    def lookup(self, key: str, build: t.Callable[[], "Module"]) -> str:
+        """the output cached by key (e.g. a hash of the inputs), or str(build())
+
+        the module is built only if not found (the lazy objects in it are not
+        evaluated for fingerprint(), too).
+        """
+        text = self.get(key)
+        if text is None:
+            text = "".join(build().iter_chunks(chunked=False))
+            self.put(key, text)
+        return text
+
+    def get(self, key: str) -> t.Optional[str]:
+        path = self.path(key)
+        try:
+            with open(path, encoding="utf-8", newline="") as rf:
+                text = rf.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # the mtime is used as the last access time
+        except FileNotFoundError:  # evicted by another process
+            pass
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self.path(key)
+        data = text.encode("utf-8")
+        dirname = os.path.dirname(path)
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmppath = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as wf:
+                wf.write(data)
+            os.replace(tmppath, path)  # atomic, even if shared by the processes
+        except BaseException:
+            os.remove(tmppath)
+            raise
+
+        if self._size is None:
+            self._size = sum(size for _, _, size in self._scan())
+        else:
+            self._size += len(data)
+        if self._size > self.max_size:
+            self.evict()
+
+    def evict(self) -> None:
+        """removes the least recently used entries, until the total size fits"""
+        entries = sorted(self._scan())
+        size = sum(size for _, _, size in entries)
+        for _, path, n in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= n
+            logger.debug("evicted %s", path)
+        self._size = size
+
+    def clear(self) -> None:
+        for _, path, _ in self._scan():
+            os.remove(path)
+        self._size = 0
+
+    def _scan(self) -> t.Iterator[t.Tuple[float, str, int]]:
+        # (mtime, path, size) of each entry
+        try:
+            subdirs = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for subdir in subdirs:
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield (st.st_mtime, entry.path, st.st_size)
+
+
+@functools.lru_cache(maxsize=None)
+def _sources() -> str:
+    # the imported sources, not the version of the installed distribution (e.g.
+    # an editable install, changed after installed)
+    import prestring
+
+    here = os.path.dirname(os.path.abspath(prestring.__file__))
+    h = hashlib.blake2b(digest_size=16)
+    for dirpath, dirnames, filenames in os.walk(here):
+        dirnames[:] = sorted(d for d in dirnames if d not in ("tests", "__pycache__"))
+        for name in sorted(filenames):
+            if not name.endswith(".py"):
+                continue
+            path = os.path.join(dirpath, name)
+            h.update(os.path.relpath(path, here).encode("utf-8") + b"\0")
+            with open(path, "rb") as rf:
+                h.update(rf.read())
+    return h.hexdigest()
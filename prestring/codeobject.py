@@ -1,10 +1,15 @@
 from functools import update_wrapper
+import sys
 import typing as t
-import typing_extensions as tx
-from prestring import StmtTargetType, ModuleT
+from prestring import StmtTargetType, ModuleT, Lexer
 from prestring.utils import LazyArgumentsAndKeywords, UnRepr
 from .types import Stringer
 
+if sys.version_info >= (3, 8):
+    import typing as tx
+else:  # pragma: no cover
+    import typing_extensions as tx
+
 InternalModuleT = t.TypeVar("InternalModuleT", bound="InternalModule")
 
 
@@ -176,6 +181,11 @@ class Call:
         return str(self._co)
 
 
+# not asking each instance (__getattr__ returns an Attr for any name)
+for _cls in (Symbol, Attr, Call):
+    Lexer.register(_cls, Lexer.EMIT)
+
+
 def codeobject(
     emit: t.Callable[[InternalModuleT, str], InternalModuleT],
     *,
@@ -1,6 +1,5 @@
 import typing as t
-import contextlib
-import logging
+import functools
 import re
 import warnings
 from prestring import Module as _Module
@@ -11,6 +10,7 @@ from prestring import (
     UNINDENT,
     Sentence as Sentence,
     Lexer as _Lexer,
+    Scope,
 )
 
 from prestring.utils import (
@@ -20,7 +20,6 @@ from prestring.utils import (
 )
 from prestring.types import StrOrStringer
 
-logger = logging.getLogger(__name__)
 GoModuleT = t.TypeVar("GoModuleT", bound="GoModule")
 GroupT = t.TypeVar("GroupT", bound="Group")
 
@@ -40,25 +39,33 @@ class GoModule(_Module):
     def sep(self) -> None:
         self.body.append(NEWLINE)
 
-    @contextlib.contextmanager
     def block(
         self,
         value: t.Union[None, str, LazyFormat] = None,
         *,
         end: str = "}",
         surround: bool = True,
-    ) -> t.Iterator[None]:
+    ) -> Scope:
         if value is None:
             self.stmt("{")
         else:
             self.body.append(value)
             self.body.append(" {")
             self.body.append(NEWLINE)
-        with self.scope():
-            yield
         if not end.startswith("}") and surround:
             end = "}" + end
-        self.stmt(end)
+        return Scope(self, on_exit=functools.partial(self.stmt, end))
+
+    def _definition(self, value: LazyFormat) -> Scope:
+        scope = self.block(value)
+        scope.on_exit = self._end_definition
+        return scope
+
+    def _end_definition(self) -> None:
+        self.stmt("}")
+        self.sep()
+        if self._stream is not None:  # sealed, if this block is at the toplevel
+            self.seal()
 
     def comment(self, comment: StrOrStringer) -> None:
         self.stmt(LazyFormat("// {}", comment))
@@ -78,78 +85,61 @@ class GoModule(_Module):
         self.stmt(LazyFormat("type {} = {}", name, value))
         self.sep()
 
-    @contextlib.contextmanager
-    def type_(self, name: t.Optional[str], *args: t.Any) -> t.Iterator[None]:
-        with self.block(LazyFormat("type {} {}", name, LazyJoin(" ", list(args)))):
-            yield
-        self.sep()
+    def type_(self, name: t.Optional[str], *args: t.Any) -> Scope:
+        return self._definition(
+            LazyFormat("type {} {}", name, LazyJoin(" ", list(args)))
+        )
 
-    @contextlib.contextmanager
-    def struct(self, name: str) -> t.Iterator[None]:
-        with self.type_(name, "struct"):
-            yield
+    def struct(self, name: str) -> Scope:
+        return self.type_(name, "struct")
 
-    @contextlib.contextmanager
     def func(
         self, name: str, *args: t.Any, returns: str = "", return_: str = ""
-    ) -> t.Iterator[None]:
+    ) -> Scope:
         if return_:
             warnings.warn(
-                "return_ option is deprecated. use returns", stacklevel=3,
+                "return_ option is deprecated. use returns", stacklevel=2,
             )
             returns = returns or return_
 
         if returns:
             returns = " " + returns.lstrip("")
 
-        with self.block(
+        return self._definition(
             LazyFormat("func {}({}){}", name, LazyArguments(list(args)), returns)
-        ):
-            yield
-        self.sep()
+        )
 
-    @contextlib.contextmanager
     def method(
         self, ob: str, name: str, *args: t.Any, returns: str = "", return_: str = ""
-    ) -> t.Iterator[None]:
+    ) -> Scope:
         if return_:
             warnings.warn(
-                "return_ option is deprecated. use returns", stacklevel=3,
+                "return_ option is deprecated. use returns", stacklevel=2,
             )
             returns = returns or return_
 
         if returns:
             returns = " " + returns.lstrip("")
 
-        with self.block(
+        return self._definition(
             LazyFormat(
                 "func ({}) {}({}){}", ob, name, LazyArguments(list(args)), returns
             )
-        ):
-            yield
-        self.sep()
+        )
 
-    @contextlib.contextmanager
-    def if_(self, cond: str, *args: t.Any, **kwargs: t.Any) -> t.Iterator[None]:
-        with self.block(LazyFormat("if " + cond + " ", *args, *kwargs)):
-            yield
+    def if_(self, cond: str, *args: t.Any, **kwargs: t.Any) -> Scope:
+        return self.block(LazyFormat("if " + cond + " ", *args, *kwargs))
 
-    @contextlib.contextmanager
-    def elif_(self, cond: str, *args: t.Any, **kwargs: t.Any) -> t.Iterator[None]:
+    def elif_(self, cond: str, *args: t.Any, **kwargs: t.Any) -> Scope:
         self.unnewline()
-        with self.block(LazyFormat(" else if" + cond + " ", *args, **kwargs)):
-            yield
+        return self.block(LazyFormat(" else if" + cond + " ", *args, **kwargs))
 
-    @contextlib.contextmanager
-    def for_(self, cond: str, *args: t.Any, **kwargs: t.Any) -> t.Iterator[None]:
-        with self.block(LazyFormat("for " + cond + " ", *args, *kwargs)):
-            yield
+    def for_(self, cond: str, *args: t.Any, **kwargs: t.Any) -> Scope:
+        return self.block(LazyFormat("for " + cond + " ", *args, *kwargs))
 
-    @contextlib.contextmanager
-    def else_(self) -> t.Iterator[None]:
+    def else_(self) -> Scope:
         self.unnewline()
-        with self.block(" else "):
-            yield
+        return self.block(" else ")
 
     def select(self) -> "MultiBranchClause":
         m: GoModule = self.submodule("select", newline=False)
@@ -177,11 +167,9 @@ class MultiBranchClause:
         self.m.stmt(" {")
         return self
 
-    @contextlib.contextmanager
-    def case(self, value: t.Any) -> t.Iterator[GoModuleT]:
+    def case(self, value: t.Any) -> Scope:
         self.m.stmt("case {}:".format(value))
-        with self.m.scope():
-            yield self.m
+        return Scope(self.m, self.m)
 
     def __exit__(
         self,
@@ -192,11 +180,9 @@ class MultiBranchClause:
         self.m.stmt("}")
         self.m.sep()
 
-    @contextlib.contextmanager
-    def default(self) -> t.Iterator[GoModuleT]:
+    def default(self) -> Scope:
         self.m.stmt("default:")
-        with self.m.scope():
-            yield self.m
+        return Scope(self.m, self.m)
 
 
 class Group:
@@ -205,7 +191,7 @@ class Group:
         self.prefix = prefix
         self.outermodule: t.Optional[GoModule] = None
         self.innermodule: t.Optional[GoModule] = None
-        self.added: t.Set[t.Any] = set()
+        self.added: t.Dict[t.Any, object] = {}  # used as an ordered set
 
     def __getattr__(self, name: str) -> t.Any:
         return getattr(self.outermodule, name)
@@ -219,10 +205,29 @@ class Group:
         self.innermodule = m.submodule("", newline=False)
         return self
 
+    def fork(self: GroupT, m: GoModule) -> GroupT:
+        """the same group in m (a fork of self.m)"""
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        new.m = m
+        new.added = dict(self.added)
+        if self.outermodule is not None:
+            assert self.innermodule is not None
+            outer = new.outermodule = m.unshare(self.outermodule)
+            outer.on_lex = new.on_lex
+            new.innermodule = outer.unshare(self.innermodule)
+        return new
+
+    def _claim(self, key: t.Any) -> bool:
+        # True if added by this call (setdefault is atomic, even if called by threads)
+        if key in self.added:
+            return False
+        token = object()
+        return self.added.setdefault(key, token) is token
+
     def __call__(self, name: str) -> None:
-        if name in self.added:
+        if not self._claim(name):
             return
-        self.added.add(name)
         assert self.innermodule is not None
         self.innermodule.stmt(name)
 
@@ -251,10 +256,8 @@ class ImportGroup(Group):
         if not name:
             return
 
-        pair = (name, as_)
-        if pair in self.added:
+        if not self._claim((name, as_)):
             return
-        self.added.add(pair)
         assert self.innermodule is not None
 
         if as_ is None:
@@ -364,3 +367,11 @@ class NameFormatter:
 
 def goname(s: str, formatter: NameFormatter = NameFormatter()) -> str:
     return formatter.format(s)
+
+
+def __getattr__(name: str) -> t.Any:
+    if name == "logger":  # on first use, for the import time
+        import logging
+
+        return logging.getLogger(__name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -9,13 +9,23 @@ __all__ = ["Module", "Symbol", "gofile", "goname"]
 
 class Module(CodeObjectModuleMixin, _Module):
     assign_op = ":="
+    _IMPORT_ANCHOR = "_toplevel_import_area"
 
     @reify
     def _toplevel_import_area(self) -> ImportGroup:
         with self.import_group() as ig:
             pass
+        # placed as an anchor, so kept open until close() (see stream_to())
+        self.__dict__.setdefault("_anchors", {})[self._IMPORT_ANCHOR] = ig.outermodule
         return ig
 
+    def fork(self) -> "Module":
+        new = super().fork()
+        ig = self.__dict__.get("_toplevel_import_area")
+        if ig is not None:  # the anchor is moved, too (see unshare())
+            new.__dict__["_toplevel_import_area"] = ig.fork(new)
+        return new
+
     def import_(self, path: str, as_: t.Optional[str] = None) -> Symbol:
         self._toplevel_import_area.import_(path, as_=as_)
         name = as_ or path.rsplit("/", 1)[-1]  # xxx (error in go-sqlite)
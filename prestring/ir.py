@@ -0,0 +1,259 @@
+"""compact intermediate representation of the output of a module
+
+a module is lowered to a flat array of tokens and a string table (the lazy
+objects, the symbols and the on_lex tokens, e.g. FromStatement, are resolved
+at this time). the IR is picklable and dumped to bytes, and rendered without
+the module (the output is the same as str(m)).
+
+    ir = lower(m)
+    data = ir.dumps()
+    assert str(IR.loads(data)) == str(m)
+"""
+import sys
+import json
+import array
+import importlib
+import typing as t
+from io import StringIO
+from prestring import (
+    INDENT,
+    UNINDENT,
+    Emitter,
+    Evaluator,
+    Module,
+    TextBlock,
+    _Sentinel,
+    _sentinel,
+)
+
+# each token is a 64bit int, (string index << 8) | ((sep index + 1) << 2) | op
+OP_INDENT = 0
+OP_UNINDENT = 1
+OP_CODE = 2
+OP_BLOCK = 3
+
+MAGIC = b"PRESTRING-IR/1\n"
+_MAX_SEPS = 63  # (sep index + 1) is stored in 6 bits
+
+
+class _Code:
+    """a lowered code (Sentence or the other emittable), see Evaluator.do_code()"""
+
+    __slots__ = ("text", "newline")
+
+    def __init__(self, text: str, newline: t.Any) -> None:
+        self.text = text
+        self.newline = newline
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class IR:
+    __slots__ = ("ops", "strings", "seps", "evaluator", "indent", "newline")
+
+    def __init__(
+        self,
+        ops: "array.array[int]",
+        strings: t.List[str],
+        *,
+        seps: t.List[str],
+        evaluator: str,
+        indent: str,
+        newline: str,
+    ) -> None:
+        self.ops = ops
+        self.strings = strings
+        self.seps = seps  # the names of the sentinels used as newline
+        self.evaluator = evaluator  # "<module>:<qualname>"
+        self.indent = indent
+        self.newline = newline
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def __eq__(self, other: t.Any) -> bool:
+        if not isinstance(other, IR):
+            return NotImplemented
+        return all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def __getstate__(self) -> t.Dict[str, t.Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __setstate__(self, state: t.Dict[str, t.Any]) -> None:
+        for k in self.__slots__:
+            setattr(self, k, state[k])
+
+    def create_evaulator(self) -> Evaluator:
+        module_name, _, qualname = self.evaluator.partition(":")
+        cls: t.Any = importlib.import_module(module_name)
+        for name in qualname.split("."):
+            cls = getattr(cls, name)
+        return cls(StringIO(), indent=self.indent, newline=self.newline)  # type: ignore
+
+    def iter_tokens(self) -> t.Iterator[t.Any]:
+        """the tokens to be emitted (same as the lexed tokens of the module)"""
+        strings = self.strings
+        seps = [None] + [_sentinel(name) for name in self.seps]
+        for v in self.ops:
+            op = v & 3
+            if op == OP_CODE:
+                yield _Code(strings[v >> 8], seps[(v >> 2) & 63])
+            elif op == OP_INDENT:
+                yield INDENT
+            elif op == OP_UNINDENT:
+                yield UNINDENT
+            else:
+                yield TextBlock(strings[v >> 8], newline=seps[(v >> 2) & 63])
+
+    def iter_chunks(
+        self, *, chunked: bool = True, emitter: t.Optional[Emitter] = None
+    ) -> t.Iterator[str]:
+        evaluator = self.create_evaulator()  # imported before resolving the seps
+        emitter = emitter or Emitter()
+        yield from emitter.iter_emit(self.iter_tokens(), evaluator, chunked=chunked)
+
+    def __str__(self) -> str:
+        return "".join(self.iter_chunks(chunked=False))
+
+    def write_to(self, fp: t.IO[str]) -> None:
+        for chunk in self.iter_chunks():
+            fp.write(chunk)
+
+    def dumps(self) -> bytes:
+        """MAGIC, json header, string lengths, utf-8 strings, and tokens
+
+        the integers are 32bit if possible (64bit, otherwise), little endian.
+        """
+        encoded = [s.encode("utf-8") for s in self.strings]
+        lengths = _pack(map(len, encoded))
+        ops = _pack(self.ops)
+        header = {
+            "evaluator": self.evaluator,
+            "indent": self.indent,
+            "newline": self.newline,
+            "seps": self.seps,
+            "strings": len(encoded),
+            "ops": len(ops),
+            "itemsize": [lengths.itemsize, ops.itemsize],
+        }
+        return b"".join(
+            [
+                MAGIC,
+                json.dumps(header, separators=(",", ":")).encode("utf-8"),
+                b"\n",
+                lengths.tobytes(),
+                b"".join(encoded),
+                ops.tobytes(),
+            ]
+        )
+
+    @classmethod
+    def loads(cls, data: bytes) -> "IR":
+        if not data.startswith(MAGIC):
+            raise ValueError("not a prestring IR")
+        view = memoryview(data)
+        pos = data.index(b"\n", len(MAGIC))
+        header = json.loads(bytes(view[len(MAGIC) : pos]))  # noqa E203
+        pos += 1
+
+        lengths_size, ops_size = header["itemsize"]
+        end = pos + header["strings"] * lengths_size
+        lengths = _unpack(view[pos:end], lengths_size)  # noqa E203
+        start = len(data) - header["ops"] * ops_size
+        ops = array.array("q", _unpack(view[start:], ops_size))  # noqa E203
+
+        pos = end
+        strings = []
+        for n in lengths:
+            strings.append(str(view[pos : pos + n], "utf-8"))  # noqa E203
+            pos += n
+        if pos != start:
+            raise ValueError("broken prestring IR")
+        return cls(
+            ops,
+            strings,
+            seps=header["seps"],
+            evaluator=header["evaluator"],
+            indent=header["indent"],
+            newline=header["newline"],
+        )
+
+
+_TYPECODES = {4: "i", 8: "q"}
+
+
+def _pack(values: t.Iterable[int]) -> "array.array[int]":
+    r = array.array("q", values)
+    if not r or (min(r) >= 0 and max(r) < 1 << 31):
+        r = array.array("i", r)
+    if sys.byteorder != "little":
+        r.byteswap()
+    return r
+
+
+def _unpack(data: memoryview, itemsize: int) -> "array.array[int]":
+    if len(data) % itemsize:
+        raise ValueError("broken prestring IR")
+    r = array.array(_TYPECODES[itemsize])
+    r.frombytes(data)
+    if sys.byteorder != "little":
+        r.byteswap()
+    return r
+
+
+def lower(m: Module) -> IR:
+    """lowers the output of m to IR (the lazy objects are evaluated, here)"""
+    ops = array.array("q")
+    append = ops.append
+    strings: t.List[str] = []
+    string_index: t.Dict[str, int] = {}
+    seps: t.List[str] = []
+    sep_index: t.Dict[str, int] = {}
+
+    def intern(s: str) -> int:
+        i = string_index.get(s)
+        if i is None:
+            i = string_index[s] = len(strings)
+            strings.append(s)
+        return i
+
+    def sep(newline: t.Any) -> int:
+        # only the registered sentinels are kept (others are lowered as None)
+        if newline.__class__ is not _Sentinel:
+            return 0
+        i = sep_index.get(newline.name)
+        if i is None:
+            if _Sentinel._registry.get(newline.name) is not newline:
+                return 0
+            if len(seps) >= _MAX_SEPS:
+                raise ValueError(f"too many kinds of newline: {seps}")
+            seps.append(newline.name)
+            i = sep_index[newline.name] = len(seps)
+        return i
+
+    level = 0  # same as FrameWriter (the depth is 0, if unbalanced)
+    for tok in m.lexer.iter_lex(m.body, markers=False):
+        if tok is INDENT:
+            level += 1
+            append(OP_INDENT)
+        elif tok is UNINDENT:
+            level -= 1
+            append(OP_UNINDENT)
+        elif tok.__class__ is TextBlock:
+            text = tok.text_at(level)
+            append((intern(text) << 8) | (sep(tok.newline) << 2) | OP_BLOCK)
+        else:
+            newline = getattr(tok, "newline", None)  # Sentence or the emittables
+            append((intern(str(tok)) << 8) | (sep(newline) << 2) | OP_CODE)
+
+    evaluator = m.create_evaulator()
+    cls = type(evaluator)
+    return IR(
+        ops,
+        strings,
+        seps=seps,
+        evaluator=f"{cls.__module__}:{cls.__qualname__}",
+        indent=evaluator.indent,
+        newline=evaluator.newline,
+    )
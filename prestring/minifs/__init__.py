@@ -1,9 +1,16 @@
 import typing as t
-import typing_extensions as tx
-import pathlib
+import sys
 from ._glob import glob
 from ._flatten import flatten
 
+if sys.version_info >= (3, 8):
+    import typing as tx
+else:  # pragma: no cover
+    import typing_extensions as tx
+
+if t.TYPE_CHECKING:
+    import pathlib
+
 T = t.TypeVar("T")
 DefaultT = t.TypeVar("DefaultT")
 Leaf = t.Union["File[T]"]  # the value, stored by nested dict
@@ -76,7 +83,7 @@ class MiniFS(t.Generic[DefaultT]):
 
     def open(
         self,
-        name: t.Union[str, pathlib.Path],
+        name: t.Union[str, "pathlib.Path"],
         mode: str,
         *,
         opener: t.Optional[t.Callable[[], T]] = None,
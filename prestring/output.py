@@ -1,15 +1,20 @@
 import typing as t
-import typing_extensions as tx
 import sys
-import logging
 import os.path
 import dataclasses
-import filecmp
 from io import StringIO
 from .minifs import MiniFS, File, T, DefaultT
 from .utils import reify
+from . import Module
+
+if sys.version_info >= (3, 8):
+    import typing as tx
+else:  # pragma: no cover
+    import typing_extensions as tx
+
+if t.TYPE_CHECKING:
+    import logging
 
-logger = logging.getLogger(__name__)
 ActionType = tx.Literal["update", "create"]
 
 
@@ -21,7 +26,7 @@ class Writer(tx.Protocol):
 def cleanup_all(output: "output[DefaultT]") -> None:
     import shutil
 
-    logger.info("cleanup %s", output.root)
+    _get_logger().info("cleanup %s", output.root)
     shutil.rmtree(output.root, ignore_errors=True)  # todo: dryrun
 
 
@@ -60,7 +65,7 @@ class output(t.Generic[DefaultT]):
 
     @reify
     def writer(self) -> Writer:
-        setup_logging(level=logging.INFO)  # xxx
+        setup_logging()  # xxx
         if self.use_console:
             return _ConsoleWriter(self)
         else:
@@ -95,12 +100,20 @@ class _ActualWriter:
             self._write_without_check(name, file)
         else:
             self._write_with_check(name, file)
+        provenance = sys.modules.get("prestring.provenance")  # imported if enabled
+        if provenance is not None and provenance.enabled:
+            if isinstance(file.content, Module):
+                provenance.write_sidecar(
+                    self.output.fullpath(name), file.content
+                )
 
     def _write_with_check(self, name: str, file: File[T]) -> None:
         fullpath = self.output.fullpath(name)
         if not os.path.exists(fullpath):
             self._write_without_check(name, file, action="create")
         else:
+            import filecmp
+
             tmppath = fullpath + self.TMP_SUFFIX
 
             with open(tmppath, "w") as wf:
@@ -111,11 +124,11 @@ class _ActualWriter:
                 action = "no change"
                 os.remove(tmppath)
                 if self.output.verbose:
-                    logger.info("[F]\t%s\t%s", action, fullpath)
+                    _get_logger().info("[F]\t%s\t%s", action, fullpath)
             else:
                 action = "update"
                 os.replace(tmppath, fullpath)
-                logger.info("[F]\t%s\t%s", action, fullpath)
+                _get_logger().info("[F]\t%s\t%s", action, fullpath)
 
     def _write_without_check(
         self,
@@ -130,11 +143,11 @@ class _ActualWriter:
         try:
             with open(fullpath, "w") as wf:
                 file.write(wf)
-            logger.info("[F]\t%s\t%s", action, fullpath)
+            _get_logger().info("[F]\t%s\t%s", action, fullpath)
         except FileNotFoundError:
             if _retry:
                 raise
-            logger.info("[D]\tcreate\t%s", os.path.dirname(fullpath))
+            _get_logger().info("[D]\tcreate\t%s", os.path.dirname(fullpath))
             os.makedirs(os.path.dirname(fullpath), exist_ok=True)
             self._write_without_check(name, file, action="create", _retry=True)
 
@@ -154,7 +167,8 @@ class _ConsoleWriter:
     def write(self, name: str, f: File[T], *, _retry: bool = False) -> None:
         fullpath = self.output.fullpath(name)
         if not self.output.verbose:
-            logger.info("[F]\t%s\t%s", self.output.guess_action(fullpath), fullpath)
+            action = self.output.guess_action(fullpath)
+            _get_logger().info("[F]\t%s\t%s", action, fullpath)
             return
 
         print(f"# {fullpath}", file=self.stdout)
@@ -208,10 +222,24 @@ class _MarkdownWriter:
         self.stdout.flush()
 
 
+def _get_logger() -> "logging.Logger":
+    import logging  # on first use, for the import time
+
+    return logging.getLogger(__name__)
+
+
+def __getattr__(name: str) -> t.Any:
+    if name == "logger":
+        return _get_logger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def setup_logging(
-    *, _logger: t.Optional[logging.Logger] = None, level: int = logging.INFO
+    *, _logger: t.Optional["logging.Logger"] = None, level: int = 20  # INFO
 ) -> None:
-    _logger = _logger or logger
+    import logging
+
+    _logger = _logger or _get_logger()
     if _logger.handlers:
         return
     h = logging.StreamHandler(sys.stderr)
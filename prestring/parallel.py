@@ -0,0 +1,162 @@
+import typing as t
+import gc
+import os
+import copy
+import pickle
+import logging
+import multiprocessing
+from io import StringIO
+from concurrent.futures import Executor, ProcessPoolExecutor
+from prestring import (
+    Emitter,
+    Evaluator,
+    FrameList,
+    Parser,
+    Marker,
+    Rendered,
+    Sentence,
+    TextBlock,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ParallelEmitter(Emitter):
+    """Emitter rendering the toplevel items of each frame in a process pool
+
+    the items are split into chunks, rendered from a snapshot of the frames. the
+    snapshot is inherited by forked workers, or each chunk is sent pickled (with
+    the executor, or without fork). if a chunk is not picklable, its items are
+    converted to str, here. the newlines between the chunks are written here, so
+    the output is the same as Emitter.
+
+    opt-in, e.g. Module(emitter=ParallelEmitter()). the evaluator must be picklable.
+    """
+
+    def __init__(
+        self,
+        *,
+        processes: t.Optional[int] = None,
+        min_items: int = 10000,  # rendered serially, if the items are fewer
+        executor: t.Optional[Executor] = None,
+    ) -> None:
+        self.processes = processes or os.cpu_count() or 1
+        self.min_items = min_items
+        self.executor = executor
+
+    def emit(self, framelist: FrameList, evaluator: Evaluator) -> str:
+        frames = list(framelist[:])
+        n = sum(len(frame) for frame in frames)
+        if n < self.min_items or n < 2:
+            return super().emit(framelist, evaluator)
+
+        size = -(-n // (self.processes * 4))  # a few chunks per process
+        template = copy.copy(evaluator)
+        template.io = None  # type: ignore
+        ranges = [
+            (j, k, k + size)
+            for j, frame in enumerate(frames)
+            for k in range(0, len(frame), size)
+        ]
+
+        if self.executor is None and "fork" in multiprocessing.get_all_start_methods():
+            # the snapshot is inherited by the forked workers (pickling it costs
+            # more than rendering), only the ranges and the outputs are sent
+            with ProcessPoolExecutor(
+                self.processes,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_inherit,
+                initargs=(template, frames),
+            ) as executor:
+                texts = list(executor.map(_evaluate_range, ranges))
+        else:
+            payloads = [
+                _snapshot(template, frames[j][k:stop]) for j, k, stop in ranges
+            ]
+            if self.executor is not None:
+                texts = list(self.executor.map(_evaluate, payloads))
+            else:
+                with ProcessPoolExecutor(self.processes) as executor:
+                    texts = list(executor.map(_evaluate, payloads))
+
+        outputs = iter(texts)  # in the order of ranges
+        for j, frame in enumerate(frames):
+            if j > 0:
+                evaluator.do_newframe()
+            for k in range(0, len(frame), size):
+                if k > 0:
+                    evaluator.do_newline(frame[k - 1], 0)
+                evaluator.io.write(next(outputs))
+        return str(evaluator)
+
+    def iter_emit(
+        self, tokens: t.Iterable[t.Any], evaluator: Evaluator, *, chunked: bool = True
+    ) -> t.Iterator[str]:
+        """same as emit(), with the parsed tokens (the whole output is built at once)"""
+        plain = [
+            tok
+            for tok in tokens
+            if tok.__class__ is not Marker
+            and not (tok.__class__ is Rendered and tok.empty)
+        ]
+        framelist = Parser(framelist_factory=FrameList).parse(plain)
+        output = self.emit(framelist, evaluator)
+        if output:
+            yield output
+
+
+def _snapshot(template: Evaluator, chunk: t.List[t.Any]) -> bytes:
+    try:
+        return pickle.dumps((template, chunk), protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:  # e.g. lambda in LazyFormat
+        logger.debug("not picklable, converted to str: %r", e)
+        return pickle.dumps(
+            (template, _stringify(chunk)), protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+
+def _stringify(frame: t.List[t.Any]) -> t.List[t.Any]:
+    r: t.List[t.Any] = []
+    for code in frame:
+        if isinstance(code, (list, tuple)):
+            r.append(_stringify(code))  # type: ignore
+        elif code.__class__ is TextBlock or code.__class__ is Rendered:
+            r.append(code)
+        elif isinstance(code, Sentence):  # the newline is used by do_newline()
+            sentence = Sentence()
+            sentence.append(str(code))
+            sentence.newline = code.newline
+            r.append(sentence)
+        else:
+            r.append(str(code))
+    return r
+
+
+_inherited: t.Optional[t.Tuple[Evaluator, t.List[t.List[t.Any]]]] = None
+
+
+def _inherit(template: Evaluator, frames: t.List[t.List[t.Any]]) -> None:
+    global _inherited
+    _inherited = (template, frames)
+
+
+def _evaluate_range(r: t.Tuple[int, int, int]) -> str:
+    assert _inherited is not None
+    template, frames = _inherited
+    j, k, stop = r
+    return _evaluate_chunk(copy.copy(template), frames[j][k:stop])
+
+
+def _evaluate(payload: bytes) -> str:
+    gc.disable()  # many objects are created at once (the collections are useless)
+    try:
+        evaluator, chunk = pickle.loads(payload)
+    finally:
+        gc.enable()
+    return _evaluate_chunk(evaluator, chunk)
+
+
+def _evaluate_chunk(evaluator: Evaluator, chunk: t.List[t.Any]) -> str:
+    evaluator.io = StringIO()
+    evaluator.evaluate(chunk)
+    return evaluator.io.getvalue()
@@ -0,0 +1,542 @@
+"""opt-in statistics of rendering (time of each phase, and the counts)
+
+    stats = RenderStats()
+    m.render_stats = stats  # or `with stats:` (all modules), or PRESTRING_PROFILE=1
+    str(m)
+    print(stats.report())
+
+the phases are lex (Lexer.iter_lex), str (the sentences are converted to str,
+the lazy objects are evaluated), parse (FrameWriter, framing, the rest of the
+time of producing the chunks), and evaluate (the methods of Evaluator). the time
+of the consumer (e.g. the writes of write_to()) is not included. the modules not
+rendered (e.g. the output of the whole module is cached) are not counted. when
+disabled, the cost is a check of Module.render_stats per rendering.
+
+if PRESTRING_PROFILE is set, the report of all renderings is written to stderr
+at exit.
+"""
+import os
+import sys
+import time
+import atexit
+import weakref
+import functools
+import tracemalloc
+import typing as t
+from prestring import (
+    INDENT,
+    ENTER,
+    LEAVE,
+    Evaluator,
+    Marker,
+    Module,
+    Rendered,
+    Sentence,
+)
+
+_EVALUATOR_METHODS = ("do_code", "do_newline", "do_newframe", "do_block", "reindent")
+
+
+class _Text:
+    # a sentence converted to str, in advance (see RenderStats._iter_tokens)
+    __slots__ = ("text", "newline")
+
+    def __init__(self, text: str, newline: t.Any) -> None:
+        self.text = text
+        self.newline = newline
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class SubmoduleStats:
+    __slots__ = ("path", "kind", "renders", "sec", "tokens", "sentences", "lazy")
+
+    def __init__(self, path: str, kind: str) -> None:
+        self.path = path  # the order of the submodules, e.g. "PythonModule#0/0/2"
+        self.kind = kind
+        self.renders = 0
+        self.sec = 0.0  # including the nested submodules (the counts are not)
+        self.tokens = 0
+        self.sentences = 0
+        self.lazy = 0
+
+
+class RenderStats:
+    def __init__(self) -> None:
+        self.phases = {"lex": 0.0, "str": 0.0, "parse": 0.0, "evaluate": 0.0}
+        self.renders = 0
+        self.tokens = 0
+        self.sentences = 0
+        self.frames = 0
+        self.lazy = 0  # the lazy objects evaluated (the parts of the sentences)
+        self.cached = 0  # the submodules not rendered again (see Rendered)
+        self.bytes = 0  # utf-8
+        self.submodules: t.Dict[str, SubmoduleStats] = {}
+        self._roots: "weakref.WeakKeyDictionary[Module, str]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._saved: t.List[t.Optional[RenderStats]] = []
+
+    def __enter__(self) -> "RenderStats":
+        self._saved.append(Module.render_stats)
+        Module.render_stats = self
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        Module.render_stats = self._saved.pop()
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def iter_emit(
+        self,
+        m: Module,
+        tokens: t.Iterator[t.Any],
+        evaluator: Evaluator,
+        *,
+        chunked: bool = True,
+    ) -> t.Iterator[str]:
+        """same as m.emitter.iter_emit(), with counting (see Module.iter_chunks)"""
+        clock = time.perf_counter
+        phases = self.phases
+        before = phases["lex"] + phases["str"] + phases["evaluate"]
+        elapsed = 0.0  # while producing the chunks (not while suspended)
+        self.renders += 1
+        self.frames += 1
+        chunks = m.emitter.iter_emit(
+            self._iter_tokens(m, tokens), self._instrument(evaluator), chunked=chunked
+        )
+        try:
+            while True:
+                st = clock()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += clock() - st
+                self.bytes += len(chunk.encode("utf-8"))
+                yield chunk
+        finally:
+            others = phases["lex"] + phases["str"] + phases["evaluate"] - before
+            phases["parse"] += elapsed - others
+
+    def _iter_tokens(self, m: Module, tokens: t.Iterator[t.Any]) -> t.Iterator[t.Any]:
+        clock = time.perf_counter
+        phases = self.phases
+        stack: t.List[t.Tuple[Module, SubmoduleStats, float, t.List[int]]] = []
+        root = self._roots.get(m)
+        if root is None:
+            root = self._roots[m] = f"{type(m).__name__}#{len(self._roots)}"
+        module, current = m, self._submodule(root, m)
+        counter = [0]  # the number of the submodules seen so far, in current
+        current.renders += 1
+        started = clock()
+        self.enter(m)
+        try:
+            while True:
+                st = clock()
+                try:
+                    tok = next(tokens)
+                except StopIteration:
+                    phases["lex"] += clock() - st
+                    break
+                now = clock()
+                phases["lex"] += now - st
+
+                self.tokens += 1
+                current.tokens += 1
+                if isinstance(tok, Sentence):
+                    n = sum(1 for v in tok.body if v.__class__ is not str)
+                    text = str(tok)
+                    phases["str"] += clock() - now
+                    self.sentences += 1
+                    self.lazy += n
+                    current.sentences += 1
+                    current.lazy += n
+                    tok = _Text(text, tok.newline)
+                elif tok is INDENT:
+                    self.frames += 1
+                elif tok.__class__ is Rendered:  # in place of a submodule
+                    self.cached += 1
+                    counter[0] += 1
+                elif tok.__class__ is Marker and tok.module is not None:
+                    if tok.kind == ENTER:
+                        path = f"{current.path}/{counter[0]}"
+                        counter[0] += 1
+                        stack.append((module, current, started, counter))
+                        module = tok.module
+                        current = self._submodule(path, module)
+                        current.renders += 1
+                        counter = [0]
+                        started = now
+                        self.enter(module)
+                    elif tok.kind == LEAVE and stack:
+                        current.sec += now - started
+                        self.leave(module)
+                        module, current, started, counter = stack.pop()
+                yield tok
+        finally:
+            now = clock()
+            while stack:  # closed in the middle
+                current.sec += now - started
+                self.leave(module)
+                module, current, started, counter = stack.pop()
+            current.sec += now - started
+            self.leave(m)
+
+    def enter(self, m: Module) -> None:
+        """called when the rendering of m (or of its submodule) is started"""
+
+    def leave(self, m: Module) -> None:
+        """called when the rendering of m (or of its submodule) is finished"""
+
+    def _submodule(self, path: str, m: t.Any) -> SubmoduleStats:
+        stats = self.submodules.get(path)
+        if stats is None:
+            stats = self.submodules[path] = SubmoduleStats(path, type(m).__name__)
+        return stats
+
+    def _instrument(self, evaluator: Evaluator) -> Evaluator:
+        # the methods are replaced on the instance (the class is not changed)
+        clock = time.perf_counter
+        phases = self.phases
+        calling = [False]  # the nested calls (e.g. do_block() -> reindent()) are not
+
+        def timed(name: str) -> t.Callable[..., t.Any]:
+            method = getattr(evaluator, name)
+
+            def wrapped(*args: t.Any) -> t.Any:
+                if calling[0]:
+                    return method(*args)
+                calling[0] = True
+                st = clock()
+                try:
+                    return method(*args)
+                finally:
+                    phases["evaluate"] += clock() - st
+                    calling[0] = False
+
+            return wrapped
+
+        for name in _EVALUATOR_METHODS:
+            setattr(evaluator, name, timed(name))
+        newframe = evaluator.do_newframe
+
+        def do_newframe() -> None:
+            self.frames += 1
+            newframe()
+
+        evaluator.do_newframe = do_newframe  # type: ignore
+        return evaluator
+
+    def report(self, *, limit: int = 10) -> str:
+        """the summary, and the submodules taking the most time"""
+        lines = ["{:<10} {:>10} {:>6}".format("phase", "sec", "%")]
+        total = self.total or 1.0
+        for name, sec in [*self.phases.items(), ("total", self.total)]:
+            percent = sec / total * 100
+            lines.append("{:<10} {:>10.4f} {:>6.1f}".format(name, sec, percent))
+        lines.append("")
+        counts = ["renders", "tokens", "sentences", "frames", "lazy", "cached", "bytes"]
+        lines.append(" ".join("{:>10}".format(name) for name in counts))
+        lines.append(" ".join("{:>10}".format(getattr(self, name)) for name in counts))
+
+        submodules = sorted(self.submodules.values(), key=lambda s: -s.sec)[:limit]
+        if submodules:
+            lines.append("")
+            lines.append(
+                "{:<24} {:<14} {:>8} {:>10} {:>8} {:>10} {:>8}".format(
+                    "submodule", "type", "renders", "sec", "tokens", "sentences", "lazy"
+                )
+            )
+            for s in submodules:
+                lines.append(
+                    "{:<24} {:<14} {:>8} {:>10.4f} {:>8} {:>10} {:>8}".format(
+                        s.path, s.kind, s.renders, s.sec, s.tokens, s.sentences, s.lazy
+                    )
+                )
+        return "\n".join(lines)
+
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+# the methods attributed to their call sites (the codeobject helpers are added)
+_BUILD_METHODS = (
+    "stmt",
+    "stmts",
+    "submodule",
+    "lazy_submodule",
+    "text_block",
+    "import_",
+    "from_",
+)
+
+
+class Profiler(RenderStats):
+    """RenderStats, attributing the time and the allocations to the call sites
+
+    the building (e.g. stmt(), submodule()) is attributed to the caller, and the
+    rendering of each submodule is attributed to the caller of submodule(). the
+    time and the allocations (with tracemalloc) exclude the nested ones.
+    """
+
+    def __init__(self, *, alloc: bool = True) -> None:
+        super().__init__()
+        self.alloc = alloc
+        # stack (outermost first) -> [sec, bytes, calls]
+        self.samples: t.Dict[t.Tuple[str, ...], t.List[t.Any]] = {}
+        self._active: t.List[t.List[t.Any]] = []
+        self._created: "weakref.WeakKeyDictionary[Module, t.Tuple[str, ...]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._labels: t.Dict[t.Any, str] = {}
+        self._patched: t.List[t.Tuple[type, str, t.Any]] = []
+
+    def call_stack(self, frame: t.Any) -> t.Tuple[str, ...]:
+        """the frames of the script (the frames of prestring are skipped)"""
+        labels = []
+        while frame is not None:
+            if frame.f_globals.get("__name__") == "runpy":
+                break
+            code = frame.f_code
+            if not code.co_filename.startswith(_PACKAGE_DIR):
+                label = self._labels.get(code)
+                if label is None:
+                    filename = os.path.basename(code.co_filename)
+                    label = self._labels[code] = "{} ({}:{})".format(
+                        code.co_name, filename, code.co_firstlineno
+                    ).replace(";", ",")
+                labels.append(label)
+            frame = frame.f_back
+        labels.reverse()
+        return tuple(labels)
+
+    def begin(self, stack: t.Tuple[str, ...]) -> None:
+        self._active.append([stack, time.perf_counter(), self._memory(), 0.0, 0])
+
+    def end(self) -> None:
+        stack, st, memory, nested_sec, nested_bytes = self._active.pop()
+        sec = time.perf_counter() - st
+        used = self._memory() - memory
+        sample = self.samples.get(stack)
+        if sample is None:
+            sample = self.samples[stack] = [0.0, 0, 0]
+        sample[0] += sec - nested_sec
+        sample[1] += used - nested_bytes
+        sample[2] += 1
+        if self._active:
+            self._active[-1][3] += sec
+            self._active[-1][4] += used
+
+    def _memory(self) -> int:
+        return tracemalloc.get_traced_memory()[0] if self.alloc else 0
+
+    def enter(self, m: Module) -> None:
+        stack = self._created.get(m)
+        if stack is None:  # not a submodule, the caller of rendering
+            stack = self.call_stack(sys._getframe(1))
+        self.begin(stack + ("prestring:render",))
+
+    def leave(self, m: Module) -> None:
+        self.end()
+
+    def install(self) -> None:
+        """replaces the methods to be attributed (restored by uninstall())"""
+        from prestring.codeobject import CodeObjectModuleMixin
+
+        helpers = [
+            name
+            for name, v in vars(CodeObjectModuleMixin).items()
+            if callable(v) and not name.startswith("_")
+        ]
+        classes: t.List[type] = [CodeObjectModuleMixin]
+        stack: t.List[type] = [Module]
+        while stack:
+            cls = stack.pop()
+            classes.append(cls)
+            stack.extend(cls.__subclasses__())
+        for cls in classes:
+            for name in (*_BUILD_METHODS, *helpers):
+                if name in vars(cls):
+                    self._patch(cls, name, self._timed(vars(cls)[name], name))
+            if "_new_submodule" in vars(cls):
+                original = vars(cls)["_new_submodule"]
+                self._patch(cls, "_new_submodule", self._creating(original))
+
+        try:
+            from prestring import output
+        except ImportError:  # e.g. typing_extensions is not installed
+            return
+        writers = [output._ActualWriter, output._ConsoleWriter, output._MarkdownWriter]
+        for cls in writers:
+            self._patch(cls, "write", self._timed(vars(cls)["write"], "write"))
+
+    def uninstall(self) -> None:
+        while self._patched:
+            cls, name, original = self._patched.pop()
+            setattr(cls, name, original)
+
+    def _patch(self, cls: type, name: str, wrapped: t.Any) -> None:
+        self._patched.append((cls, name, vars(cls)[name]))
+        setattr(cls, name, wrapped)
+
+    def _timed(self, method: t.Callable[..., t.Any], name: str) -> t.Any:
+        leaf = f"prestring:{name}"
+
+        @functools.wraps(method)
+        def wrapped(*args: t.Any, **kwargs: t.Any) -> t.Any:
+            self.begin(self.call_stack(sys._getframe(1)) + (leaf,))
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.end()
+
+        return wrapped
+
+    def _creating(self, method: t.Callable[..., t.Any]) -> t.Any:
+        @functools.wraps(method)
+        def wrapped(*args: t.Any, **kwargs: t.Any) -> t.Any:
+            m = method(*args, **kwargs)
+            self._created[m] = self.call_stack(sys._getframe(1))
+            return m
+
+        return wrapped
+
+    def collapsed(self, *, alloc: bool = False) -> str:
+        """the collapsed stacks (for flamegraph.pl, speedscope, ...)
+
+        the values are microseconds, or bytes (if alloc is True).
+        """
+        lines = []
+        for stack, (sec, used, _) in sorted(self.samples.items()):
+            value = max(used, 0) if alloc else int(sec * 1e6)
+            if value > 0:
+                lines.append("{} {}".format(";".join(stack), value))
+        return "\n".join(lines)
+
+    def speedscope(self, *, name: str = "prestring") -> t.Dict[str, t.Any]:
+        """the profiles of the time and of the allocations, in speedscope's format"""
+        frames: t.List[t.Dict[str, str]] = []
+        index: t.Dict[str, int] = {}
+        stacks = sorted(self.samples)
+        samples = []
+        for stack in stacks:
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({"name": label})
+            samples.append([index[label] for label in stack])
+
+        profiles = []
+        for unit, weights in [
+            ("seconds", [self.samples[stack][0] for stack in stacks]),
+            ("bytes", [max(self.samples[stack][1], 0) for stack in stacks]),
+        ]:
+            if unit == "bytes" and not self.alloc:
+                continue
+            profiles.append(
+                {
+                    "type": "sampled",
+                    "name": f"{name} ({'time' if unit == 'seconds' else 'alloc'})",
+                    "unit": unit,
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            )
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+            "name": name,
+            "exporter": "prestring.profile",
+        }
+
+    def report(self, *, limit: int = 10) -> str:
+        lines = [super().report(limit=limit), ""]
+        lines.append("{:>10} {:>10} {:>8}  {}".format("sec", "KiB", "calls", "site"))
+        total = sorted(self.samples.items(), key=lambda kv: -kv[1][0])[:limit]
+        for stack, (sec, used, calls) in total:
+            site = " <- ".join(reversed(stack[-3:]))
+            lines.append(
+                "{:>10.4f} {:>10.1f} {:>8}  {}".format(sec, used / 1024, calls, site)
+            )
+        return "\n".join(lines)
+
+
+def main(argv: t.Optional[t.List[str]] = None) -> None:
+    import json
+    import runpy
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m prestring.profile",
+        description="runs the script, and reports the time of building and rendering",
+    )
+    parser.add_argument("-o", "--output", default="prestring-profile")
+    parser.add_argument(
+        "--format", choices=["collapsed", "speedscope"], default="speedscope"
+    )
+    parser.add_argument("--no-alloc", action="store_true", help="without tracemalloc")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    profiler = Profiler(alloc=not args.no_alloc)
+    sys.argv = [args.script, *args.args]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    if profiler.alloc:
+        tracemalloc.start()
+    profiler.install()
+    try:
+        with profiler:
+            runpy.run_path(args.script, run_name="__main__")
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise
+    finally:
+        profiler.uninstall()
+        if profiler.alloc:
+            tracemalloc.stop()
+
+        if args.format == "collapsed":
+            outputs = {f"{args.output}.time.collapsed": profiler.collapsed()}
+            if profiler.alloc:
+                path = f"{args.output}.alloc.collapsed"
+                outputs[path] = profiler.collapsed(alloc=True)
+        else:
+            data = profiler.speedscope(name=os.path.basename(args.script))
+            outputs = {f"{args.output}.speedscope.json": json.dumps(data)}
+        for path, content in outputs.items():
+            with open(path, "w") as wf:
+                wf.write(content)
+        print(profiler.report(limit=args.limit), file=sys.stderr)
+        print("", file=sys.stderr)
+        for path in outputs:
+            print(f"written: {path}", file=sys.stderr)
+
+
+def _enable_from_env() -> None:
+    # PRESTRING_PROFILE=1, the report is written to stderr at exit
+    stats = Module.render_stats = RenderStats()
+
+    def report() -> None:
+        if stats.renders:
+            print(stats.report(), file=sys.stderr)
+
+    atexit.register(report)
+
+
+if os.environ.get("PRESTRING_PROFILE", "") and Module.render_stats is None:
+    _enable_from_env()
+
+
+if __name__ == "__main__":
+    from prestring.profile import main as _main  # not __main__, for the identity
+
+    _main()
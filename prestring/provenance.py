@@ -0,0 +1,308 @@
+"""opt-in provenance, the call site of stmt() for each line of the output
+
+    prestring.provenance.enable()  # or PRESTRING_PROVENANCE=1
+    m.stmt("x = 1")
+    text, smap = render(m)
+    smap.lookup(1)  # => ("gen.py", 10)
+
+the files written by prestring.output get a sidecar map (see SUFFIX), too.
+
+enable() replaces Module.stmt(), stmts(), text_block() (and so docstring()) and
+submodule() with the versions recording the caller (the frames of prestring are
+skipped), as an invisible item in front of the sentence. so when disabled (the
+default), nothing is recorded and the frames are never inspected. the lines
+without their own call site (e.g. the closing lines of the emittables) inherit
+the one of the previous line, and the blank lines have none.
+the recorded items are rendered as "", so not included in Module.fingerprint().
+they are visible to the code touching Module.body directly (e.g. body.pop() to
+drop the last stmt() drops the NEWLINE and the text, not this).
+"""
+import os
+import sys
+import copy
+import json
+import array
+import typing as t
+from prestring import (
+    INDENT,
+    UNINDENT,
+    FrameWriter,
+    Lexer,
+    Module,
+    Sentence,
+    TextBlock,
+)
+
+SUFFIX = ".provenance.json"  # the sidecar map of "<file>" is "<file>.provenance.json"
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+enabled = False
+_patched: t.List[t.Tuple[str, t.Any]] = []
+
+
+class _Origin:
+    """the call site, rendered as "" (and the sentence is not empty by this)"""
+
+    __slots__ = ("filename", "lineno")
+
+    def __init__(self, filename: str, lineno: int) -> None:
+        self.filename = filename
+        self.lineno = lineno
+
+    def __str__(self) -> str:
+        return ""
+
+    def __eq__(self, other: t.Any) -> bool:
+        return bool(other == "")  # see Sentence.append()
+
+    def __ne__(self, other: t.Any) -> bool:
+        return bool(other != "")
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.filename}:{self.lineno}>"
+
+
+Lexer._stable.add(_Origin)  # not volatile, the cached outputs are kept
+
+
+class _TracedSentence(Sentence):
+    """Sentence, the call sites appended are recorded (see render())"""
+
+    __slots__ = ("origins",)
+    origins: t.List[t.Tuple[Sentence, _Origin]]
+
+    def append(self, v: t.Any) -> "Sentence":
+        if v.__class__ is _Origin:
+            self.origins.append((self, v))
+        return super().append(v)
+
+
+class _Text:
+    # a token converted to str in advance, so the lazy objects are evaluated once
+    __slots__ = ("text", "newline")
+
+    def __init__(self, text: str, newline: t.Any) -> None:
+        self.text = text
+        self.newline = newline
+
+    def __str__(self) -> str:
+        return self.text
+
+
+def _caller() -> _Origin:
+    frame = sys._getframe(2)
+    while frame.f_back is not None and frame.f_code.co_filename.startswith(
+        _PACKAGE_DIR
+    ):
+        frame = frame.f_back
+    return _Origin(frame.f_code.co_filename, frame.f_lineno)
+
+
+def enable() -> None:
+    """records the call sites of stmt() and stmts(), until disable()"""
+    global enabled
+    if enabled:
+        return
+    stmt = Module.stmt
+
+    def traced_stmt(
+        self: Module, fmt: t.Any, *args: t.Any, **kwargs: t.Any
+    ) -> Module:
+        if Lexer.kind_of(fmt) == Lexer.TEXT:  # others are traced by the nested calls
+            self.body.append(_caller())
+        return stmt(self, fmt, *args, **kwargs)
+
+    def traced_stmts(self: Module, fmts: t.Iterable[t.Any]) -> Module:
+        origin = _caller()
+        for fmt in fmts:
+            if Lexer.kind_of(fmt) == Lexer.TEXT:
+                self.body.append(origin)
+            stmt(self, fmt)
+        return self
+
+    text_block = Module.text_block
+
+    def traced_text_block(self: Module, text: str) -> Module:
+        self.body.append(_caller())
+        return text_block(self, text)
+
+    submodule = Module.submodule
+
+    def traced_submodule(self: Module, *args: t.Any, **kwargs: t.Any) -> Module:
+        origin = _caller()
+        m = submodule(self, *args, **kwargs)
+        m.body.insert_before(origin)  # e.g. submodule(value, newline=False)
+        return m
+
+    for name, traced in [
+        ("stmt", traced_stmt),
+        ("stmts", traced_stmts),
+        ("text_block", traced_text_block),
+        ("submodule", traced_submodule),
+    ]:
+        _patched.append((name, getattr(Module, name)))
+        setattr(Module, name, traced)
+    enabled = True
+
+
+def disable() -> None:
+    global enabled
+    while _patched:
+        name, original = _patched.pop()
+        setattr(Module, name, original)
+    enabled = False
+
+
+class SourceMap:
+    """the call site of each line of the output (kept as arrays)"""
+
+    __slots__ = ("sources", "source", "line")
+
+    def __init__(
+        self,
+        sources: t.Sequence[str],
+        source: "array.array[int]",
+        line: "array.array[int]",
+    ) -> None:
+        self.sources = list(sources)
+        self.source = source  # the index of sources (or -1, unknown), for each line
+        self.line = line
+
+    def __len__(self) -> int:
+        return len(self.source)
+
+    def lookup(self, lineno: int) -> t.Optional[t.Tuple[str, int]]:
+        """the call site of the line (1-origin) of the output, if known"""
+        if not 0 < lineno <= len(self.source):
+            return None
+        i = self.source[lineno - 1]
+        if i < 0:
+            return None
+        return (self.sources[i], self.line[lineno - 1])
+
+    def dumps(self) -> str:
+        """json, the arrays are stored as the deltas from the previous line"""
+        return json.dumps(
+            {
+                "version": 1,
+                "sources": self.sources,
+                "source": _delta(self.source),
+                "line": _delta(self.line),
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def loads(cls, s: str) -> "SourceMap":
+        data = json.loads(s)
+        if data.get("version") != 1:
+            raise ValueError(f"unsupported version: {data.get('version')!r}")
+        return cls(data["sources"], _undelta(data["source"]), _undelta(data["line"]))
+
+
+def _delta(values: t.Sequence[int]) -> t.List[int]:
+    prev = 0
+    r = []
+    for v in values:
+        r.append(v - prev)
+        prev = v
+    return r
+
+
+def _undelta(deltas: t.Sequence[int]) -> "array.array[int]":
+    r = array.array("i")
+    v = 0
+    for d in deltas:
+        v += d
+        r.append(v)
+    return r
+
+
+def render(m: Module) -> t.Tuple[str, SourceMap]:
+    """the output (same as str(m)), and the call sites of the lines of it"""
+    # the call sites in the sentence not completed yet (e.g. of text_block())
+    origins: t.List[t.Tuple[Sentence, _Origin]] = []
+
+    def sentence_factory() -> Sentence:
+        sentence = _TracedSentence()
+        sentence.origins = origins
+        return sentence
+
+    lexer = copy.copy(m.lexer)
+    lexer.sentence_factory = sentence_factory
+    evaluator = m.create_evaulator()
+    writer = FrameWriter(evaluator)
+    pieces = writer.buffer.pieces
+    newline = evaluator.newline
+    source = array.array("i")
+    line = array.array("i")
+    sources: t.List[str] = []
+    source_index: t.Dict[str, int] = {}
+    current = (-1, 0)
+    seen = 0
+    lines = 0  # the number of the newlines written
+
+    for tok in lexer.iter_lex(m.body, markers=False):
+        if tok is INDENT or tok is UNINDENT:
+            writer.feed(tok)
+            continue
+        origin = None
+        if tok.__class__ is TextBlock:
+            if origins:  # the one in front of this, dropped from the sentence
+                sentence, origin = origins[-1]
+                for k in range(len(sentence.body) - 1, -1, -1):
+                    if sentence.body[k] is origin:
+                        del sentence.body[k]
+                        break
+        else:
+            for v in reversed(getattr(tok, "body", ())):  # Sentence (the last wins)
+                if v.__class__ is _Origin:
+                    origin = v
+                    break
+        origins.clear()
+        if origin is not None:
+            i = source_index.get(origin.filename)
+            if i is None:
+                i = source_index[origin.filename] = len(sources)
+                sources.append(origin.filename)
+            current = (i, origin.lineno)
+        if tok.__class__ is TextBlock:
+            text = tok.text_at(len(writer.frames) - 1)  # the depth of tok
+        else:
+            tok = _Text(str(tok), getattr(tok, "newline", None))
+            text = tok.text
+        writer.feed(tok)
+        for piece in pieces[seen:]:
+            lines += piece.count(newline)
+        seen = len(pieces)
+        start = lines - text.count(newline)  # the lines of tok, [start, lines]
+        if not text.strip():  # blank lines (e.g. the empty stmt() after a block)
+            start = lines + 1
+        while len(source) < start:  # blank lines (e.g. between definitions)
+            source.append(-1)
+            line.append(0)
+        while len(source) <= lines:
+            source.append(current[0])
+            line.append(current[1])
+
+    text = "".join(pieces).rstrip()
+    n = text.count(newline) + 1 if text else 0
+    del source[n:]
+    del line[n:]
+    return text, SourceMap(sources, source, line)
+
+
+def write_sidecar(path: str, m: Module) -> str:
+    """writes the sidecar map of the file at path (the output of m)"""
+    _, smap = render(m)
+    sidecar = path + SUFFIX
+    with open(sidecar, "w") as wf:
+        wf.write(smap.dumps())
+    return sidecar
+
+
+if os.environ.get("PRESTRING_PROVENANCE", ""):
+    enable()
@@ -1,11 +1,11 @@
 import typing as t
-import contextlib
 import warnings
 from io import StringIO
 from prestring import Module as _Module
 from prestring import ModuleT
 from prestring import (
     StmtTargetType,
+    Scope,
     _Sentinel,
     NEWLINE,
     INDENT,
@@ -61,7 +61,7 @@ class PythonModule(_Module):
         self.from_map: t.Dict[str, PythonModule] = {}  # module -> PythonModule
         self.imported_map: t.Dict[str, Symbol] = {}
 
-    def submodule(
+    def _new_submodule(
         self,
         value: t.Any = "",  # str,FromStatement,...
         *,
@@ -71,7 +71,7 @@ class PythonModule(_Module):
             t.Callable[[_Lexer, t.List[t.Any], Sentence], t.List[t.Any]]
         ] = None,
     ) -> _ModuleT:
-        submodule = super().submodule(
+        submodule = super()._new_submodule(
             value=value, newline=newline, factory=factory, on_lex=on_lex
         )
         submodule.width = self.width
@@ -83,19 +83,21 @@ class PythonModule(_Module):
     def sep(self) -> None:
         self.body.append(PEPNEWLINE)
 
-    @contextlib.contextmanager
+    def _end_definition(self) -> None:
+        self.sep()
+        if self._stream is not None:  # sealed, if this block is at the toplevel
+            self.seal()
+
     def with_(
         self, expr: t.Any, *, as_: t.Optional[t.Any] = None, async_: bool = False
-    ) -> t.Iterator[None]:
+    ) -> Scope:
         prefix = f"{'async ' if async_ else ''}with"
         if as_:
             self.stmt("{} {} as {}:", prefix, expr, as_)
         else:
             self.stmt("{} {}:", prefix, expr)
-        with self.scope():
-            yield
+        return self.scope()
 
-    @contextlib.contextmanager
     def def_(
         self,
         name: str,
@@ -103,7 +105,7 @@ class PythonModule(_Module):
         return_type: t.Optional[t.Any] = None,
         async_: bool = False,
         **kwargs: t.Any,
-    ) -> t.Iterator[Symbol]:
+    ) -> Scope:
         params = make_params(args, kwargs)
 
         prefix = f"{'async ' if async_ else ''}def"
@@ -113,44 +115,30 @@ class PythonModule(_Module):
             )
         else:
             self.stmt("{} {}({}):", prefix, name, params)
-        with self.scope():
-            yield Symbol(name)
-        self.sep()
+        return Scope(self, Symbol(name), self._end_definition)
 
-    @contextlib.contextmanager
-    def if_(self, expr: t.Any) -> t.Iterator[None]:
+    def if_(self, expr: t.Any) -> Scope:
         self.stmt("if {}:", expr)
-        with self.scope():
-            yield
+        return self.scope()
 
     def docstring(self, doc: str) -> None:
-        self.stmt('"""')
-        for line in doc.split("\n"):
-            self.stmt(line)
-        self.stmt('"""')
+        self.text_block(self.newline.join(['"""', *doc.split("\n"), '"""']))
 
-    @contextlib.contextmanager
-    def unless(self, expr: t.Any) -> t.Iterator[None]:
+    def unless(self, expr: t.Any) -> Scope:
         self.stmt("if not ({}):", expr)
-        with self.scope():
-            yield
+        return self.scope()
 
-    @contextlib.contextmanager
-    def elif_(self, expr: t.Any) -> t.Iterator[None]:
+    def elif_(self, expr: t.Any) -> Scope:
         self.stmt("elif {}:", expr)
-        with self.scope():
-            yield
+        return self.scope()
 
-    @contextlib.contextmanager
-    def else_(self) -> t.Iterator[None]:
+    def else_(self) -> Scope:
         self.stmt("else:")
-        with self.scope():
-            yield
+        return self.scope()
 
-    @contextlib.contextmanager
     def for_(
         self, var: t.Any, iterator: t.Optional[t.Any] = None, *, async_: bool = False
-    ) -> t.Iterator[Symbol]:
+    ) -> Scope:
         prefix = f"{'async ' if async_ else ''}for"
         if iterator is None:
             self.stmt("{prefix} {var}:", prefix=prefix, var=var)
@@ -161,25 +149,19 @@ class PythonModule(_Module):
                 var=var,
                 iterator=iterator,
             )
-        with self.scope():
-            yield Symbol(var)
+        return Scope(self, Symbol(var))
 
-    @contextlib.contextmanager
-    def while_(self, expr: t.Any) -> t.Iterator[None]:
+    def while_(self, expr: t.Any) -> Scope:
         self.stmt("while {expr}:", expr=expr)
-        with self.scope():
-            yield
+        return self.scope()
 
-    @contextlib.contextmanager
-    def try_(self) -> t.Iterator[None]:
+    def try_(self) -> Scope:
         self.stmt("try:")
-        with self.scope():
-            yield
+        return self.scope()
 
-    @contextlib.contextmanager
     def except_(
         self, expr: t.Optional[t.Any] = None, as_: t.Optional[t.Any] = None
-    ) -> t.Iterator[None]:
+    ) -> Scope:
         if expr:
             if as_ is not None:
                 self.stmt("except {expr} as {as_}:", expr=expr, as_=as_)
@@ -187,20 +169,16 @@ class PythonModule(_Module):
                 self.stmt("except {expr}:", expr=expr)
         else:
             self.stmt("except:")
-        with self.scope():
-            yield
+        return self.scope()
 
-    @contextlib.contextmanager
-    def finally_(self) -> t.Iterator[None]:
+    def finally_(self) -> Scope:
         self.stmt("finally:")
-        with self.scope():
-            yield
+        return self.scope()
 
     # class definition
-    @contextlib.contextmanager
     def class_(
         self, name: t.Any, bases: t.Any = "", metaclass: t.Optional[t.Any] = None
-    ) -> t.Iterator[Symbol]:
+    ) -> Scope:
         if not isinstance(bases, (list, tuple)):
             bases = [bases]
         args = [str(b) for b in bases if b]
@@ -210,9 +188,7 @@ class PythonModule(_Module):
             self.stmt("class {name}({args}):", name=name, args=", ".join(args))
         else:
             self.stmt("class {name}:", name=name)
-        with self.scope():
-            yield Symbol(name)
-        self.sep()
+        return Scope(self, Symbol(name), self._end_definition)
 
     def stmt(self, fmt: StmtTargetType, *args: t.Any, **kwargs: t.Any,) -> "ModuleT":
         await_ = kwargs.pop("await_", False)
@@ -226,31 +202,68 @@ class PythonModule(_Module):
 
     def import_(self, modname: str, as_: t.Optional[str] = None) -> Symbol:
         name = as_ or modname
-        try:
-            sym = self.imported_map[name]
+        sym = self.imported_map.get(name)
+        if sym is not None:
             return sym
-        except KeyError:
-            # todo: considering self.import_unique
-            suffix = ""
-            if as_ is not None:
-                suffix = "{} as {}".format(suffix, as_)
 
-            self.stmt("import {}{}", modname, suffix)
-            sym = self.imported_map[name] = Symbol(modname, as_=as_)
-            return sym
+        # registered at once (setdefault), the first one wins if called by threads
+        sym = Symbol(modname, as_=as_)
+        registered = self.imported_map.setdefault(name, sym)
+        if registered is not sym:
+            return registered
+
+        # todo: considering self.import_unique
+        suffix = ""
+        if as_ is not None:
+            suffix = "{} as {}".format(suffix, as_)
+        self.stmt("import {}{}", modname, suffix)
+        return sym
 
     def from_(self, modname: str, *attrs: str) -> "FromStatement":
-        try:
-            from_stmt: FromStatement = self.from_map[modname].body.tail()
-            for sym in attrs:
-                from_stmt.import_(sym)
-            return from_stmt
-        except KeyError:
-            from_stmt = FromStatement(modname)
-            for sym in attrs:
-                from_stmt.import_(sym)
-            self.from_map[modname] = self.submodule(from_stmt, newline=False)
-            return from_stmt
+        submodule = self.from_map.get(modname)
+        if submodule is None:
+            submodule = self._new_submodule(FromStatement(modname), newline=False)
+            registered = self.from_map.setdefault(modname, submodule)
+            if registered is submodule:
+                # placed as an anchor, so kept open until close() (see stream_to())
+                anchors = self.__dict__.setdefault("_anchors", {})
+                anchors[f"_from {modname}"] = submodule
+                self.body.append(submodule)
+            submodule = registered
+
+        from_stmt: FromStatement = submodule.body.tail()
+        if submodule.immutable and any(a not in from_stmt.symbols for a in attrs):
+            raise RuntimeError(f"{submodule!r} is immutable")
+        borrowed = self._borrowed
+        if self.immutable:
+            pass
+        elif borrowed and submodule in borrowed:  # shared with the forked one
+            submodule = self.unshare(submodule)
+            from_stmt = from_stmt.fork()
+            submodule.body.clear()
+            submodule.body.append(from_stmt)
+        elif submodule._shared or submodule.body._shared:  # with the forks
+            from_stmt = from_stmt.fork()
+            submodule.body.clear()
+            submodule.body.append(from_stmt)
+        for sym in attrs:
+            from_stmt.import_(sym)
+        return from_stmt
+
+    def fork(self: _ModuleT) -> _ModuleT:
+        new = super().fork()
+        from_map: t.Dict[str, _Module] = self.from_map  # type: ignore
+        new.from_map = dict(from_map)  # type: ignore
+        new.imported_map = dict(self.imported_map)  # type: ignore
+        if from_map:  # shared, until unshared by from_()
+            new._borrowed = {*(new._borrowed or ()), *from_map.values()}
+        return new
+
+    def _replaced(self, old: _Module, new: _Module) -> None:
+        super()._replaced(old, new)
+        for modname, v in self.from_map.items():
+            if v is old:
+                self.from_map[modname] = new  # type: ignore
 
 
 class FromStatement:
@@ -258,12 +271,16 @@ class FromStatement:
         self.modname = modname
         self.symbols: t.Dict[str, Symbol] = {}
 
+    def fork(self) -> "FromStatement":
+        new = self.__class__(self.modname)
+        new.symbols.update(self.symbols)
+        return new
+
     def import_(self, name: str, *, as_: t.Optional[str] = None) -> Symbol:
         sym = self.symbols.get(as_ or name)
         if sym is not None:
             return sym
-        sym = self.symbols[as_ or name] = Symbol(name, as_=as_)
-        return sym
+        return self.symbols.setdefault(as_ or name, Symbol(name, as_=as_))
 
     def iterator_for_one_symbol(self, sentence: Sentence) -> t.Iterable[t.Any]:
         if not sentence.is_empty():
@@ -307,4 +324,7 @@ class FromStatement:
             return lexer.lex(self.iterator_for_many_symbols(sentence), tokens=tokens)
 
 
+_Lexer.register(FromStatement, _Lexer.ON_LEX)
+
+
 Module = PythonModule
@@ -1,9 +1,14 @@
 import typing as t
-import typing_extensions as tx
+import sys
 from prestring.utils import LazyFormat
 from prestring import Module as BaseModule
 from prestring.python import Module as PyModule
 
+if sys.version_info >= (3, 8):
+    import typing as tx
+else:  # pragma: no cover
+    import typing_extensions as tx
+
 M = t.TypeVar("M", bound=PyModule)
 OM = t.TypeVar("OM", bound=BaseModule)
 
@@ -0,0 +1,122 @@
+"""the module built once with slots, and rendered many times with parameters
+
+    m = PythonModule()
+    with m.def_(Slot("name")):
+        m.return_(m.format("{!r}", Slot("value")))
+    render = compile_template(m)
+
+    render(name="f", value="x")  # => "def f():\\n    return 'x'"
+    render.batch(name=["f", "g"], value=["x", "y"])  # columnar, a list of outputs
+
+the module is rendered once (the slots are rendered as markers), and the output
+is compiled to a format string. so the cost of each call is of str.format().
+
+the values are converted with str() (as LazyFormat), and inserted as is (not
+re-indented). the slots must be used only as str() or repr() of them, the
+format specs (e.g. "{:>5}") raise ValueError, and so do the markers changed
+in other ways (e.g. sliced) if found when compiling.
+"""
+import re
+import typing as t
+
+# the marker of a slot, or the repr() of it (e.g. LazyFormat("{!r}", slot))
+_MARKER = re.compile(r"\x00s(\w+)\x00|'\\x00s(\w+)\\x00'")
+
+
+class Slot:
+    """a placeholder, replaced with the parameter of the name (see compile_template)"""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        if not name.isidentifier():
+            raise ValueError(f"invalid name {name!r}")
+        self.name = name
+
+    def __str__(self) -> str:
+        return _Marker(f"\x00s{self.name}\x00")
+
+    def __repr__(self) -> str:
+        return repr(str(self))
+
+
+class _Marker(str):
+    """the str() of a slot, kept through str() and repr() to find format specs"""
+
+    __slots__ = ()
+
+    def __str__(self) -> str:
+        return self
+
+    def __repr__(self) -> str:
+        return _Marker(super().__repr__())
+
+    def __format__(self, spec: str) -> str:
+        if spec:  # the output of the template would be different (e.g. padding)
+            raise ValueError(f"format spec {spec!r} is not supported, for {self!r}")
+        return super().__format__(spec)
+
+
+class Template:
+    __slots__ = ("fmt", "names")
+
+    def __init__(self, fmt: str, names: t.Sequence[str]) -> None:
+        self.fmt = fmt  # the slots are positional fields, in the order of names
+        self.names = tuple(names)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} names={self.names!r}>"
+
+    def __call__(self, **params: t.Any) -> str:
+        if len(params) != len(self.names):
+            self._check(params)
+        try:
+            values = [str(params[name]) for name in self.names]
+        except KeyError:  # the same number of parameters, but misspelled
+            self._check(params)
+            raise
+        return self.fmt.format(*values)
+
+    def batch(self, **columns: t.Sequence[t.Any]) -> t.List[str]:
+        """the outputs of each row, the values are passed as the list of each slot"""
+        self._check(columns)
+        if not self.names:
+            raise ValueError("no slots, the number of rows is unknown")
+        values = [columns[name] for name in self.names]
+        if len(set(map(len, values))) > 1:
+            raise ValueError("the lengths of the columns are not the same")
+        return list(map(self.fmt.format, *[map(str, col) for col in values]))
+
+    def _check(self, params: t.Mapping[str, t.Any]) -> None:
+        missing = [name for name in self.names if name not in params]
+        if missing:
+            raise TypeError(f"missing parameters: {missing}")
+        unknown = [name for name in params if name not in self.names]
+        if unknown:
+            raise TypeError(f"unknown parameters: {unknown}")
+
+
+def compile_template(m: t.Any) -> Template:
+    """renders m (including slots) once, and compiles the output to Template"""
+    text = str(m)
+    names: t.List[str] = []
+    index: t.Dict[str, int] = {}
+    parts: t.List[str] = []
+    pos = 0
+    for matched in _MARKER.finditer(text):
+        parts.append(_check(text[pos : matched.start()]))  # noqa E203
+        name, repr_name = matched.groups()
+        i = index.setdefault(name or repr_name, len(names))
+        if i == len(names):
+            names.append(name or repr_name)
+        parts.append(f"{{{i}}}" if name else f"{{{i}!r}}")
+        pos = matched.end()
+    parts.append(_check(text[pos:]))
+    return Template("".join(parts), names)
+
+
+def _check(text: str) -> str:
+    # the text between the markers, escaped as a part of the format string
+    if "\x00" in text:
+        raise ValueError(f"a slot is changed when rendering (e.g. sliced): {text!r}")
+    return text.replace("{", "{{").replace("}", "}}")
@@ -0,0 +1,98 @@
+# type: ignore
+import os
+import shutil
+import tempfile
+import unittest
+from evilunit import test_target
+
+
+@test_target("prestring.cache:RenderCache")
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _build(self, cache):
+        from prestring.python import PythonModule
+
+        m = PythonModule()
+        m.render_cache = cache
+        m.from_("os", "path")
+        with m.def_("f"):
+            m.return_("path")
+        return m
+
+    def test_str(self):
+        cache = self._makeOne(self.directory)
+        expected = str(self._build(None))
+        self.assertEqual(str(self._build(cache)), expected)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        m = self._build(cache)
+        m.iter_chunks = None  # not rendered
+        self.assertEqual(str(m), expected)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        m = self._build(cache)
+        m.stmt("f()")
+        self.assertEqual(str(m), expected + "\n\n\nf()")
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_key(self):
+        from prestring import Evaluator
+
+        class MyEvaluator(Evaluator):
+            pass
+
+        cache = self._makeOne(self.directory)
+        m = self._build(cache)
+        key = cache.key(m)
+        self.assertTrue(key.isalnum())
+        self.assertNotEqual(key, m.fingerprint())
+        self.assertEqual(cache.key(self._build(cache)), key)
+
+        m.create_evaulator = lambda: MyEvaluator(None)
+        self.assertNotEqual(cache.key(m), key)
+
+    def test_key_of_changed_sources(self):
+        from unittest import mock
+
+        cache = self._makeOne(self.directory)
+        m = self._build(cache)
+        key = cache.key(m)
+        # e.g. an editable install, the version is not changed
+        with mock.patch("prestring.cache._sources", return_value="changed"):
+            self.assertNotEqual(cache.key(m), key)
+
+    def test_lookup(self):
+        cache = self._makeOne(self.directory)
+        expected = str(self._build(None))
+        self.assertEqual(cache.lookup("input0", lambda: self._build(None)), expected)
+        self.assertEqual(cache.lookup("input0", lambda: 1 / 0), expected)  # not built
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_shared_by_instances(self):
+        self._makeOne(self.directory).put("abcd", "foo\n")
+        cache = self._makeOne(self.directory)
+        self.assertEqual(cache.get("abcd"), "foo\n")
+        self.assertEqual(cache.get("abce"), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_evict(self):
+        cache = self._makeOne(self.directory, max_size=10)
+        cache.put("a0", "x" * 4)
+        os.utime(cache.path("a0"), (0, 0))
+        cache.put("a1", "x" * 4)
+        os.utime(cache.path("a1"), (1, 1))
+        cache.get("a0")  # used recently
+        cache.put("a2", "x" * 4)
+        self.assertEqual(cache.get("a0"), "x" * 4)
+        self.assertEqual(cache.get("a1"), None)
+        self.assertEqual(cache.get("a2"), "x" * 4)
+
+    def test_invalid_key(self):
+        cache = self._makeOne(self.directory)
+        with self.assertRaises(ValueError):
+            cache.get("../x")
@@ -1,6 +1,6 @@
 # type: ignore
 import unittest
-from evilunit import test_function
+from evilunit import test_function, test_target
 
 
 @test_function("prestring.go:goname")
@@ -19,3 +19,47 @@ class GoNameTests(unittest.TestCase):
         actual = self._callFUT("400times")
         expected = "Num400Times"
         self.assertEqual(actual, expected)
+
+
+@test_target("prestring.go.codeobject:Module")
+class CodeObjectModuleTests(unittest.TestCase):
+    def _build(self, m):
+        m.package("main")
+        m.import_("")  # the import area is placed here
+        with m.func("main"):
+            m.stmt("fmt.Println(1)")
+        m.import_("fmt")  # after sealed
+        with m.func("f"):
+            m.stmt("os.Exit(1)")
+        m.import_("os")
+        return m
+
+    def test_stream_to(self):
+        from io import StringIO
+
+        fp = StringIO()
+        m = self._build(self._makeOne().stream_to(fp))
+        m.close()
+        expected = str(self._build(self._makeOne()))
+        self.assertIn('import (\n\t"fmt"\n\t"os"\n)', expected)
+        self.assertEqual(fp.getvalue(), expected)
+
+    def test_fork(self):
+        m = self._makeOne()
+        m.package("main")
+        m.import_("fmt")
+        with m.import_group() as im:
+            im("a")
+        forked = m.fork()
+
+        m.import_("os")
+        im("b")  # the group is still changeable, after forked
+        forked.import_("strings")
+        self.assertEqual(
+            str(m),
+            'package main\n\nimport (\n\t"fmt"\n\t"os"\n)\n\nimport (\n\t"a"\n\t"b"\n)',
+        )
+        self.assertEqual(
+            str(forked),
+            'package main\n\nimport (\n\t"fmt"\n\t"strings"\n)\n\nimport (\n\t"a"\n)',
+        )
@@ -0,0 +1,74 @@
+# type: ignore
+import pickle
+import unittest
+from evilunit import test_target
+
+
+@test_target("prestring.ir:lower")
+class Tests(unittest.TestCase):
+    def _callFUT(self, m):
+        return self._getTarget()(m)
+
+    def _build_python(self):
+        from prestring.python import PythonModule
+
+        m = PythonModule()
+        m.from_("os", "path")
+        m.import_("sys")
+        with m.class_("A"):
+            with m.def_("f", "self"):
+                m.docstring("hello\nworld")
+                m.return_(m.format("{!r}", "x"))
+        m.from_("os", "getcwd")  # added to the FromStatement, above
+        m.stmt("A().f()")
+        return m
+
+    def _build_go(self):
+        from prestring.go import GoModule
+
+        m = GoModule()
+        m.package("main")
+        with m.import_group() as im:
+            im.import_("fmt")
+        with m.func("main"):
+            m.stmt('fmt.Println("hello")')
+        im.import_("os")  # added after the use
+        return m
+
+    def test_same_as_str(self):
+        for m in (self._build_python(), self._build_go()):
+            with self.subTest(m=m):
+                ir = self._callFUT(m)
+                self.assertEqual(str(ir), str(m))
+
+    def test_dumps_and_loads(self):
+        from prestring.ir import IR
+
+        m = self._build_python()
+        ir = self._callFUT(m)
+        data = ir.dumps()
+        self.assertEqual(IR.loads(data), ir)
+        self.assertEqual(str(IR.loads(data)), str(m))
+        self.assertEqual(str(pickle.loads(pickle.dumps(ir))), str(m))
+
+        with self.assertRaises(ValueError):
+            IR.loads(data[:-1])
+
+    def test_snapshot(self):
+        from prestring import Module
+
+        m = Module()
+        m.stmt("x = {}", m.format("{}", "before"))
+        ir = self._callFUT(m)
+        m.stmt("y = 1")
+        self.assertEqual(str(ir), "x = before")
+
+    def test_string_table(self):
+        from prestring import Module
+
+        m = Module()
+        for i in range(100):
+            m.stmt("pass")
+        ir = self._callFUT(m)
+        self.assertEqual(len(ir), 100)
+        self.assertEqual(ir.strings, ["pass"])
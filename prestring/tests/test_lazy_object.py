@@ -146,3 +146,55 @@ class MixedTests(unittest.TestCase):
         args = LazyArgumentsAndKeywords(kwargs={"x": 1})
         target = LazyFormat("{fnname}({args})", fnname="foo", args=args)
         self.assertEqual(str(target), "foo(x=1)")
+
+
+class LowMemoryTests(unittest.TestCase):
+    def setUp(self):
+        from prestring import utils
+
+        self.addCleanup(setattr, utils, "low_memory", utils.low_memory)
+        utils.low_memory = True
+
+    def test_released(self):
+        import weakref
+        from prestring.utils import LazyFormat
+
+        class Node:
+            def __str__(self):
+                return "node"
+
+        node = Node()
+        ref = weakref.ref(node)
+        target = LazyFormat("x = {}", node)
+        del node
+        self.assertIsNotNone(ref())
+        self.assertEqual(str(target), "x = node")
+        self.assertIsNone(ref())
+        self.assertEqual(str(target), "x = node")
+
+    def test_bool(self):
+        from prestring.utils import LazyArguments, LazyKeywords
+        from prestring.utils import LazyArgumentsAndKeywords
+
+        args = LazyArguments(["x"])
+        kwargs = LazyKeywords({"y": 1})
+        self.assertEqual((str(args), str(kwargs)), ("x", "y=1"))
+        self.assertEqual((args.args, kwargs.kwargs), ([], {}))
+        self.assertTrue(args)
+        self.assertTrue(kwargs)
+        self.assertFalse(LazyArguments([]))
+        self.assertEqual(str(LazyArgumentsAndKeywords(args, kwargs)), "x, y=1")
+
+    def test_module(self):
+        from prestring import utils
+        from prestring.python import PythonModule
+
+        def build():
+            m = PythonModule()
+            with m.def_("f", "x", "*", y="1"):
+                m.stmt("print({}, {!r})", m.format("{}", "x"), "y")
+            return str(m)
+
+        expected = build()
+        utils.low_memory = False
+        self.assertEqual(build(), expected)
@@ -1,5 +1,6 @@
 # type: ignore
 from evilunit import test_target
+from io import StringIO
 import unittest
 
 
@@ -102,3 +103,694 @@ class ModuleTests(unittest.TestCase):
             "@something",
         ]
         self.assertEqual(result, expected)
+
+    def test_stmts(self):
+        from prestring.codeobject import Symbol
+
+        m = self._makeOne()
+        items = ["foo", m.format("bar{}", 1), Symbol("x")(1), ""]
+        m.stmts(items)
+        expected = self._makeOne()
+        for x in items:
+            expected.stmt(x)
+        self.assertEqual(m.body.body, expected.body.body)
+        self.assertEqual(str(m), "foo\nbar1\nx(1)")
+
+    def test_scope_with_error(self):
+        m = self._makeOne(indent="@")
+        m.stmt("foo")
+        with self.assertRaises(ZeroDivisionError):
+            with m.scope():
+                m.stmt("bar")
+                1 / 0
+        m.stmt("boo")
+        self.assertEqual(str(m), "foo\n@bar\nboo")
+
+    def test_anchor(self):
+        m = self._makeOne()
+        m.stmt("package main")
+        m.anchor("imports")
+        m.stmt("func main() {")
+        self.assertEqual(str(m), "package main\nfunc main() {")
+
+        m.at("imports").stmt('import "fmt"')
+        m.at("imports").stmt('import "os"')
+        self.assertEqual(
+            str(m), 'package main\nimport "fmt"\nimport "os"\nfunc main() {'
+        )
+
+        with self.assertRaises(ValueError):
+            m.anchor("imports")
+        with self.assertRaises(KeyError):
+            m.at("header")
+
+    def test_fork(self):
+        m = self._makeOne()
+        m.stmt("header")
+        m.anchor("imports").stmt("import os")
+        subm = m.submodule("helper")
+        forked = m.fork()
+
+        forked.stmt("foo")
+        forked.at("imports").stmt("import re")
+        m.stmt("bar")
+        self.assertEqual(str(m), "header\nimport os\nhelper\nbar")
+        self.assertEqual(str(forked), "header\nimport os\nimport re\nhelper\nfoo")
+
+        # shared submodules are copied for the forks, on change
+        subm.stmt("boo")
+        m.at("imports").stmt("import sys")
+        self.assertEqual(
+            str(m), "header\nimport os\nimport sys\nhelper\nboo\nbar"
+        )
+        self.assertEqual(str(forked), "header\nimport os\nimport re\nhelper\nfoo")
+
+    def test_fork_nested(self):
+        m = self._makeOne()
+        outer = m.submodule("outer")
+        inner = outer.submodule("inner")
+        forked = m.fork()
+        forked2 = forked.fork()
+        str(forked)  # cached
+
+        inner.stmt("x")
+        self.assertEqual(str(m), "outer\ninner\nx")
+        self.assertEqual(str(forked), "outer\ninner")
+        self.assertEqual(str(forked2), "outer\ninner")
+        outer.stmt("y")
+        self.assertEqual(str(m), "outer\ninner\nx\ny")
+        self.assertEqual(str(forked), "outer\ninner")
+        self.assertEqual(str(forked2), "outer\ninner")
+
+    def test_dropped_fork_is_collected(self):
+        import gc
+        import weakref
+
+        m = self._makeOne()
+        subm = m.submodule("helper")
+        forked = m.fork()
+        forked.stmt("foo")
+        self.assertEqual(str(forked), "helper\nfoo")
+
+        ref = weakref.ref(forked)
+        del forked
+        gc.collect()
+        self.assertIsNone(ref())
+
+        # the source is kept alive by its forks, so the shared ones are copied
+        forked = m.fork()
+        self.assertEqual(str(forked), "helper")
+        del m
+        gc.collect()
+        subm.stmt("boo")
+        self.assertEqual(str(forked), "helper")
+
+    def test_custom_parser_and_emitter(self):
+        from prestring import Emitter, FrameList, Parser
+
+        class MyFrameList(FrameList):
+            def push_frame(self):
+                super().push_frame()
+                self.current.append("{")
+
+        class MyEmitter(Emitter):
+            def emit(self, framelist, evaluator):
+                return super().emit(framelist, evaluator).upper()
+
+        m = self._makeOne(parser=Parser(framelist_factory=MyFrameList))
+        m.stmt("foo")
+        with m.scope():
+            m.stmt("bar")
+        self.assertEqual(str(m), "foo\n    {\n    bar")
+
+        m = self._makeOne(emitter=MyEmitter())
+        m.stmt("foo")
+        m.submodule("bar")
+        self.assertEqual(str(m), "FOO\nBAR")
+        self.assertEqual("".join(m.iter_chunks()), "FOO\nBAR")
+
+
+@test_target("prestring:Module")
+class StreamingTests(unittest.TestCase):
+    def _render(self, m):
+        return "".join(m.iter_chunks())
+
+    def _classic(self, m):
+        tokens = m.lexer.lex(m.body)
+        return m.emitter.emit(m.parser.parse(tokens), m.create_evaulator())
+
+    def test_same_as_str(self):
+        m = self._makeOne(indent="@")
+        m.stmt("foo")
+        with m.scope():
+            m.stmt("boo")
+            subm = m.submodule("#--- TBD ---")
+            with m.scope():
+                m.stmt("bar")
+            m.stmt("")
+        m.stmt("foo")
+        subm.stmt("sub")
+        self.assertEqual(self._render(m), self._classic(m))
+        self.assertEqual(str(m), self._classic(m))
+
+    def test_trailing_whitespace_is_stripped(self):
+        m = self._makeOne()
+        m.stmt("foo")
+        m.stmt("")
+        m.stmt("  ")
+        self.assertEqual(self._render(m), "foo")
+
+    def test_unbalanced_unindent(self):
+        from prestring import INDENT, UNINDENT
+
+        m = self._makeOne(indent="@")
+        m.stmt("foo")
+        m.append(UNINDENT)
+        m.append(INDENT)
+        m.stmt("bar")
+        self.assertEqual(self._render(m), self._classic(m))
+
+    def test_small_chunks(self):
+        m = self._makeOne(indent="@")
+        m.emitter.bufsize = 1
+        for i in range(3):
+            m.stmt("foo{}", i)
+            with m.scope():
+                m.stmt("bar")
+            m.stmt("  ")
+        chunks = list(m.iter_chunks())
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), self._classic(m))
+
+    def test_write_to(self):
+        m = self._makeOne()
+        m.stmt("foo")
+        m.submodule("bar")
+        o = StringIO()
+        m.write_to(o)
+        self.assertEqual(o.getvalue(), "foo\nbar")
+
+    def test_lazy_submodule(self):
+        sizes = []
+
+        def fill(m):
+            for i in range(3):
+                m.append("item(")
+                m.stmt("{})", i)
+                with m.scope():
+                    m.stmt("pass")
+                yield
+                sizes.append(len(m.body.body))  # dropped, after emitted
+
+        m = self._makeOne(indent="@")
+        m.stmt("foo")
+        with m.scope():
+            m.lazy_submodule(fill)
+        m.stmt("bar")
+
+        expected = "foo\n@item(0)\n@@pass\n@item(1)\n@@pass\n@item(2)\n@@pass\nbar"
+        self.assertEqual(str(m), expected)
+        self.assertEqual(sizes, [0, 0, 0])
+        self.assertEqual("".join(m.iter_chunks()), expected)  # generated again
+        self.assertEqual(len(sizes), 6)
+
+    def test_stream_to(self):
+        fp = StringIO()
+        m = self._makeOne(indent="@").stream_to(fp)
+        m.stmt("foo")
+        imports = m.anchor("imports")
+        with m.scope():
+            m.stmt("bar")
+            sub = m.submodule("sub")
+        m.append("boo")
+        m.seal()
+        self.assertEqual(fp.getvalue(), "foo")  # not after the open anchor
+        self.assertEqual(m.body.body, ["boo"])  # not completed
+        with self.assertRaises(RuntimeError):
+            sub.stmt("changed")
+
+        m.stmt("")
+        m.seal()
+        imports.stmt("import x")
+        m.at("imports").stmt("import y")
+        m.close()
+        expected = "foo\nimport x\nimport y\n@bar\n@sub\nboo"
+        self.assertEqual(fp.getvalue(), expected)
+
+
+@test_target("prestring:Module")
+class IncrementalRenderTests(unittest.TestCase):
+    class Counter:
+        def __init__(self, value):
+            self.value = value
+            self.called = 0
+
+        def __str__(self):
+            self.called += 1
+            return self.value
+
+    def test_unchanged_submodule_is_not_evaluated_again(self):
+        m = self._makeOne(indent="@")
+        m.stmt("foo")
+        subm = m.submodule()
+        ob = self.Counter("bar")
+        with subm.scope():
+            subm.stmt(subm.format("{}", ob))  # the lazy objects are evaluated once
+        m.stmt("boo")
+        self.assertEqual(str(m), "foo\n@bar\nboo")
+
+        m.stmt("yay")
+        self.assertEqual(str(m), "foo\n@bar\nboo\nyay")
+        self.assertEqual(ob.called, 1)
+
+    def test_changed_stringer(self):
+        class Names:
+            def __init__(self, *items):
+                self.items = list(items)
+
+            def __str__(self):
+                return ", ".join(self.items)
+
+        m = self._makeOne()
+        subm = m.submodule()
+        names = Names("a")
+        subm.stmt(names)
+        m.stmt("boo")
+        self.assertEqual(str(m), "a\nboo")
+
+        # changed without any mutation of the module, so not cached
+        names.items.append("b")
+        self.assertEqual(str(m), "a, b\nboo")
+        self.assertEqual(m.fingerprint(), m.fingerprint())
+        before = m.fingerprint()
+        names.items.append("c")
+        self.assertNotEqual(m.fingerprint(), before)
+
+    def test_streaming_is_not_cached(self):
+        from prestring import Lexer, Sentence
+
+        counts = [0]
+
+        def sentence_factory():
+            counts[-1] += 1
+            return Sentence()
+
+        m = self._makeOne(indent="@", lexer=Lexer(None, sentence_factory))
+        subm = m.submodule()
+        subm.stmt("bar")
+        m.stmt("boo")
+
+        def lexed(render):
+            counts.append(0)
+            self.assertEqual(render(), "bar\nboo")
+            return counts[-1]
+
+        # the outputs are not kept by write_to() (the cached ones are used)
+        streamed = lexed(lambda: "".join(m.iter_chunks()))
+        self.assertEqual(lexed(lambda: "".join(m.iter_chunks())), streamed)
+        self.assertEqual(lexed(lambda: str(m)), streamed)
+        self.assertLess(lexed(lambda: "".join(m.iter_chunks())), streamed)
+
+    def test_changed_nested_prestring(self):
+        from prestring import PreString
+
+        m = self._makeOne()
+        subm = m.submodule()
+        p = PreString("a")
+        subm.append(p)
+        subm.stmt("")
+        other = m.submodule()
+        other.append(p)  # included twice
+        self.assertEqual(str(m), "a\na")
+        fingerprint = m.fingerprint()
+
+        p.append("b")
+        self.assertEqual(str(m), "ab\nab")
+        self.assertNotEqual(m.fingerprint(), fingerprint)
+
+    def test_pickle(self):
+        import pickle
+        from prestring import PreString
+
+        shared = self._makeOne()
+        shared.stmt("foo")
+        m = self._makeOne()
+        subm = m.submodule()
+        subm.append(shared)
+        subm.append(PreString("bar"))
+        m.fork()
+        self.assertEqual(str(m), "foo\nbar")
+
+        loaded, loaded_shared = pickle.loads(pickle.dumps((m, shared)))
+        self.assertEqual(str(loaded), "foo\nbar")
+        loaded_shared.stmt("boo")
+        self.assertEqual(str(loaded), "foo\nboo\nbar")
+        self.assertEqual(str(m), "foo\nbar")
+
+    def test_dropped_parent_is_collected(self):
+        import gc
+        import weakref
+        from prestring import PreString
+
+        shared = self._makeOne()
+        shared.stmt("foo")
+        fragment = PreString("bar")
+        m = self._makeOne()
+        m.append(shared)
+        m.submodule().append(fragment)
+        self.assertEqual(str(m), "foo\nbar")
+        m.fingerprint()
+
+        # not kept alive by the shared submodule and fragment
+        ref = weakref.ref(m)
+        del m
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_changed_submodule(self):
+        m = self._makeOne(indent="@")
+        m.stmt("foo")
+        with m.scope():
+            subm = m.submodule("bar")
+            subsubm = subm.submodule("")
+        m.stmt("boo")
+        self.assertEqual(str(m), "foo\n@bar\nboo")
+
+        subsubm.stmt("yay")
+        self.assertEqual(str(m), "foo\n@bar\n@yay\nboo")
+        subm.insert_before("@")
+        self.assertEqual(str(m), "foo\n@@bar\n@yay\nboo")
+        subsubm.clear()
+        self.assertEqual(str(m), "foo\n@@bar\nboo")
+
+    def test_unbalanced_submodule(self):
+        from prestring import INDENT, UNINDENT
+
+        m = self._makeOne(indent="@")
+        subm = m.submodule("foo")
+        subm.append(INDENT)
+        m.stmt("bar")
+        m.append(UNINDENT)
+        m.stmt("boo")
+        self.assertEqual(str(m), "foo\n@bar\nboo")
+        subm.stmt("yay")
+        self.assertEqual(str(m), "foo\n@yay\n@bar\nboo")
+
+    def test_reindented(self):
+        m = self._makeOne(indent="@")
+        shared = self._makeOne(indent="@")
+        shared.stmt("foo")
+        with shared.scope():
+            shared.stmt("bar")
+
+        with m.scope():
+            m.append(shared)
+        self.assertEqual(str(m), "@foo\n@@bar")
+        with m.scope():
+            with m.scope():
+                m.append(shared)
+        self.assertEqual(str(m), "@foo\n@@bar\n@@foo\n@@@bar")
+
+    def test_shared_in_single_rendering(self):
+        m = self._makeOne(indent="@")
+        shared = self._makeOne(indent="@")
+        ob = self.Counter("foo")
+        shared.stmt(shared.format("{}", ob))
+
+        with m.scope():
+            m.append(shared)
+            with m.scope():
+                m.append(shared)
+                m.append(shared)
+        self.assertEqual(str(m), "@foo\n@@foo\n@@foo")
+        self.assertEqual(ob.called, 1)
+
+    def test_immutable(self):
+        class Volatile:
+            def __init__(self):
+                self.called = 0
+
+            def on_lex(self, lexer, tokens, sentence):
+                self.called += 1
+                return lexer.lex(["volatile"], tokens=tokens)
+
+        m = self._makeOne(indent="@")
+        header = self._makeOne(indent="@")
+        ob = Volatile()
+        header.append(ob)
+        header.mark_immutable()
+
+        m.append(header)
+        m.stmt("foo")
+        self.assertEqual(str(m), "volatile\nfoo")
+        m.stmt("bar")
+        self.assertEqual(str(m), "volatile\nfoo\nbar")
+        self.assertEqual(str(header), "volatile")
+        self.assertEqual(ob.called, 1)
+
+    def test_immutable__changing_raises(self):
+        m = self._makeOne()
+        subm = m.submodule("foo")
+        m.mark_immutable()
+
+        with self.assertRaises(RuntimeError):
+            m.stmt("bar")
+        with self.assertRaises(RuntimeError):
+            subm.clear()
+        self.assertEqual(str(m), "foo")
+
+
+@test_target("prestring:Module")
+class FingerprintTests(unittest.TestCase):
+    Counter = IncrementalRenderTests.Counter
+
+    def _build(self):
+        m = self._makeOne()
+        m.stmt("foo")
+        subm = m.submodule()
+        with subm.scope():
+            subm.stmt("bar")
+        m.stmt("boo")
+        return m, subm
+
+    def test_same_content(self):
+        m, _ = self._build()
+        m2, _ = self._build()
+        self.assertEqual(m.fingerprint(), m2.fingerprint())
+
+        m2.stmt("yay")
+        self.assertNotEqual(m.fingerprint(), m2.fingerprint())
+
+    def test_changed_submodule(self):
+        m, subm = self._build()
+        before = m.fingerprint()
+        ob = self.Counter("yay")
+        subm.stmt(subm.format("{}", ob))
+        after = m.fingerprint()
+        self.assertNotEqual(before, after)
+        self.assertEqual(m.fingerprint(), after)
+        self.assertEqual(ob.called, 1)  # cached
+
+        subm.body.pop()  # NEWLINE
+        subm.body.pop()
+        self.assertEqual(m.fingerprint(), before)
+
+    def test_nested_submodules(self):
+        m = root = self._makeOne(indent=" ")
+        for i in range(DeepNestingTests.N):
+            m.stmt("x")
+            m = m.submodule()
+        before = root.fingerprint()
+        m.stmt("y")
+        self.assertNotEqual(root.fingerprint(), before)
+
+
+@test_target("prestring:Module")
+class TextBlockTests(unittest.TestCase):
+    def test_same_as_stmt_for_each_line(self):
+        text = "foo\n\n  bar"
+        m0 = self._makeOne(indent="@")
+        m1 = self._makeOne(indent="@")
+        for m in (m0, m1):
+            m.stmt("x")
+            with m.scope():
+                with m.scope():
+                    if m is m0:
+                        for line in text.split("\n"):
+                            m.stmt(line)
+                    else:
+                        m.text_block(text)
+            m.stmt("y")
+        self.assertEqual(str(m1), "x\n@@foo\n\n@@  bar\ny")
+        self.assertEqual(str(m1), str(m0))
+        self.assertEqual("".join(m1.iter_chunks()), str(m0))
+
+    def test_freeze(self):
+        m = self._makeOne(indent="@")
+        m.stmt("x")
+        subm = m.submodule("foo")
+        with subm.scope():
+            subm.stmt("bar")
+        subm.stmt("")
+        m.stmt("y")
+        with m.scope():
+            m.append(subm)
+        expected = "x\nfoo\n@bar\n\ny\n@foo\n@@bar"
+        self.assertEqual(str(m), expected)
+
+        subm.freeze()
+        self.assertEqual(len(subm.body.body), 1)
+        self.assertEqual(str(m), expected)
+        with self.assertRaises(RuntimeError):
+            subm.stmt("boo")
+
+    def test_freeze_unbalanced(self):
+        from prestring import INDENT, UNINDENT
+
+        m = self._makeOne(indent="@")
+        subm = m.submodule("foo")
+        subm.append(INDENT)
+        m.stmt("bar")
+        m.append(UNINDENT)
+        m.stmt("boo")
+        self.assertEqual(str(m), "foo\n@bar\nboo")
+
+        items = list(subm.body.body)
+        subm.freeze()  # depends on the surroundings, so kept
+        self.assertEqual(subm.body.body, items)
+        self.assertTrue(subm.immutable)
+        self.assertEqual(str(m), "foo\n@bar\nboo")
+
+
+@test_target("prestring:Module")
+class DeepNestingTests(unittest.TestCase):
+    N = 3000  # deeper than the default recursion limit
+
+    def _classic(self, m):
+        tokens = m.lexer.lex(m.body)
+        return m.emitter.emit(m.parser.parse(tokens), m.create_evaulator())
+
+    def test_nested_scopes(self):
+        import contextlib
+
+        m = self._makeOne(indent=" ")
+        with contextlib.ExitStack() as s:
+            for i in range(self.N):
+                m.stmt("x")
+                s.enter_context(m.scope())
+            m.stmt("y")
+        m.stmt("z")
+
+        lines = str(m).split("\n")
+        self.assertEqual(len(lines), self.N + 2)
+        self.assertEqual(lines[-2], " " * self.N + "y")
+        self.assertEqual(lines[-1], "z")
+        self.assertEqual(self._classic(m), str(m))
+
+    def test_nested_submodules(self):
+        m = root = self._makeOne(indent=" ")
+        for i in range(self.N):
+            m.stmt("x")
+            m = m.submodule()
+        m.stmt("y")
+
+        lines = str(root).split("\n")
+        self.assertEqual(len(lines), self.N + 1)
+        self.assertEqual(lines[-1], "y")
+        self.assertEqual(self._classic(root), str(root))
+
+        m.stmt("z")
+        self.assertEqual(str(root).split("\n")[-2:], ["y", "z"])
+
+
+@test_target("prestring:Lexer")
+class LexerDispatchTests(unittest.TestCase):
+    def _makeOne(self):
+        return self._getTarget()(None, None)
+
+    def _register(self, typ, kind):
+        Lexer = self._getTarget()
+
+        def cleanup():
+            Lexer._registered.pop(typ)
+            Lexer._kinds.clear()
+
+        Lexer.register(typ, kind)
+        self.addCleanup(cleanup)
+
+    def test_classify(self):
+        from prestring import Module, NEWLINE, INDENT
+        from prestring.utils import LazyFormat
+        from prestring.codeobject import Symbol
+        from prestring.python import FromStatement
+
+        Lexer = self._getTarget()
+        candidates = [
+            ("x", Lexer.TEXT),
+            (LazyFormat("{}", 1), Lexer.TEXT),
+            (NEWLINE, Lexer.SEP),
+            (INDENT, Lexer.SENTINEL),
+            (Symbol("x"), Lexer.EMIT),
+            (FromStatement("os"), Lexer.ON_LEX),
+            (Module(), Lexer.MODULE),
+        ]
+        for v, expected in candidates:
+            with self.subTest(v=v):
+                self.assertEqual(Lexer.kind_of(v), expected)
+
+    def test_register(self):
+        from prestring import Module
+
+        class Upper:
+            emit = None  # treated as an emittable, by default
+
+            def __init__(self, value):
+                self.value = value
+
+            def __str__(self):
+                return self.value.upper()
+
+        m = Module()
+        m.append("x = ")
+        m.append(Upper("y"))
+        m.stmt("")
+        self._register(Upper, self._getTarget().TEXT)
+        self.assertEqual(str(m), "x = Y")
+
+    def test_instance_attributes(self):
+        from prestring import Module
+
+        class OnLex:
+            def __init__(self, items):
+                self.on_lex = lambda lexer, tokens, sentence: lexer.lex(items)
+
+            def __str__(self):
+                return "ONLEX-STR"
+
+        class Sep:
+            def __init__(self):
+                self.kind = "sep"
+
+        m = Module()
+        m.append(OnLex(["x"]))
+        self.assertEqual(str(m), "x")
+
+        m = Module()
+        m.append("x")
+        m.append(Sep())
+        m.append("y")
+        self.assertEqual(str(m), "x\ny")
+
+    def test_overridden_default_on_lex(self):
+        from prestring import Module
+
+        class Hidden(Module):
+            def default_on_lex(self, lexer, tokens, sentence):
+                return tokens
+
+        m = Module()
+        m.stmt("x")
+        sm = m.submodule(factory=Hidden)
+        sm.stmt("y")
+        m.stmt("z")
+        self.assertEqual(str(m), "x\nz")
@@ -0,0 +1,44 @@
+# type: ignore
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from evilunit import test_target
+
+
+@test_target("prestring.parallel:ParallelEmitter")
+class Tests(unittest.TestCase):
+    def _render(self, m, emitter):
+        tokens = m.lexer.lex(m.body)
+        return emitter.emit(m.parser.parse(tokens), m.create_evaulator())
+
+    def _build(self, m):
+        m.from_("os", "path")
+        for i in range(10):
+            with m.def_("f{}", i):
+                with m.if_("path.exists(x)"):
+                    m.return_(m.format("{!r}", i))
+            m.stmt("x{} = f{}()", i, i)
+        return m
+
+    def test_same_as_serial(self):
+        from prestring.python import PythonModule
+
+        m = self._build(PythonModule())
+        expected = str(m)
+        emitter = self._makeOne(processes=2, min_items=0)
+        self.assertEqual(self._render(m, emitter), expected)
+
+        m = self._build(PythonModule(emitter=emitter))
+        self.assertEqual(str(m), expected)
+
+    def test_not_picklable(self):
+        from prestring import Module
+
+        m = Module()
+        m.stmt("foo")
+        m.stmt(m.format("{}", type("Local", (), {"__str__": lambda self: "bar"})()))
+        with m.scope():
+            m.stmt("boo")
+        expected = str(m)
+        with ProcessPoolExecutor(2) as executor:  # sent as pickled snapshots
+            emitter = self._makeOne(processes=2, min_items=0, executor=executor)
+            self.assertEqual(self._render(m, emitter), expected)
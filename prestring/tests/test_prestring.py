@@ -34,3 +34,86 @@ class PreStringTests(unittest.TestCase):
         result = target + self._makeOne("boo")
         result = result + result
         self.assertEqual(str(result), "fooboofooboo")
+
+    def test_shared_operand(self):
+        target = self._makeOne("foo")
+        result = target + "bar"
+        target += "boo"
+        self.assertEqual(str(result), "fooboobar")
+
+    def test_long_chain(self):
+        n = 10000  # deeper than the default recursion limit
+        result = self._makeOne("")
+        for i in range(n):
+            result = result + "x"
+        self.assertEqual(str(result), "x" * n)
+        self.assertEqual(len(list(result)), n + 1)
+
+    def test_insert_before_and_after(self):
+        target = self._makeOne("foo") + "bar"
+        target.insert_before("@")
+        target.insert_after("@")
+        self.assertEqual(str(target), "@foobar@")
+
+
+@test_target("prestring:Sentence")
+class SentenceTests(unittest.TestCase):
+    def test_is_empty(self):
+        target = self._makeOne()
+        self.assertTrue(target.is_empty())
+        target.append("").append("")
+        self.assertTrue(target.is_empty())
+        target.append("x")
+        self.assertFalse(target.is_empty())
+        target.append("")
+        self.assertFalse(target.is_empty())
+
+    def test_is_empty__object(self):
+        from prestring import PreString
+
+        target = self._makeOne()
+        target.append(PreString(""))  # not compared with str()
+        self.assertFalse(target.is_empty())
+
+    def test_interned(self):
+        end = ")"
+        x = self._makeOne().append("}" + end).body[0]
+        y = self._makeOne().append("}" + end).body[0]
+        self.assertIs(x, y)
+
+    def test_slotted(self):
+        target = self._makeOne()
+        with self.assertRaises(AttributeError):
+            target.extra = 1
+        self.assertEqual(str(target.append("x").append(1)), "x1")
+
+
+class ImportTests(unittest.TestCase):
+    def test_deferred(self):
+        import subprocess
+        import sys
+
+        code = "\n".join(
+            [
+                "import sys",
+                "import prestring.python, prestring.go, prestring.output",
+                "deferred = ['json', 'hashlib', 'logging', 'tempfile']",
+                "print(sorted(k for k in deferred if k in sys.modules))",
+            ]
+        )
+        p = subprocess.run(
+            [sys.executable, "-c", code],
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+        self.assertEqual(p.stdout.strip(), "[]")
+
+    def test_getattr(self):
+        import logging
+        import prestring
+
+        self.assertIs(prestring.logger, logging.getLogger("prestring"))
+        self.assertEqual(prestring.template.__name__, "prestring.template")
+        with self.assertRaises(AttributeError):
+            prestring.no_such_attribute
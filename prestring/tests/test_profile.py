@@ -0,0 +1,110 @@
+# type: ignore
+import os
+import sys
+import subprocess
+import unittest
+from evilunit import test_target
+
+
+@test_target("prestring.profile:RenderStats")
+class Tests(unittest.TestCase):
+    def _build(self):
+        from prestring.python import PythonModule
+
+        m = PythonModule()
+        for i in range(3):
+            sub = m.submodule()
+            with sub.def_("f{}".format(i)):
+                sub.return_(sub.format("{!r}", i))
+        return m, sub
+
+    def test_same_output(self):
+        m, sub = self._build()
+        expected = str(self._build()[0])
+        stats = self._makeOne()
+        m.render_stats = stats
+        self.assertEqual(str(m), expected)
+
+        self.assertEqual(stats.renders, 1)
+        self.assertEqual(stats.sentences, 9)  # including the blank lines (sep)
+        self.assertEqual(stats.lazy, 6)
+        self.assertEqual(stats.frames, 4)
+        self.assertEqual(stats.bytes, len(expected))
+        self.assertEqual(stats.cached, 0)
+        self.assertEqual(len(stats.submodules), 4)
+        self.assertIn("evaluate", stats.report())
+
+        sub.stmt("x")
+        str(m)
+        self.assertEqual(stats.renders, 2)
+        self.assertEqual(stats.cached, 2)  # the unchanged submodules
+        self.assertEqual(stats.submodules["PythonModule#0/2"].renders, 2)
+
+    def test_consumer_is_not_timed(self):
+        import time
+
+        class SlowWriter:
+            def write(self, s):
+                time.sleep(0.05)
+
+        m, _ = self._build()
+        m.emitter.bufsize = 1  # a chunk per line
+        stats = self._makeOne()
+        m.render_stats = stats
+        m.write_to(SlowWriter())
+        self.assertLess(stats.total, 0.05)
+
+    def test_with(self):
+        from prestring import Module
+
+        m, _ = self._build()
+        with self._makeOne() as stats:
+            str(m)
+        self.assertIsNone(Module.render_stats)
+        self.assertEqual(stats.renders, 1)
+
+    def test_environ(self):
+        code = "from prestring import Module; m = Module(); m.stmt('x'); str(m)"
+        env = {**os.environ, "PRESTRING_PROFILE": "1"}
+        p = subprocess.run(
+            [sys.executable, "-c", code], env=env, capture_output=True, text=True
+        )
+        self.assertEqual(p.returncode, 0, p.stderr)
+        self.assertIn("renders", p.stderr)
+
+
+@test_target("prestring.profile:main")
+class CommandTests(unittest.TestCase):
+    SCRIPT = """\
+from prestring.python import PythonModule
+
+def build(m):
+    with m.def_("f"):
+        m.stmt("pass")
+
+m = PythonModule()
+build(m.submodule())
+print(m)
+"""
+
+    def test_collapsed(self):
+        import tempfile
+        import prestring
+
+        with tempfile.TemporaryDirectory() as d:
+            script = os.path.join(d, "gen.py")
+            with open(script, "w") as wf:
+                wf.write(self.SCRIPT)
+            root = os.path.dirname(os.path.dirname(prestring.__file__))
+            env = {**os.environ, "PYTHONPATH": root}
+            output = os.path.join(d, "out")
+            cmd = [sys.executable, "-m", "prestring.profile"]
+            cmd.extend(["--format", "collapsed", "-o", output, script])
+            p = subprocess.run(cmd, env=env, capture_output=True, text=True)
+            self.assertEqual(p.returncode, 0, p.stderr)
+            self.assertEqual(p.stdout, "def f():\n    pass\n")
+
+            with open(output + ".time.collapsed") as rf:
+                stacks = [line.rsplit(" ", 1)[0] for line in rf]
+            self.assertIn("<module> (gen.py:1);build (gen.py:3);prestring:stmt", stacks)
+            self.assertTrue(os.path.exists(output + ".alloc.collapsed"))
@@ -0,0 +1,143 @@
+# type: ignore
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+from evilunit import test_target
+
+# the call sites must be outside of prestring, so compiled as gen.py
+SOURCE = textwrap.dedent(
+    """
+    from prestring.python import PythonModule
+
+    def gen():
+        m = PythonModule()
+        m.import_("os")
+        with m.def_("f", "x"):
+            m.stmt("y = {}", "x")
+            m.return_("y")
+        m.stmts(["a = 1", "b = 2"])
+        return m
+    """
+)
+
+
+class _Enabled:
+    def setUp(self):
+        from prestring import provenance
+
+        provenance.enable()
+        self.addCleanup(provenance.disable)
+
+    def _build(self, source=SOURCE):
+        ns = {}
+        exec(compile(source, "gen.py", "exec"), ns)
+        return ns["gen"]()
+
+
+@test_target("prestring.provenance:render")
+class Tests(_Enabled, unittest.TestCase):
+    def _callFUT(self, m):
+        return self._getTarget()(m)
+
+    def test_lines(self):
+        m = self._build()
+        text, smap = self._callFUT(m)
+        self.assertEqual(text, str(m))
+        self.assertEqual(len(smap), len(text.split("\n")))
+
+        expected = [
+            ("import os", ("gen.py", 6)),
+            ("def f(x):", ("gen.py", 7)),
+            ("    y = x", ("gen.py", 8)),
+            ("    return y", ("gen.py", 9)),
+            ("", None),
+            ("", None),
+            ("a = 1", ("gen.py", 10)),
+            ("b = 2", ("gen.py", 10)),
+        ]
+        actual = [
+            (line, smap.lookup(i)) for i, line in enumerate(text.split("\n"), 1)
+        ]
+        self.assertEqual(actual, expected)
+        self.assertIsNone(smap.lookup(0))
+        self.assertIsNone(smap.lookup(len(smap) + 1))
+
+    def test_blocks_and_submodules(self):
+        source = textwrap.dedent(
+            """
+            from prestring.python import PythonModule
+
+            def gen():
+                m = PythonModule()
+                with m.def_("f"):
+                    m.docstring("doc")
+                    m.text_block("x = 1")
+                m.submodule("g()", newline=False)
+                return m
+            """
+        )
+        m = self._build(source)
+        text, smap = self._callFUT(m)
+        self.assertEqual(text, str(m))
+        expected = [
+            ("def f():", ("gen.py", 6)),
+            ('    """', ("gen.py", 7)),
+            ("    doc", ("gen.py", 7)),
+            ('    """', ("gen.py", 7)),
+            ("    x = 1", ("gen.py", 8)),
+            ("", None),
+            ("", None),
+            ("g()", ("gen.py", 9)),
+        ]
+        actual = [
+            (line, smap.lookup(i)) for i, line in enumerate(text.split("\n"), 1)
+        ]
+        self.assertEqual(actual, expected)
+
+    def test_fingerprint(self):
+        from prestring import provenance
+
+        fingerprint = self._build().fingerprint()
+        provenance.disable()
+        self.assertEqual(self._build().fingerprint(), fingerprint)
+
+    def test_dumps(self):
+        from prestring.provenance import SourceMap
+
+        _, smap = self._callFUT(self._build())
+        loaded = SourceMap.loads(smap.dumps())
+        self.assertEqual(loaded.sources, smap.sources)
+        self.assertEqual(loaded.source, smap.source)
+        self.assertEqual(loaded.line, smap.line)
+
+    def test_disable(self):
+        from prestring import provenance
+
+        provenance.disable()
+        m = self._build()
+        _, smap = self._callFUT(m)
+        self.assertEqual(smap.sources, [])
+        self.assertEqual(str(m), str(self._build()))
+
+
+@test_target("prestring.output:output")
+class OutputTests(_Enabled, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_sidecar(self):
+        from prestring.provenance import SUFFIX, SourceMap
+
+        m = self._build()
+        with self._makeOne(root=self.directory) as fs:
+            fs.open("x.py", "w", opener=lambda: m)
+        path = os.path.join(self.directory, "x.py")
+        with open(path + SUFFIX) as rf:
+            smap = SourceMap.loads(rf.read())
+        self.assertEqual(smap.lookup(1), ("gen.py", 6))
+        with open(path) as rf:
+            self.assertEqual(len(smap), len(rf.read().split("\n")))
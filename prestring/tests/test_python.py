@@ -1,4 +1,5 @@
 # type: ignore
+from io import StringIO
 import unittest
 from evilunit import test_target
 
@@ -143,3 +144,180 @@ def hello(name: str) -> None:
         result = str(m).split("\n")
         expected = ["from foo import (", "@a,", "@b,", "@c,", ")", "from boo import x"]
         self.assertEqual(result, expected)
+
+    def test_fork(self):
+        m = self._makeOne()
+        m.import_("os")
+        m.from_("foo", "a")
+        forked = m.fork()
+        forked.from_("foo", "b")
+        forked.import_("re")
+        m.from_("foo", "c")
+        self.assertEqual(str(m), "import os\nfrom foo import (\n    a,\n    c,\n)")
+        self.assertEqual(
+            str(forked), "import os\nfrom foo import (\n    a,\n    b,\n)\nimport re"
+        )
+
+    def test_threads(self):
+        import sys
+        import threading
+
+        def build(imports, sub, i, barrier):
+            barrier.wait()
+            for j in range(50):
+                imports.import_("os")
+                imports.from_("typing", f"T{j}")
+                with sub.def_(f"f{i}_{j}"):
+                    sub.return_(j)
+
+        def run(n, *, threaded):
+            m = self._makeOne()
+            imports = m.anchor("imports")
+            subs = [m.submodule() for _ in range(n)]
+            barrier = threading.Barrier(n if threaded else 1)
+            args = [(imports, sub, i, barrier) for i, sub in enumerate(subs)]
+            if not threaded:
+                for a in args:
+                    build(*a)
+                return m
+            threads = [threading.Thread(target=build, args=a) for a in args]
+            for th in threads:
+                th.start()
+            for th in threads:
+                th.join()
+            return m
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            m = run(8, threaded=True)
+        finally:
+            sys.setswitchinterval(interval)
+        expected = str(run(8, threaded=False))
+        result = str(m)
+        self.assertEqual(result.count("import os"), 1)
+        self.assertEqual(result.count("from typing import ("), 1)
+        # the order of the shared imports depends on the threads, but the others not
+        self.assertEqual(sorted(result.split("\n")), sorted(expected.split("\n")))
+        i = expected.index("def ")
+        self.assertEqual(result[result.index("def ") :], expected[i:])  # noqa E203
+
+    def test_fingerprint(self):
+        m = self._makeOne()
+        m.from_("os", "path")
+        with m.def_("f"):
+            m.return_("path")
+        before = m.fingerprint()
+        m.from_("os", "getcwd")  # not a mutation of m, but the output is changed
+        self.assertNotEqual(m.fingerprint(), before)
+
+    def test_def_with_error(self):
+        m = self._makeOne()
+        with self.assertRaises(ZeroDivisionError):
+            with m.def_("f") as f:
+                m.return_(f)
+                1 / 0
+        m.stmt("g()")
+        self.assertEqual(str(m), "def f():\n    return f\ng()")  # no blank lines
+
+    def test_freeze(self):
+        m = self._makeOne()
+        with m.class_("A"):
+            methods = m.submodule()
+            with methods.def_("f", "self"):
+                methods.stmt("pass")
+            with methods.def_("g", "self"):
+                methods.stmt("pass")
+        toplevel = self._makeOne()
+        toplevel.append(methods)
+        expected = [str(m), str(toplevel)]
+        self.assertIn("        pass\n\n    def g", expected[0])  # a blank line
+
+        methods.freeze()
+        self.assertEqual(len(methods.body.body), 1)
+        self.assertEqual([str(m), str(toplevel)], expected)
+
+        multiline = self._makeOne()
+        multiline.stmt('x = """a\nb"""')
+        items = list(multiline.body.body)
+        multiline.freeze()  # cannot be re-indented, so kept
+        self.assertEqual(multiline.body.body, items)
+        self.assertTrue(multiline.immutable)
+
+    def test_stream_to(self):
+        fp = StringIO()
+        m = self._makeOne().stream_to(fp)
+        imports = m.anchor("imports")
+        with m.def_("f"):
+            m.stmt("pass")
+        self.assertEqual(fp.getvalue(), "")
+        self.assertEqual(len(m.body.body), 0)  # sealed, leaving the toplevel def
+        imports.import_("os")
+        with m.class_("A"):
+            with m.def_("f"):
+                m.stmt("pass")
+            self.assertNotEqual(len(m.body.body), 0)
+        m.close()
+        expected = (
+            "import os\ndef f():\n    pass\n\n\nclass A:\n    def f():\n        pass"
+        )
+        self.assertEqual(fp.getvalue(), expected)
+        self.assertEqual(str(m), "")
+
+    def test_stream_to_with_late_from(self):
+        fp = StringIO()
+        m = self._makeOne().stream_to(fp)
+        m.from_("typing", "T0")
+        with m.def_("f"):
+            m.stmt("pass")
+        m.from_("typing", "T1")  # after sealed, kept open as the import area
+        with m.def_("g"):
+            m.stmt("pass")
+        m.close()
+
+        expected = self._makeOne()
+        expected.from_("typing", "T0", "T1")
+        for name in ["f", "g"]:
+            with expected.def_(name):
+                expected.stmt("pass")
+        self.assertEqual(fp.getvalue(), str(expected))
+
+        frozen = self._makeOne()
+        frozen.from_("typing", "T0")
+        frozen.mark_immutable()
+        frozen.from_("typing", "T0")  # already imported, not changed
+        with self.assertRaises(RuntimeError):
+            frozen.from_("typing", "T1")
+
+    def test_docstring(self):
+        m = self._makeOne()
+        with m.def_("f"):
+            m.docstring("foo\n\n  bar")
+            m.stmt("pass")
+        expected = '''
+def f():
+    """
+    foo
+
+      bar
+    """
+    pass
+        '''.strip()
+        self.assertEqual(str(m), expected)
+
+    def test_iter_chunks(self):
+        m = self._makeOne()
+        m.from_("foo", "a", "b")
+        m.import_("re")
+        with m.class_("A"):
+            with m.def_("f", "self"):
+                m.return_("1")
+            with m.def_("g", "self"):
+                m.return_("2")
+        with m.def_("h"):
+            m.stmt("pass")
+        m.sep()
+        tokens = m.lexer.lex(m.body)  # not through FrameWriter
+        expected = m.emitter.emit(m.parser.parse(tokens), m.create_evaulator())
+        self.assertEqual("".join(m.iter_chunks()), expected)
+        self.assertEqual(str(m), expected)
@@ -0,0 +1,68 @@
+# type: ignore
+import unittest
+from evilunit import test_target
+
+
+@test_target("prestring.template:compile_template")
+class Tests(unittest.TestCase):
+    def _callFUT(self, m):
+        return self._getTarget()(m)
+
+    def _build(self, name, value):
+        from prestring.python import PythonModule
+
+        m = PythonModule()
+        m.import_("os")
+        with m.def_(name, "x"):
+            m.stmt("d = {}", "{'k': x}")
+            m.return_(m.format("{!r}, {}", value, name))
+        return m
+
+    def test_same_as_module(self):
+        from prestring.template import Slot
+
+        render = self._callFUT(self._build(Slot("name"), Slot("value")))
+        self.assertEqual(render.names, ("name", "value"))
+        for name, value in [("f", 1), ("g", "x")]:
+            with self.subTest(name=name, value=value):
+                expected = str(self._build(name, value))
+                self.assertEqual(render(name=name, value=value), expected)
+
+    def test_batch(self):
+        from prestring.template import Slot
+
+        render = self._callFUT(self._build(Slot("name"), Slot("value")))
+        names, values = ["f", "g", "h"], [1, 2, 3]
+        self.assertEqual(
+            render.batch(name=names, value=values),
+            [str(self._build(name, value)) for name, value in zip(names, values)],
+        )
+        with self.assertRaises(ValueError):
+            render.batch(name=names, value=values[:2])
+
+    def test_parameters(self):
+        from prestring.template import Slot
+
+        render = self._callFUT(self._build(Slot("name"), Slot("value")))
+        with self.assertRaises(TypeError):
+            render(name="f")
+        with self.assertRaises(TypeError):
+            render(name="f", value=1, other=2)
+        with self.assertRaises(TypeError):
+            render(name="f", valeu=1)  # misspelled
+
+    def test_changed_marker(self):
+        from prestring import Module
+        from prestring.template import Slot
+
+        for fmt in ["x = {:>5}", "x = {!r:>8}", "x = {!s:<8}"]:
+            with self.subTest(fmt=fmt):
+                m = Module()
+                m.stmt(fmt, Slot("a"))
+                with self.assertRaises(ValueError):
+                    self._callFUT(m)
+
+        m = Module()
+        m.stmt("x = {}", str(Slot("a"))[:3])  # sliced
+        with self.assertRaises(ValueError):
+            self._callFUT(m)
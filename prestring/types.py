@@ -1,5 +1,10 @@
 import typing as t
-import typing_extensions as tx
+import sys
+
+if sys.version_info >= (3, 8):
+    import typing as tx
+else:  # pragma: no cover
+    import typing_extensions as tx
 
 
 class Stringer(tx.Protocol):
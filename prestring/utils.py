@@ -1,3 +1,4 @@
+import os
 import typing as t
 from functools import partial, update_wrapper
 from collections import defaultdict
@@ -7,6 +8,12 @@ from .types import StrOrStringer
 # TODO: remove t.Any
 T = t.TypeVar("T")
 
+# if true, the lazy objects drop their inputs (e.g. the arguments of LazyFormat)
+# once their value is computed, so the inputs can be freed while the module is
+# alive. the inputs are empty after that (and modifying them has no effect, as
+# before). also enabled by PRESTRING_LOW_MEMORY=1
+low_memory = os.environ.get("PRESTRING_LOW_MEMORY", "") != ""
+
 
 # stolen from pyramid
 class reify(t.Generic[T]):
@@ -22,8 +29,24 @@ class reify(t.Generic[T]):
         if inst is None:
             return self  # type: ignore
         val = self.wrapped(inst)
-        setattr(inst, self.wrapped.__name__, val)
-        return val
+        # the first value wins, if computed by several threads at once
+        return inst.__dict__.setdefault(self.wrapped.__name__, val)  # type: ignore
+
+
+class _releasing(reify[T]):
+    """reify, and the inputs are dropped by inst._release(), if low_memory"""
+
+    def __get__(
+        self, inst: t.Optional[object], objtype: t.Optional[t.Type[t.Any]] = None
+    ) -> T:
+        if inst is None:
+            return self  # type: ignore
+        val = inst.__dict__.setdefault(
+            self.wrapped.__name__, self.wrapped(inst)
+        )
+        if low_memory:  # after stored, the other threads may still read the inputs
+            inst._release()  # type: ignore
+        return val  # type: ignore
 
 
 class Caller:
@@ -88,9 +111,9 @@ class LazyArgumentsAndKeywords:
 
     def _args(self) -> t.Iterator[t.Any]:
         r: t.List[t.Any] = []
-        if len(self.args.args):
+        if self.args:  # not len(), the inputs may be released (see low_memory)
             r.append(self.args)
-        if len(self.kwargs.kwargs):
+        if self.kwargs:
             r.append(self.kwargs)
         if self.tails is not None:
             r.append(self.tails)
@@ -128,8 +151,15 @@ class LazyArguments:
         self.args = args or []
         self.types = types or {}
 
+    _nonempty = False  # the released inputs were not empty
+
     def __bool__(self) -> bool:
-        return bool(self.args)
+        return bool(self.args) or self._nonempty
+
+    def _release(self) -> None:
+        self._nonempty = self._nonempty or bool(self.args)
+        self.args = []
+        self.types = {}
 
     @t.overload  # noqa F811
     def __setitem__(self, k: int, v: t.Any) -> None:
@@ -167,7 +197,7 @@ class LazyArguments:
             args.append(arg)
         return args
 
-    @reify
+    @_releasing
     def value(self) -> str:
         return ", ".join(self._args())
 
@@ -186,8 +216,15 @@ class LazyKeywords:
         self.types = types or {}
         self._raw = raw
 
+    _nonempty = False  # the released inputs were not empty
+
     def __bool__(self) -> bool:
-        return bool(self.kwargs)
+        return bool(self.kwargs) or self._nonempty
+
+    def _release(self) -> None:
+        self._nonempty = self._nonempty or bool(self.kwargs)
+        self.kwargs = {}
+        self.types = {}
 
     def __setitem__(self, k: str, v: t.Any) -> None:
         self.kwargs[k] = v
@@ -209,7 +246,7 @@ class LazyKeywords:
             args.append(arg)
         return args
 
-    @reify
+    @_releasing
     def value(self) -> str:
         return ", ".join(self._args())
 
@@ -239,7 +276,10 @@ class LazyJoin:
         else:
             return self.sep.join(map(str, self.args))
 
-    @reify
+    def _release(self) -> None:
+        self.args = []
+
+    @_releasing
     def value(self) -> str:
         return self._string()
 
@@ -258,7 +298,12 @@ class LazyFormat:
         kwargs = {k: str(v) for k, v in self.kwargs.items()}
         return str(self.fmt).format(*args, **kwargs)
 
-    @reify
+    def _release(self) -> None:
+        self.fmt = ""
+        self.args = ()
+        self.kwargs = {}
+
+    @_releasing
     def value(self) -> str:
         return self._string()
 
@@ -1,5 +1,4 @@
 import os
-import sys
 
 from setuptools import setup, find_packages
 
@@ -13,9 +12,7 @@ except IOError:
     README = CHANGES = ""
 
 
-install_requires = ["typing_extensions"]
-if sys.version_info[:2] <= (3, 6):
-    install_requires.append("dataclasses")
+install_requires = ['typing_extensions; python_version < "3.8"']
 dev_extras = ["black", "flake8", "mypy"]
 docs_extras = []
 tests_require = ["evilunit"]
@@ -33,7 +30,6 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
     ],
@@ -44,6 +40,7 @@ setup(
     packages=find_packages(exclude=["prestring.tests"]),
     include_package_data=True,
     package_data={"prestring": ["py.typed"],},
+    python_requires=">=3.7",
     install_requires=install_requires,
     extras_require={"testing": testing_extras, "docs": docs_extras, "dev": dev_extras},
     tests_require=tests_require,